@@ -1,15 +1,31 @@
+import csv
+import html
+import io
+import itertools
+import json
 import os
+import sqlite3
 import webbrowser
-from typing import List, Any
+from typing import Iterator, List, Any
 
+from database.connection_pool import ConnectionPool
 from database.database_manager import DatabaseManager
-from flask import Flask, render_template, request
-from redis import Redis
+from database.exporter import EXPORT_FORMATS
+from flask import Flask, Response, jsonify, render_template, request, send_file, stream_with_context
+from redis.exceptions import RedisError
 
+from query_cache import QueryCache, fetch_rows
+from query_guard import ExecutionBudget, get_row_window, time_budget
+from query_jobs import DONE, QueryJobs
 from utility.input_reader import get_config
 
 app = Flask(__name__)
-redis = Redis(host='redis', port=6379)
+# long-lived read connections, result cache and background jobs, set up once by set_up_analysis
+connections = None
+query_cache = None
+query_jobs = None
+# formats of the query API
+API_FORMATS = ["json", "csv"]
 
 
 def make_table() -> str:
@@ -42,6 +58,43 @@ def make_table() -> str:
                     </table>"""
 
 
+def make_dashboard() -> str:
+    """
+    :return: HTML for the panels of the summary tables
+    """
+    return """
+            {% if panels %}
+                <div class="row">
+                    {% for panel in panels %}
+                        <div class="col-md-6">
+                            <div class="panel panel-default">
+                                <div class="panel-heading">{{ panel.title }}</div>
+                                <table class="table table-condensed">
+                                    <thead>
+                                        <tr>
+                                            {% for i in panel.columns %}
+                                                <th style="text-align: center;" scope="col"> {{ i }}</th>
+                                            {% endfor %}
+                                        </tr>
+                                    </thead>
+                                    <tbody>
+                                        {% for i in panel.rows %}
+                                            <tr>
+                                            {% for j in i %}
+                                                <td> {{ j }} </td>
+                                            {% endfor %}
+                                            </tr>
+                                        {% endfor %}
+                                    </tbody>
+                                </table>
+                            </div>
+                        </div>
+                    {% endfor %}
+                </div>
+            {% endif %}
+            """
+
+
 def make_input_form() -> str:
     """
     :return: HTML for the input form
@@ -52,7 +105,32 @@ def make_input_form() -> str:
                     <label for='select'>Select statement</label>
                     <textarea class="form-control" name="select" id="select_id" rows="3" placeholder='Enter Select statement (example: "SELECT * FROM Website WHERE root=?;")'>{% if textarea %}{{ textarea }}{% endif %}</textarea>
                </div>
+               <div class="form-group">
+                    <label for='page_size'>Rows per page</label>
+                    <select class="form-control" name="page_size" id="page_size_id">
+                        {% for i in page_sizes %}
+                            <option value="{{ i }}" {% if i == page_size %}selected{% endif %}>{{ i }}</option>
+                        {% endfor %}
+                    </select>
+               </div>
+               <div class="checkbox">
+                    <label><input type="checkbox" name="explain" value="1" {% if explain %}checked{% endif %}> Show the query plan (EXPLAIN QUERY PLAN)</label>
+               </div>
+               <input type="hidden" name="page" value="{{ page }}">
                <input type="submit" name="submit" value="Submit" class="btn btn-primary btn-sm btn-block">
+               <input type="submit" name="submit" value="Stream all rows" class="btn btn-default btn-sm btn-block" formtarget="_blank">
+               {% if page > 0 %}
+                    <input type="submit" name="submit" value="Previous" class="btn btn-default btn-sm">
+               {% endif %}
+               {% if rows %}
+                    Page {{ page + 1 }}
+               {% endif %}
+               {% if has_next %}
+                    <input type="submit" name="submit" value="Next" class="btn btn-default btn-sm">
+               {% endif %}
+               {% if capped %}
+                    Results are capped at {{ max_rows }} rows
+               {% endif %}
             </form>
             """
 
@@ -65,6 +143,7 @@ def make_html_content(examples: List[str]) -> str:
     """
     return """
         <div class="container">
+            """ + make_dashboard() + """
             <div class="panel panel-default">
                 <div class="panel-heading">Examples</div>
                 <div class="panel-body" style="font-family: monospace"> """ + "<br>".join(examples) + """</div>
@@ -176,46 +255,336 @@ def run_analysis(config_: dict):
     app.run(debug=True, host='0.0.0.0', port=port)
 
 
+def set_up_analysis(config_: dict):
+    """
+    Open the database once for all requests
+    :param config_: main configuration
+    """
+    global connections, query_cache, query_jobs
+    if os.environ.get('RUN_IN_DOCKER_CONTAINER', False):
+        path = config_["database"]["local_path"]
+    else:
+        path = "." + config_["database"]["local_path"]
+    dbm = DatabaseManager(set_up=config_["database"]["setup"], path=path, pragmas=config_["database"]["pragmas"])
+    dbm.close()
+    connections = ConnectionPool(path=path, timeout=dbm.timeout, pragmas=config_["database"]["pragmas"],
+                                 read_only=config_["analysis"]["limits"]["read_only"])
+    if config_["analysis"]["cache"]["enabled"]:
+        query_cache = QueryCache(host=config_["analysis"]["redis"]["host"], port=config_["analysis"]["redis"]["port"],
+                                 ttl=config_["analysis"]["cache"]["ttl"],
+                                 max_rows=config_["analysis"]["cache"]["max_rows"])
+    if config_["analysis"]["jobs"]["enabled"]:
+        query_jobs = QueryJobs(host=config_["analysis"]["redis"]["host"], port=config_["analysis"]["redis"]["port"],
+                               connections=connections, directory=config_["analysis"]["jobs"]["directory"],
+                               chunk_size=config_["analysis"]["jobs"]["chunk_size"],
+                               seconds=config_["analysis"]["jobs"]["time_budget"],
+                               result_ttl=config_["analysis"]["jobs"]["result_ttl"])
+        # app.run(debug=True) runs this module in the reloader process as well, only the serving child takes jobs
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            query_jobs.start(num_workers=config_["analysis"]["jobs"]["workers"])
+
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     rows = False
     columns = False
     exception = False
     textarea = False
-    if os.environ.get('RUN_IN_DOCKER_CONTAINER', False):
-        config = get_config('config.yml')
-        dbm = DatabaseManager(set_up=config["database"]["setup"], path=config["database"]["local_path"])
-    else:
-        config = get_config('../config.yml')
-        dbm = DatabaseManager(set_up=config["database"]["setup"], path="." + config["database"]["local_path"])
+    has_next = False
+    capped = False
+    explain = bool(request.form.get('explain'))
+    page, page_size = get_page()
     if request.method == 'POST':
-        rows, columns, exception, textarea = get_select_data_result(dbm=dbm)
-    return render_template(config["analysis"]["html_file"], rows=rows, columns=columns, exception=exception, textarea=textarea)
+        if request.form.get('submit') == "Stream all rows":
+            return Response(stream_with_context(stream_select_result(select_statement=request.form['select'],
+                                                                     explain=explain)),
+                            mimetype="text/html")
+        rows, columns, exception, textarea, has_next, capped = get_select_data_result(page=page, page_size=page_size,
+                                                                                      explain=explain)
+    return render_template(config["analysis"]["html_file"], rows=rows, columns=columns, exception=exception,
+                           textarea=textarea, page=page, page_size=page_size, has_next=has_next, capped=capped,
+                           max_rows=config["analysis"]["limits"]["max_rows"], explain=explain,
+                           page_sizes=config["analysis"]["page_sizes"], panels=get_dashboard_panels())
 
 
-def get_select_data_result(dbm: DatabaseManager) -> Any:
+def get_dashboard_panels() -> List[dict]:
     """
-    Makes a SELECT SQL request and returns the result of that query
-    :param dbm: Database Manager
-    :return: result rows, result column names, optional also exception message
+    Prevalence statistics read from the summary tables, which are kept up to date on every insert
+    :return: panels with title, column names and rows
     """
-    select = request.form['select']
+    if not config["analysis"]["dashboard"]["enabled"]:
+        return []
+    num_rows = config["analysis"]["dashboard"]["rows"]
+    panels = [
+        ("Frameworks", ["Framework", "Websites"],
+         """SELECT Framework.name_, SUM(FrameworkCount.websites) AS websites FROM FrameworkCount
+            INNER JOIN Framework ON Framework.framework_id = FrameworkCount.framework_id
+            GROUP BY Framework.name_ ORDER BY websites DESC LIMIT ?;"""),
+        ("Libraries", ["Library", "Websites"],
+         """SELECT Library.name_, SUM(LibraryCount.websites) AS websites FROM LibraryCount
+            INNER JOIN Library ON Library.library_id = LibraryCount.library_id
+            GROUP BY Library.name_ ORDER BY websites DESC LIMIT ?;"""),
+        ("Languages", ["Language", "Websites"],
+         """SELECT SrcLanguage.name_, SUM(LanguageCount.websites) AS websites FROM LanguageCount
+            INNER JOIN SrcLanguage ON SrcLanguage.src_language_id = LanguageCount.language_id
+            GROUP BY SrcLanguage.name_ ORDER BY websites DESC LIMIT ?;"""),
+        ("WebAssembly per day", ["Day", "Websites", "Using WebAssembly"],
+         """SELECT day, websites, wasm_websites FROM WasmDailyCount WHERE websites > 0
+            ORDER BY day DESC LIMIT ?;"""),
+    ]
+    try:
+        return [{"title": title, "columns": columns, "rows": select(statement=statement, args=(num_rows,))[1]}
+                for title, columns, statement in panels]
+    except sqlite3.Error:
+        # database without the summary tables of migration 6
+        return []
+
+
+def get_page() -> Any:
+    """
+    Requested result page, the page size falls back to the configured one if it is not offered in the form
+    :return: page number starting at 0, page size
+    """
+    page_size = int(request.form.get('page_size', 0) or 0)
+    if page_size not in config["analysis"]["page_sizes"]:
+        page_size = config["analysis"]["page_size"]
+    page = int(request.form.get('page', 0) or 0)
+    submit = request.form.get('submit')
+    if submit == "Next":
+        page += 1
+    elif submit == "Previous":
+        page = max(page - 1, 0)
+    else:
+        page = 0
+    return page, page_size
+
+
+def select(statement: str, args=None, offset: int = 0, limit: int = None) -> Any:
+    """
+    Run a statement on a pooled read connection within the time budget, answered from the query cache if it is
+    enabled
+    :param statement: SQL statement
+    :param args: optional arguments of the statement
+    :param offset: number of rows to skip
+    :param limit: maximum number of rows, all rows if not set
+    :return: column names, result rows
+    """
+    with connections.borrow() as connection, \
+            time_budget(connection=connection, seconds=config["analysis"]["limits"]["time_budget"]):
+        if query_cache is not None:
+            return query_cache.select(connection=connection, statement=statement, args=args, offset=offset,
+                                      limit=limit)
+        return fetch_rows(connection=connection, statement=statement, args=args, offset=offset, limit=limit)
+
+
+def get_select_data_result(page: int, page_size: int, explain: bool) -> Any:
+    """
+    Makes a SELECT SQL request and returns one page of the result of that query
+    :param page: page number starting at 0
+    :param page_size: rows per page
+    :param explain: return the query plan instead of the result
+    :return: result rows, result column names, optional also exception message, statement, if there is a next page,
+    if the row cap was reached
+    """
+    select_statement = request.form['select']
+    max_rows = config["analysis"]["limits"]["max_rows"]
     columns = []
     rows = []
     exception = None
+    has_next = False
+    capped = False
     try:
-        rows = dbm.select(select_statement=select)
-        p = select.replace(";", " ").replace(",", " ").split(" ")
-        if p[1] == "*":
-            temp = dbm.select(select_statement="PRAGMA table_info(" + p[3] + ");")
-            columns = [i[1] for i in temp]
-        if p[1] != "*":
-            if "FROM" in p:
-                temp = p.index("FROM")
-                columns = p[1:temp]
+        if explain:
+            columns, rows = select(statement="EXPLAIN QUERY PLAN " + select_statement)
+            return rows, columns, exception, select_statement, has_next, capped
+        # one row more than the page tells if there is a next page
+        limit = get_row_window(offset=page * page_size, limit=page_size + 1, max_rows=max_rows)
+        columns, rows = select(statement=select_statement, offset=page * page_size, limit=limit)
+        has_next = len(rows) > page_size
+        capped = page * page_size + len(rows) >= max_rows
+        rows = rows[:page_size]
     except Exception as e:
         exception = e
-    return rows, [i for i in columns if i], exception, select
+    return rows, columns, exception, select_statement, has_next, capped
+
+
+def iterate_query(statement: str) -> Iterator[Any]:
+    """
+    Execute an ad-hoc statement within the time budget and the row cap. The result is streamed while the client reads
+    it, so the statement gets its own connection instead of holding one of the pool, and the time budget only counts
+    the execution, not the time the client takes to read the rows.
+    :param statement: SQL statement
+    :return: the column names of the cursor description, then chunks of result rows
+    """
+    limits = config["analysis"]["limits"]
+    connection = connections.open_read()
+    try:
+        budget = ExecutionBudget(connection=connection, seconds=limits["time_budget"])
+        with budget.step():
+            cursor = connection.execute(statement)
+        try:
+            yield [i[0] for i in cursor.description or []]
+            num_rows = 0
+            while num_rows < limits["max_rows"]:
+                with budget.step():
+                    rows = cursor.fetchmany(min(config["analysis"]["stream_chunk_size"],
+                                                limits["max_rows"] - num_rows))
+                if not rows:
+                    break
+                num_rows += len(rows)
+                yield rows
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+def stream_select_result(select_statement: str, explain: bool) -> Iterator[str]:
+    """
+    Render all result rows while the cursor produces them, only one chunk of rows is held in memory. The stream
+    stops at the row cap and the time budget.
+    :param select_statement: SQL statement
+    :param explain: render the query plan instead of the result
+    :return: HTML chunks
+    """
+    max_rows = config["analysis"]["limits"]["max_rows"]
+    if explain:
+        select_statement = "EXPLAIN QUERY PLAN " + select_statement
+    yield """<!doctype html>
+            <html lang="en">
+              <head>
+                <meta charset="utf-8">
+                <link rel="stylesheet" href="https://maxcdn.bootstrapcdn.com/bootstrap/4.0.0/css/bootstrap.min.css" integrity="sha384-Gn5384xqQ1aoWXA+058RXPxPg6fy4IWvTNh0E263XmFcJlSAwiGgFAW/dAiS6JXm" crossorigin="anonymous">
+              </head>
+              <body>
+                <div class="container">
+                <p style="font-family: monospace">""" + html.escape(select_statement) + """</p>
+                <table class="table" style="table-layout: fixed; width: 100%;">"""
+    try:
+        chunks = iterate_query(statement=select_statement)
+        yield "<thead><tr>" + "".join('<th style="text-align: center; vertical-align: middle;" scope="col">' +
+                                      html.escape(i) + "</th>" for i in next(chunks)) + "</tr></thead><tbody>"
+        num_rows = 0
+        for rows in chunks:
+            num_rows += len(rows)
+            yield "".join('<tr style="word-wrap: break-word; overflow-wrap: break-word; ">' +
+                          "".join("<td>" + html.escape(str(j)) + "</td>" for j in i) + "</tr>" for i in rows)
+        yield "</tbody>"
+        if num_rows >= max_rows:
+            yield "</table><p>Results are capped at " + str(max_rows) + " rows</p><table>"
+    except (sqlite3.Error, sqlite3.Warning) as e:
+        yield "</table><p>" + html.escape(str(e)) + "</p><table>"
+    yield """</table>
+                </div>
+              </body>
+            </html>"""
+
+
+def stream_json(columns: List[str], chunks: Iterator[Any]) -> Iterator[str]:
+    """
+    JSON document of the result, written while the cursor produces the rows
+    :param columns: column names
+    :param chunks: chunks of result rows
+    :return: JSON text chunks of {"columns": [...], "rows": [[...], ...], "capped": bool, "error": str or null}
+    """
+    yield '{"columns": ' + json.dumps(columns) + ', "rows": ['
+    num_rows = 0
+    error = None
+    try:
+        for rows in chunks:
+            yield (", " if num_rows else "") + ", ".join(json.dumps(list(i), default=str) for i in rows)
+            num_rows += len(rows)
+    except (sqlite3.Error, sqlite3.Warning) as e:
+        error = str(e)
+    yield '], "capped": ' + json.dumps(num_rows >= config["analysis"]["limits"]["max_rows"]) + \
+          ', "error": ' + json.dumps(error) + '}'
+
+
+def stream_csv(columns: List[str], chunks: Iterator[Any]) -> Iterator[str]:
+    """
+    CSV of the result with a header row, written while the cursor produces the rows
+    :param columns: column names
+    :param chunks: chunks of result rows
+    :return: CSV text chunks
+    """
+    for rows in itertools.chain([[columns]], chunks):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        yield buffer.getvalue()
+
+
+@app.route('/api/query', methods=['GET', 'POST'])
+def api_query():
+    """
+    Stream the result of a statement as JSON or CSV, parameters sql and format (json or csv)
+    """
+    statement = request.values.get('sql')
+    format_ = request.values.get('format', "json")
+    if not statement or format_ not in API_FORMATS:
+        return jsonify(error="Parameters: sql and format (" + ", ".join(API_FORMATS) + ")"), 400
+    chunks = iterate_query(statement=statement)
+    try:
+        # errors of the statement itself are still reported with a status code
+        columns = next(chunks)
+    except (sqlite3.Error, sqlite3.Warning) as e:
+        return jsonify(error=str(e)), 400
+    if format_ == "csv":
+        return Response(stream_csv(columns=columns, chunks=chunks), mimetype="text/csv")
+    return Response(stream_json(columns=columns, chunks=chunks), mimetype="application/json")
+
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """
+    Queue a statement as background job, parameters sql and format (csv, jsonl or parquet)
+    """
+    statement = request.values.get('sql')
+    format_ = request.values.get('format', "csv")
+    if query_jobs is None:
+        return jsonify(error="Background jobs are disabled"), 404
+    if not statement or format_ not in EXPORT_FORMATS:
+        return jsonify(error="Parameters: sql and format (" + ", ".join(EXPORT_FORMATS) + ")"), 400
+    try:
+        job_id = query_jobs.submit(statement=statement, format_=format_)
+    except RedisError as e:
+        return jsonify(error="Job queue unavailable: " + str(e)), 503
+    return jsonify(id=job_id, status_url="/api/jobs/" + job_id), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id: str):
+    """
+    State of a background job, the result_url is set once it is done
+    """
+    if query_jobs is None:
+        return jsonify(error="Background jobs are disabled"), 404
+    try:
+        job = query_jobs.get(job_id=job_id)
+    except RedisError as e:
+        return jsonify(error="Job queue unavailable: " + str(e)), 503
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    if job["status"] == DONE:
+        job["result_url"] = "/api/jobs/" + job_id + "/result"
+    return jsonify(id=job_id, **job)
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def api_job_result(job_id: str):
+    """
+    Result file of a finished background job
+    """
+    if query_jobs is None:
+        return jsonify(error="Background jobs are disabled"), 404
+    try:
+        job = query_jobs.get(job_id=job_id)
+    except RedisError as e:
+        return jsonify(error="Job queue unavailable: " + str(e)), 503
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    if job["status"] != DONE:
+        return jsonify(error="Job is " + job["status"]), 409
+    return send_file(os.path.abspath(query_jobs.get_path(job_id=job_id, format_=job["format"])), as_attachment=True)
 
 
 if __name__ == "__main__":
@@ -227,4 +596,5 @@ if __name__ == "__main__":
     else:
         config = get_config('../config.yml')
     if config["analysis"]["start"]:
+        set_up_analysis(config_=config)
         run_analysis(config_=config["analysis"])
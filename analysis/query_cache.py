@@ -0,0 +1,152 @@
+import hashlib
+import itertools
+import json
+import logging
+import re
+import sqlite3
+import time
+from typing import Any, List, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+# seconds the cache is bypassed after redis was unreachable
+RETRY_SECONDS = 30
+# quoted literals and identifiers keep their case and whitespace, everything else is normalized
+QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])")
+# statements which can be wrapped as a subquery, so SQLite skips the rows before a page instead of python
+SUBQUERY = re.compile(r"^\s*(select|with|values)\b", re.IGNORECASE)
+# SQLite renames duplicate column names of a subquery to name:N
+RENAMED = re.compile(r"^(.*):\d+$")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Normalize a statement so equivalent spellings share a cache entry: whitespace is collapsed, keywords and
+    identifiers are lower cased and trailing semicolons are removed
+    :param statement: SQL statement
+    :return: normalized statement
+    """
+    parts = QUOTED.split(statement)
+    for i in range(0, len(parts), 2):
+        parts[i] = " ".join(parts[i].split()).lower()
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def get_generation(connection: sqlite3.Connection) -> Optional[int]:
+    """
+    Data generation of the database, it is increased with every commit of new crawl results
+    :param connection: sqlite3 read connection
+    :return: generation or None if the database has no generation counter yet
+    """
+    try:
+        return connection.execute("""SELECT generation FROM DataGeneration WHERE id = 0;""").fetchone()[0]
+    except (sqlite3.Error, TypeError):
+        return None
+
+
+def fetch_rows(connection: sqlite3.Connection, statement: str, args: Any = None, offset: int = 0,
+               limit: int = None) -> Tuple[List[str], List[Any]]:
+    """
+    Run a statement and fetch a window of its rows. A query is wrapped in SELECT * FROM (...) LIMIT ? OFFSET ?, so
+    SQLite skips the rows before the window, other statements such as PRAGMA are stepped over in python.
+    :param connection: sqlite3 read connection
+    :param statement: SQL statement
+    :param args: optional arguments of the statement
+    :param offset: number of rows to skip
+    :param limit: maximum number of rows, all rows if not set
+    :return: column names of the cursor description, result rows
+    """
+    if (offset or limit is not None) and SUBQUERY.match(statement) and not isinstance(args, dict):
+        # the newline ends a trailing line comment of the statement
+        window = "SELECT * FROM (" + statement.strip().rstrip(";") + "\n) LIMIT ? OFFSET ?;"
+        try:
+            columns, rows = fetch_rows(connection=connection, statement=window,
+                                       args=list(args or ()) + [limit if limit is not None else -1, offset])
+            renamed = [RENAMED.match(i) for i in columns]
+            return [i.group(1) if i and i.group(1) in columns[:idx] else column
+                    for idx, (i, column) in enumerate(zip(renamed, columns))], rows
+        except sqlite3.OperationalError as e:
+            # e.g. a comment behind the final semicolon, the statement is run as it is
+            if "syntax error" not in str(e):
+                raise
+    cursor = connection.execute(statement, args or ())
+    try:
+        columns = [i[0] for i in cursor.description or []]
+        if offset == 0 and limit is None:
+            return columns, cursor.fetchall()
+        return columns, list(itertools.islice(cursor, offset, offset + limit if limit is not None else None))
+    finally:
+        cursor.close()
+
+
+class QueryCache:
+    def __init__(self, host: str, port: int, ttl: int, max_rows: int):
+        """
+        Redis cache of query results keyed by the normalized statement and the data generation of the database, new
+        crawl results change the generation so stale entries are never read and expire after the ttl
+        :param host: redis host
+        :param port: redis port
+        :param ttl: seconds a result stays cached
+        :param max_rows: larger results are not cached
+        """
+        self.redis = Redis(host=host, port=port, socket_timeout=1, socket_connect_timeout=1)
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.retry_at = 0.0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    def fail(self, e: RedisError):
+        logging.info("Query cache unavailable for %s seconds: %s", RETRY_SECONDS, e)
+        self.retry_at = time.monotonic() + RETRY_SECONDS
+
+    @staticmethod
+    def get_key(statement: str, args: Any, generation: int, offset: int = 0, limit: int = None) -> str:
+        text = json.dumps([normalize_sql(statement), args, generation, offset, limit], default=str)
+        return "query_result:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[str], List[list]]]:
+        """
+        Cached column names and result rows, an unreachable redis is a cache miss
+        """
+        if not self.available():
+            return None
+        try:
+            value = self.redis.get(key)
+        except RedisError as e:
+            self.fail(e)
+            return None
+        return tuple(json.loads(value)) if value is not None else None
+
+    def set(self, key: str, columns: List[str], rows: List[Any]):
+        if len(rows) > self.max_rows or not self.available():
+            return
+        try:
+            self.redis.set(key, json.dumps([columns, [list(i) for i in rows]], default=str), ex=self.ttl)
+        except RedisError as e:
+            self.fail(e)
+
+    def select(self, connection: sqlite3.Connection, statement: str, args: Any = None, offset: int = 0,
+               limit: int = None) -> Tuple[List[str], List[Any]]:
+        """
+        Run a statement or answer it from the cache
+        :param connection: sqlite3 read connection
+        :param statement: SQL statement
+        :param args: optional arguments of the statement
+        :param offset: number of rows to skip
+        :param limit: maximum number of rows, all rows if not set
+        :return: column names, result rows
+        """
+        generation = get_generation(connection)
+        key = self.get_key(statement=statement, args=args, generation=generation, offset=offset, limit=limit) \
+            if generation is not None else None
+        if key is not None:
+            result = self.get(key)
+            if result is not None:
+                return result
+        columns, rows = fetch_rows(connection=connection, statement=statement, args=args, offset=offset, limit=limit)
+        if key is not None:
+            self.set(key, columns, rows)
+        return columns, rows
@@ -0,0 +1,64 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# virtual machine instructions between two checks of the deadline
+CHECK_INSTRUCTIONS = 10000
+
+
+class ExecutionBudget:
+    def __init__(self, connection: sqlite3.Connection, seconds: float):
+        """
+        Time budget of a statement whose rows are fetched in steps. Only the time spent in the steps is counted, so a
+        streamed result is not cut off while the client is still reading the previous rows.
+        :param connection: sqlite3 connection
+        :param seconds: budget of all steps together
+        """
+        self.connection = connection
+        self.seconds = seconds
+        self.remaining = seconds
+
+    @contextmanager
+    def step(self) -> Iterator[sqlite3.Connection]:
+        """
+        Abort the statements of the block once the remaining budget is used up, checked by the progress handler of
+        sqlite3 so a runaway join is interrupted inside SQLite
+        :return: the connection
+        """
+        start = time.monotonic()
+        deadline = start + self.remaining
+        self.connection.set_progress_handler(lambda: int(time.monotonic() > deadline), CHECK_INSTRUCTIONS)
+        try:
+            yield self.connection
+        except sqlite3.OperationalError as e:
+            if time.monotonic() > deadline:
+                raise sqlite3.OperationalError("Query exceeded the time budget of " + str(self.seconds) +
+                                               " seconds") from e
+            raise
+        finally:
+            self.connection.set_progress_handler(None, CHECK_INSTRUCTIONS)
+            self.remaining -= time.monotonic() - start
+
+
+@contextmanager
+def time_budget(connection: sqlite3.Connection, seconds: float) -> Iterator[sqlite3.Connection]:
+    """
+    Abort the statements of the connection which run longer than the budget
+    :param connection: sqlite3 connection
+    :param seconds: wall-clock budget of everything executed in the block
+    :return: the connection
+    """
+    with ExecutionBudget(connection=connection, seconds=seconds).step():
+        yield connection
+
+
+def get_row_window(offset: int, limit: int, max_rows: int) -> int:
+    """
+    Number of rows of a window which stay within the row cap
+    :param offset: first row of the window
+    :param limit: rows of the window
+    :param max_rows: row cap of a query
+    :return: rows to fetch, 0 if the window starts behind the cap
+    """
+    return max(min(limit, max_rows - offset), 0)
@@ -0,0 +1,146 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from database.connection_pool import ConnectionPool
+from database.exporter import EXPORT_FORMATS, DatabaseExporter
+from redis import Redis
+from redis.exceptions import RedisError
+
+from query_guard import time_budget
+
+QUEUE_KEY = "query_jobs"
+JOB_PREFIX = "query_job:"
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# seconds a worker waits for a job before it checks again, and after an error
+POLL_SECONDS = 5
+
+
+class QueryJobs:
+    def __init__(self, host: str, port: int, connections: ConnectionPool, directory: str, chunk_size: int,
+                 seconds: float, result_ttl: int):
+        """
+        Background jobs for large query results: the jobs are queued in redis, a worker thread writes the result to a
+        file with the writers of the DatabaseExporter and the client polls the job state
+        :param host: redis host
+        :param port: redis port
+        :param connections: ConnectionPool of the database
+        :param directory: directory of the result files
+        :param chunk_size: rows fetched from the cursor and written at once
+        :param seconds: time budget of a job
+        :param result_ttl: seconds the state of a job is kept in redis
+        """
+        # no socket timeout, the worker blocks on the queue
+        self.redis = Redis(host=host, port=port, socket_connect_timeout=1, decode_responses=True)
+        self.connections = connections
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.seconds = seconds
+        self.result_ttl = result_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, job_id: str, format_: str) -> str:
+        return os.path.join(self.directory, job_id + "." + EXPORT_FORMATS[format_])
+
+    def submit(self, statement: str, format_: str) -> str:
+        """
+        Queue a statement
+        :param statement: SQL statement
+        :param format_: csv, jsonl or parquet
+        :return: job id
+        """
+        job_id = uuid.uuid4().hex
+        key = JOB_PREFIX + job_id
+        self.redis.hset(key, mapping={"status": QUEUED, "statement": statement, "format": format_,
+                                      "submitted": datetime.now().isoformat(timespec="seconds")})
+        self.redis.expire(key, self.result_ttl)
+        self.redis.rpush(QUEUE_KEY, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        State of a job
+        :param job_id: job id
+        :return: status, statement, format, submitted and, once finished, rows or error, None for an unknown job
+        """
+        job = self.redis.hgetall(JOB_PREFIX + job_id)
+        return job or None
+
+    def iterate_chunks(self, connection: sqlite3.Connection, statement: str) -> Iterator[List[tuple]]:
+        cursor = connection.execute(statement)
+        try:
+            yield [i[0] for i in cursor.description or []]
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def run(self, job_id: str):
+        """
+        Write the result of a job to its file
+        :param job_id: job id
+        """
+        key = JOB_PREFIX + job_id
+        job = self.get(job_id)
+        if job is None:
+            return
+        self.redis.hset(key, "status", RUNNING)
+        path = self.get_path(job_id=job_id, format_=job["format"])
+        try:
+            with self.connections.borrow() as connection, time_budget(connection=connection, seconds=self.seconds):
+                chunks = self.iterate_chunks(connection=connection, statement=job["statement"])
+                columns = next(chunks)
+                num_rows = getattr(DatabaseExporter, "write_" + job["format"])(path=path, columns=columns,
+                                                                               chunks=chunks)
+            self.redis.hset(key, mapping={"status": DONE, "rows": num_rows})
+            logging.info("\t\t\t\t\t\t\t-------->  Query job %s wrote %s rows", job_id, str(num_rows))
+        except Exception as e:
+            # any failure, e.g. of a writer, has to end the job so the polling clients stop
+            if os.path.exists(path):
+                os.remove(path)
+            self.redis.hset(key, mapping={"status": FAILED, "error": str(e)})
+            logging.info("Query job %s failed: %s", job_id, e)
+
+    def remove_expired(self):
+        """
+        Remove the result files whose job state expired
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                os.remove(path)
+
+    def work(self):
+        """
+        Run the queued jobs one after another, expired results are removed while the queue is empty
+        """
+        while True:
+            try:
+                item = self.redis.blpop(QUEUE_KEY, timeout=POLL_SECONDS)
+                if item is not None:
+                    self.run(job_id=item[1])
+                else:
+                    self.remove_expired()
+            except RedisError as e:
+                logging.info("Query job queue unavailable: %s", e)
+                time.sleep(POLL_SECONDS)
+            except Exception as e:
+                logging.info("Query job worker exception %s", e)
+                logging.info(traceback.format_exc())
+                time.sleep(POLL_SECONDS)
+
+    def start(self, num_workers: int):
+        for _ in range(num_workers):
+            threading.Thread(target=self.work, daemon=True).start()
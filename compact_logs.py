@@ -0,0 +1,25 @@
+import logging
+import os
+
+from database.database_manager import DatabaseManager
+from database.log_sink import LogCompactor
+from utility.input_reader import get_config
+
+
+if __name__ == "__main__":
+    """
+        Normalize the completed segments of the log sink into the SQLite database
+    """
+    logging.getLogger().setLevel(level=logging.INFO)
+    config = get_config('config.yml')
+    if os.environ.get(config["docker"]["env_var"], False):
+        db_path = config["database"]["path"]
+    else:
+        db_path = config["database"]["local_path"]
+    dbm = DatabaseManager(set_up=True, path=db_path, pragmas=config["database"]["pragmas"])
+    compactor = LogCompactor(dbm=dbm, directory=config["database"]["log_sink"]["directory"],
+                             batch_size=config["database"]["log_sink"]["batch_size"])
+    try:
+        logging.info("\t\t\t\t\t\t\t-------->  Compacted %s records", str(compactor.compact()))
+    finally:
+        dbm.close()
@@ -10,29 +10,42 @@ from typing import Any, List
 from selenium.webdriver.chrome.options import Options
 
 from concurrent.futures.thread import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
 from selenium import webdriver
 
-from database.database_manager import DatabaseManager
+from database.database_manager import CARRY_FORWARD_TABLES
+from database.frontier_store import DONE, FAILED
+from database.result_sink import ResultSink
 from utility.ad_tracking_detection import find_ad_tracking
+from utility.crawl_frontier import CrawlFrontier
+from utility.driver_pool import DriverPool
 from utility.html_tag_extractor import HTMLTagExtractor
+from utility.http_fetcher import HttpFetcher
 from utility.input_reader import read_input
+from utility.language_classifier import LanguageClassifier
+from utility.page_fingerprint import PageFingerprint, fingerprint_snapshot, unchanged_analyzers
+from utility.page_snapshot import fetch_script_sources, take_page_snapshot
 from utility.src_lang_analyzer import SrcLanguageAnalyzer
 from utility.wappalyzer_api import WappalyzerAnalyzer
+from utility.wasm_downloader import WasmDownloader
 from utility.web_assembly_analyser import WebAssemblyAnalyzer
 from utility.website_data import WebsiteData
 
 
 class WebCrawler:
-    def __init__(self, config_: dict, dbm_: DatabaseManager):
+    def __init__(self, config_: dict, dbm_: ResultSink):
         """
         Set up Crawler
         :param config_: Main configuration
-        :param dbm_: DatabaseManager
+        :param dbm_: ResultSink storing the results, the DatabaseManager by default
         """
         self.config_ = config_
         self.dbm_ = dbm_
+        self.fetcher_ = HttpFetcher.from_config(config_["crawler"]["http_fetcher"])
+        self.downloader_ = None
+        self.classifier_ = LanguageClassifier(cache_size=config_["crawler"]["language_cache_size"])
 
     @staticmethod
     def check_url_validity(url_: str) -> bool:
@@ -47,15 +60,6 @@ class WebCrawler:
             logging.info("%s is not a valid hyperlink", str(url_))
         return False
 
-    def scrape(self, executor: Any, chrome_options: Any, url: str, *, loop):
-        """
-        :param executor: ThreadPoolExecutor
-        :param chrome_options: Chrome Options
-        :param url: Current URL to crawl
-        :param loop: asyncio loop
-        """
-        loop.run_in_executor(executor, self.crawler, chrome_options, url)
-
     def get_filtered_next_urls(self, next_urls: list) -> List[dict]:
         """
         Filter hyperlinks on website by netloc and config set breadth
@@ -84,126 +88,257 @@ class WebCrawler:
                 next_urls = next_urls[:breadth]
         return next_urls
 
-    def recursive_crawl(self, driver: Any, next_urls: list, current_depth: int) -> List[dict]:
+    def set_up_driver(self, chrome_options: Any) -> Any:
         """
-        recursively crawl inner hyperlinks found depending on the config set depth
-        :param driver: Chrome webdriver
-        :param next_urls: next URL to be crawled
-        :param current_depth: current depth level
-        :return:
-        """
-        next_urls = self.get_filtered_next_urls(next_urls=next_urls)
-        res = []
-        for entry in next_urls:
-            for u_ in entry["next"]:
-                if not self.dbm_.check_if_already_visited(url=u_):
-                    logging.info("Current root URL: %s \n\t\tCurrent crawling URL: %s", str(entry["root"]), str(u_))
-                    res += [{
-                        "root": u_,
-                        "next": self.crawl_website(driver=driver, url=u_, root=entry["root"],
-                                                   current_depth=current_depth)
-                    }]
-                else:
-                    logging.info("Skipping already visited url: %s", u_)
-        return res
-
-    def crawler(self, chrome_options: Any, url: str):
-        """
-        Different information webcrawler is collecting
+        Start a Chrome webdriver, either the remote one while using docker or the local one, and set up the
+        Wappalyzer extension for the session
         :param chrome_options: Chrome Options
-        :param url: Current URL to crawl
+        :return: Chrome webdriver
+        """
+        if os.environ.get(self.config_["docker"]["env_var"], False):
+            cap = chrome_options.to_capabilities()
+            cap['javascriptEnabled'] = True
+            driver = webdriver.Remote(self.config_["docker"]["uri"], cap)
+        else:
+            driver = webdriver.Chrome(chrome_options=chrome_options,
+                                      executable_path=self.config_["chrome"]["driver_path"])
+        if self.config_["chrome"]["max_window_size"]:
+            driver.maximize_window()
+        WappalyzerAnalyzer(driver=driver, config=self.config_["chrome"]["extension"]).set_up_extension()
+        return driver
+
+    def crawl_entry(self, driver: Any, entry: dict) -> List[str]:
         """
-        # Depending on the config either remote webdriver ist used while using docker or local one
+        Crawl a single frontier entry and return the hyperlinks which should be scheduled next
+        :param driver: Chrome webdriver
+        :param entry: frontier entry with url, root and remaining depth
+        :return: filtered next URLs, empty if the depth is exhausted
+        """
+        logging.info("Current root URL: %s \n\t\tCurrent crawling URL: %s", str(entry["root"]), str(entry["url"]))
+        next_urls = self.crawl_website(driver=driver, url=entry["url"], root=entry["root"],
+                                       current_depth=entry["depth"])
+        if entry["depth"] <= 0:
+            return []
+        return self.get_filtered_next_urls(next_urls=[{"root": entry["url"], "next": next_urls}])[0]["next"]
+
+    def crawl_pooled_entry(self, pool: DriverPool, frontier: CrawlFrontier, entry: dict) -> List[str]:
+        """
+        Crawl a frontier entry with a webdriver session borrowed from the pool
+        :param pool: DriverPool
+        :param frontier: global CrawlFrontier which leases the entry
+        :param entry: frontier entry with url, root and remaining depth
+        :return: filtered next URLs
+        """
+        if not frontier.claim(entry):
+            logging.info("Skipping url leased by another worker: %s", entry["url"])
+            return []
+        # every failure after the claim has to end the lease, otherwise the entry stays leased until it expires
+        driver = None
         try:
-            if os.environ.get(self.config_["docker"]["env_var"], False):
-                cap = chrome_options.to_capabilities()
-                cap['javascriptEnabled'] = True
-                driver = webdriver.Remote(self.config_["docker"]["uri"], cap)
+            if self.config_["crawler"]["recrawl"]["enabled"]:
+                visited = self.is_recently_checked(url=entry["url"])
             else:
-                driver = webdriver.Chrome(chrome_options=chrome_options,
-                                          executable_path=self.config_["chrome"]["driver_path"])
-            if self.config_["chrome"]["max_window_size"]:
-                driver.maximize_window()
-            next_urls = [{
-                "root": url,
-                "next": self.crawl_website(driver=driver, url=url, root="input_file",
-                                           current_depth=self.config_["crawler"]["depth"])
-            }]
-            current_depth = self.config_["crawler"]["depth"]
-            while current_depth > 0:
-                current_depth -= 1
-                logging.info("Remaining crawling depth: %s", str(current_depth))
-                if next_urls:
-                    next_urls = self.recursive_crawl(driver=driver, next_urls=next_urls, current_depth=current_depth)
-        except Exception as e:
-            logging.info("Crawler Error %s", e)
-            logging.info(traceback.format_exc())
-        for handle in driver.window_handles:
-            driver.switch_to.window(handle)
-            driver.close()
+                visited = self.dbm_.check_if_already_visited(url=entry["url"])
+            if visited:
+                logging.info("Skipping already visited url: %s", entry["url"])
+                frontier.finish(entry)
+                return []
+            driver = pool.acquire()
+            next_urls = self.crawl_entry(driver=driver, entry=entry)
+        except Exception:
+            frontier.finish(entry, status=FAILED)
+            raise
+        finally:
+            if driver is not None:
+                pool.release(driver)
+        # the entry stays leased until its data is durable, a crash before resumes it in the next run
+        self.dbm_.when_stored(url=entry["url"],
+                              callback=lambda stored: frontier.finish(entry, status=DONE if stored else FAILED))
+        return next_urls
+
+    async def crawl_worker(self, worker_id: int, frontier: CrawlFrontier, executor: Any, pool: DriverPool):
+        """
+        Take URLs from the global frontier until the crawl is cancelled and schedule the found hyperlinks
+        :param worker_id: number of the worker for logging
+        :param frontier: global CrawlFrontier
+        :param executor: ThreadPoolExecutor
+        :param pool: DriverPool
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            entry = await frontier.get()
+            try:
+                next_urls = await loop.run_in_executor(executor, self.crawl_pooled_entry, pool, frontier, entry)
+                frontier.put_all(urls=next_urls, root=entry["url"], depth=entry["depth"] - 1)
+                logging.info("Worker %s finished %s, pending urls: %s", worker_id, entry["url"],
+                             str(frontier.pending()))
+            except Exception as e:
+                logging.info("Crawler Error %s", e)
+                logging.info(traceback.format_exc())
+            finally:
+                frontier.task_done()
+
+    async def run_frontier(self, input_urls: List[str], chrome_options: Any):
+        """
+        Schedule the input URLs in the global frontier and crawl with a bounded number of workers
+        :param input_urls: URLs from the input file
+        :param chrome_options: Chrome Options
+        """
+        num_threads = self.config_["crawler"]["num_threads"]
+        executor = ThreadPoolExecutor(num_threads)
+        pool = DriverPool(size=num_threads, launch=lambda: self.set_up_driver(chrome_options),
+                          max_pages=self.config_["chrome"]["session_pool"]["max_pages"],
+                          max_memory_mb=self.config_["chrome"]["session_pool"]["max_memory_mb"])
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(executor, pool.warm_up)
+        store = None
+        if self.config_["crawler"]["frontier"]["persistent"]:
+            recrawl = self.config_["crawler"]["recrawl"]
+            store = self.dbm_.open_frontier(
+                lease_seconds=self.config_["crawler"]["frontier"]["lease_seconds"],
+                reschedule_after=recrawl["min_age_hours"] * 3600 if recrawl["enabled"] else None)
+        frontier = CrawlFrontier(store=store)
+        frontier.resume()
+        frontier.put_all(urls=input_urls, root="input_file", depth=self.config_["crawler"]["depth"])
+        workers = [asyncio.ensure_future(self.crawl_worker(worker_id=i, frontier=frontier, executor=executor,
+                                                           pool=pool))
+                   for i in range(num_threads)]
+        await frontier.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await loop.run_in_executor(executor, pool.close)
+        executor.shutdown(wait=True)
+        if store is not None:
+            # finish the entries whose data is still waiting to be written before the store is closed
+            self.dbm_.flush()
+            store.close()
+        self.fetcher_.close()
+
+    def is_recently_checked(self, url: str) -> bool:
+        """
+        Check if a page was crawled within the minimum recrawl age
+        :param url: current url to crawl
+        :return: bool if true or not
+        """
+        previous = self.dbm_.get_fingerprint(url=url)
+        if previous is None or not previous["checked"]:
+            return False
+        age = datetime.now() - datetime.fromisoformat(previous["checked"])
+        return age < timedelta(hours=self.config_["crawler"]["recrawl"]["min_age_hours"])
+
+    def carry_forward_website(self, url: str, root: str, previous: dict) -> List[str]:
+        """
+        Record the recrawl of a page the server reported as not modified, all stored rows are carried forward
+        :param url: current URL
+        :param root: parent website or input file
+        :param previous: stored fingerprint of the previous crawl
+        :return: stored hyperlinks of the page
+        """
+        logging.info("\t\t\t\t\t\t\t-------->  %s not modified, carrying forward the stored results", url)
+        collected_website_data = WebsiteData(name=urlparse(url).hostname, url=url, root=root)
+        collected_website_data.libraries, collected_website_data.languages = [], []
+        collected_website_data.frameworks, collected_website_data.hyperlink = [], []
+        collected_website_data.previous_website_id = previous["website_id"]
+        collected_website_data.carry_forward = list(CARRY_FORWARD_TABLES)
+        collected_website_data.fingerprint = PageFingerprint(html_hash=previous["html_hash"],
+                                                             script_src_hash=previous["script_src_hash"],
+                                                             etag=previous["etag"],
+                                                             last_modified=previous["last_modified"],
+                                                             wappalyzer_hash=previous["wappalyzer_hash"])
+        self.dbm_.insert_data_in_db(data=collected_website_data)
+        return [i for i in self.dbm_.get_hyperlink_urls(website_id=previous["website_id"])
+                if self.check_url_validity(url_=i)]
 
     def crawl_website(self, driver: Any, url: str, root: str, current_depth: int) -> List[str]:
         """
         Crawl information from given current URL such as the used libraries, technologies and script information and save
-        website data in database
+        website data in database. On a recrawl only the analyzers whose inputs changed since the previous crawl run.
         :param driver: Chrome webdriver
         :param url: current URL to crawl
         :param root: parent website or input file
         :param current_depth: current depth level
         :return: hyperlinks from webs
         """
+        recrawl = self.config_["crawler"]["recrawl"]
+        previous = self.dbm_.get_fingerprint(url=url) if recrawl["enabled"] else None
+        etag, last_modified = None, None
+        if recrawl["enabled"] and recrawl["conditional_requests"]:
+            if previous is None:
+                # only the validators are recorded for the next recrawl
+                etag, last_modified = self.fetcher_.get_validators(url=url)
+            elif previous["etag"] or previous["last_modified"]:
+                status, etag, last_modified = self.fetcher_.check_validators(
+                    url=url, etag=previous["etag"], last_modified=previous["last_modified"])
+                if status == 304:
+                    return self.carry_forward_website(url=url, root=root, previous=previous)
+        hyperlink_tag_data = []
         try:
             collected_website_data = WebsiteData(name=urlparse(url).hostname, url=url, root=root)
             logging.info(
                 "\n\n -------------------------------------------- Crawling %s (Remaining Depth Level: %s)"
                 " -------------------------------------------- \n ",
                 url, str(current_depth))
-            driver.get(url)
 
-            # technology and ad tracking information
+            # technology information, the only navigation to the url
             wappalyzer_analyzer = WappalyzerAnalyzer(driver=driver, config=self.config_["chrome"]["extension"])
             collected_website_data = wappalyzer_analyzer.get_wappalyzer_info(url_=url, collected_website_data=collected_website_data)
-            #time.sleep(0.5)
+            snapshot = take_page_snapshot(driver=driver, url=url)
 
-            collected_website_data.ad_tracking = find_ad_tracking(driver)
+            # compare with the previous crawl, the script sources are only fetched if an analyzer needs them
+            fingerprint = fingerprint_snapshot(snapshot=snapshot, etag=etag, last_modified=last_modified,
+                                               technologies=[collected_website_data.libraries,
+                                                             collected_website_data.languages,
+                                                             collected_website_data.frameworks])
+            unchanged = unchanged_analyzers(previous=previous, current=fingerprint)
+            collected_website_data.fingerprint = fingerprint
+            collected_website_data.previous_website_id = previous["website_id"] if previous else None
+            collected_website_data.carry_forward = unchanged
+            if unchanged:
+                logging.info("Carrying forward unchanged \t %s", str(unchanged))
+            if not {"languages", "libraries", "web_assembly"}.issubset(unchanged):
+                snapshot = fetch_script_sources(snapshot=snapshot, fetcher=self.fetcher_)
+
+            # ad tracking information
+            collected_website_data.ad_tracking = find_ad_tracking(snapshot)
             logging.info("Found ad_tracking \t\t %s", str(collected_website_data.ad_tracking.used))
-            #time.sleep(0.5)
 
             # HTML src tag information
             html_extr = HTMLTagExtractor()
-            src_lang_analyzer = SrcLanguageAnalyzer(driver=driver)
-            script_inner_html, script_src_link, script_type = html_extr.extract_script_tag_attribute_info(
-                elements=driver.find_elements_by_tag_name("script"))
-            collected_website_data.languages = src_lang_analyzer.get_analysed_src_lang(
-                script_inner_html=script_inner_html, script_src=script_src_link, script_type=script_type,
-                prev_found_lang=collected_website_data.languages)
-            collected_website_data.libraries = src_lang_analyzer.get_analysed_src_lib(
-                script_src=script_src_link, prev_found_lib=collected_website_data.libraries)
+            src_lang_analyzer = SrcLanguageAnalyzer(snapshot=snapshot, classifier=self.classifier_)
+            script_inner_html, script_src_link, script_type = html_extr.get_script_tag_attribute_info(
+                scripts=list(snapshot.scripts))
+            if "languages" not in unchanged:
+                collected_website_data.languages = src_lang_analyzer.get_analysed_src_lang(
+                    script_inner_html=script_inner_html, script_src=script_src_link, script_type=script_type,
+                    prev_found_lang=collected_website_data.languages)
+            if "libraries" not in unchanged:
+                collected_website_data.libraries = src_lang_analyzer.get_analysed_src_lib(
+                    script_src=script_src_link, prev_found_lib=collected_website_data.libraries)
             logging.info("Found libraries \t\t\t %s", str([i["name"] for i in collected_website_data.libraries]))
             logging.info("Found languages \t\t\t %s", str(collected_website_data.languages))
             logging.info("Found frameworks \t\t\t %s", str([i["name"] for i in collected_website_data.frameworks]))
-            driver.get(url)
 
-            webassembly_analyzer = WebAssemblyAnalyzer(driver=driver,
-                                                       default_directory_path=self.config_["crawler"]["download.default_directory"])
             # Web Assembly information
-            collected_website_data.web_assembly.update_info(
-                wasm_res_=webassembly_analyzer.analyze_script_src_for_wasm(script_files=script_src_link))
-            logging.info("Found web_assembly \t\t %s", str(collected_website_data.web_assembly.used))
-            driver.get(url)
+            if "web_assembly" not in unchanged:
+                webassembly_analyzer = WebAssemblyAnalyzer(snapshot=snapshot, downloader=self.downloader_,
+                                                           deep_analysis=self.config_["crawler"]["wasm_deep_analysis"])
+                collected_website_data.web_assembly.update_info(
+                    wasm_res_=webassembly_analyzer.analyze_script_src_for_wasm(script_files=script_src_link))
+                logging.info("Found web_assembly \t\t %s", str(collected_website_data.web_assembly.used))
 
             # link tag information
-            # link_tag_data = html_extr.extract_hyperlink_info(self.dbm_, driver.find_elements_by_tag_name("link"))
+            # link_tag_data = html_extr.get_hyperlink_info(self.dbm_, list(snapshot.links))
             # logging.info("Found link_tag_data \t\t %s", str(len(link_tag_data)))
 
-            # HTML hyperlink tag information
-            hyperlink_tag_data = html_extr.extract_hyperlink_info(dbm=self.dbm_, elements=driver.find_elements_by_tag_name("a"))
+            # HTML hyperlink tag information, unchanged hyperlinks are not written again
+            hyperlink_tag_data = html_extr.get_hyperlink_info(dbm=self.dbm_, anchors=list(snapshot.anchors))
             logging.info("Found hyperlink_tag_data \t %s", str(len(hyperlink_tag_data)))
-            collected_website_data.hyperlink = hyperlink_tag_data
+            collected_website_data.hyperlink = hyperlink_tag_data if "hyperlink" not in unchanged else []
         finally:
             logging.info("\t\t\t\t\t\t\t-------->  Finished Crawling of %s. Collected all data", url)
             self.dbm_.insert_data_in_db(data=collected_website_data)
-        hrf = [i["href"] for i in collected_website_data.hyperlink if "href" in i.keys()]
+        hrf = [i["href"] for i in hyperlink_tag_data if "href" in i.keys()]
         return [i for i in hrf if self.check_url_validity(url_=i)]
 
     @staticmethod
@@ -222,7 +357,7 @@ class WebCrawler:
 
     def set_default_dir(self):
         if not os.environ.get(self.config_["docker"]["env_var"], False):
-            default_directory = os.getcwd() + "\\" + self.config_["crawler"]["download.default_directory"] + "\\"
+            default_directory = os.path.join(os.getcwd(), self.config_["crawler"]["download.default_directory"], "")
             self.config_["chrome"]["prefs"]["download.default_directory"] = default_directory
         else:
             default_directory = "/WebCrawler/" + self.config_["crawler"]["download.default_directory"] + "/"
@@ -234,18 +369,14 @@ class WebCrawler:
             Start the crawling loop
         """
         logging.getLogger().setLevel(level=logging.INFO)
-        executor = ThreadPoolExecutor(self.config_["crawler"]["num_threads"])
 
         self.set_default_dir()
+        self.downloader_ = WasmDownloader(fetcher=self.fetcher_,
+                                          directory=self.config_["crawler"]["download.default_directory"],
+                                          max_bytes=self.config_["crawler"]["wasm_max_bytes"])
         chrome_options_ = self.set_up_chrome_options(_config=self.config_["chrome"])
 
-        loop_ = asyncio.get_event_loop()
         input_urls = read_input(path=self.config_["input_file"]["name"],
                                 prefix=self.config_["input_file"]["prefix"],
                                 suffix=self.config_["input_file"]["suffix"])
-        for url_ in input_urls:
-            if not self.dbm_.check_if_already_visited(url=url_):
-                self.scrape(executor=executor, chrome_options=chrome_options_, url=url_, loop=loop_)
-            else:
-                logging.info("Skipping already visited url: %s", url_)
-        loop_.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop_)))
+        asyncio.run(self.run_frontier(input_urls=input_urls, chrome_options=chrome_options_))
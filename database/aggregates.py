@@ -0,0 +1,39 @@
+import logging
+import sqlite3
+
+# day of a website in WasmDailyCount, websites without visit date are counted under ''
+WEBSITE_DAY = "IFNULL(visited, '')"
+HAS_WASM = "EXISTS (SELECT 1 FROM WebAssembly WHERE WebAssembly.website_id = {0}.website_id AND WebAssembly.used = 1)"
+
+# summary tables and the statements computing them from scratch, the triggers created by migration 6 keep them up to
+# date inside the transaction of every insert
+AGGREGATE_TABLES = [
+    ("FrameworkCount", """INSERT INTO FrameworkCount SELECT framework_id, COUNT(*) FROM ContainsFra
+                          GROUP BY framework_id;"""),
+    ("LibraryCount", """INSERT INTO LibraryCount SELECT library_id, COUNT(*) FROM ContainsLib GROUP BY library_id;"""),
+    ("LanguageCount", """INSERT INTO LanguageCount SELECT language_id, COUNT(*) FROM ImplementsLang
+                         GROUP BY language_id;"""),
+    ("WasmDailyCount", "INSERT INTO WasmDailyCount SELECT " + WEBSITE_DAY + ", COUNT(*), SUM(" +
+     HAS_WASM.format("Website") + ") FROM Website GROUP BY " + WEBSITE_DAY + ";"),
+]
+
+
+def rebuild_aggregates(connection: sqlite3.Connection) -> dict:
+    """
+    Recompute all summary tables from the crawl data in one transaction
+    :param connection: sqlite3 write connection
+    :return: number of rows per summary table
+    """
+    counts = {}
+    connection.execute("BEGIN IMMEDIATE;")
+    try:
+        for table, statement in AGGREGATE_TABLES:
+            connection.execute("DELETE FROM " + table + ";")
+            connection.execute(statement)
+            counts[table] = connection.execute("SELECT COUNT(*) FROM " + table + ";").fetchone()[0]
+        connection.commit()
+    except sqlite3.Error:
+        connection.rollback()
+        raise
+    logging.info("\t\t\t\t\t\t\t-------->  Rebuilt aggregate tables: %s", str(counts))
+    return counts
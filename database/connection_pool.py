@@ -0,0 +1,102 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+# pragmas only applied to write connections, the journal mode is stored in the database file
+WRITE_PRAGMAS = ["journal_mode", "synchronous"]
+
+
+class ConnectionPool:
+    def __init__(self, path: str, timeout: float, pragmas: dict = None, read_only: bool = False):
+        """
+        SQLite connection layer with separate write connections and persistent per-thread read connections
+        :param path: path of the database
+        :param timeout: seconds to wait for a lock
+        :param pragmas: pragmas applied to each new connection, e.g. journal_mode, synchronous, cache_size, mmap_size
+        and temp_store
+        :param read_only: open the read connections with a mode=ro URI, the database file is opened read-only by
+        SQLite itself instead of only refusing writes per connection
+        """
+        self.path = path
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.read_only = read_only
+        self.local = threading.local()
+        self.read_connections = []
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    def apply_pragmas(self, connection: sqlite3.Connection, write: bool):
+        for name, value in self.pragmas.items():
+            if write or name not in WRITE_PRAGMAS:
+                connection.execute("PRAGMA " + name + "=" + str(value) + ";")
+
+    def open_write(self) -> sqlite3.Connection:
+        """
+        Open a new write connection, the caller closes it
+        :return: sqlite3 connection
+        """
+        connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        self.apply_pragmas(connection=connection, write=True)
+        return connection
+
+    def open_read(self) -> sqlite3.Connection:
+        """
+        Open a new read connection, the caller closes it
+        :return: sqlite3 connection which refuses writes
+        """
+        if self.read_only:
+            connection = sqlite3.connect(Path(self.path).resolve().as_uri() + "?mode=ro", timeout=self.timeout,
+                                         check_same_thread=False, uri=True)
+        else:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        self.apply_pragmas(connection=connection, write=False)
+        connection.execute("PRAGMA query_only=1;")
+        return connection
+
+    def read(self) -> sqlite3.Connection:
+        """
+        Persistent read connection of the current thread
+        :return: sqlite3 connection which refuses writes
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.open_read()
+            self.local.connection = connection
+            with self.lock:
+                self.read_connections.append(connection)
+        return connection
+
+    @contextmanager
+    def borrow(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read connection for servers which handle each request in a new thread, the connections stay open
+        and are reused by later requests
+        :return: sqlite3 connection which refuses writes
+        """
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            connection = self.open_read()
+            with self.lock:
+                self.read_connections.append(connection)
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+            self.idle.put(connection)
+
+    def close(self):
+        """
+        Close all read connections
+        """
+        with self.lock:
+            for connection in self.read_connections:
+                connection.close()
+            self.read_connections = []
+        self.local = threading.local()
+        self.idle = queue.LifoQueue()
@@ -1,27 +1,143 @@
+import glob
 import json
+import os
 import sqlite3
 import logging
 import traceback
 from datetime import datetime
-from typing import Any
-
+from typing import Any, Callable, List
+
+from database.connection_pool import ConnectionPool
+from database.db_writer import DatabaseWriter
+from database.frontier_store import FrontierStore
+from database.hyperlink_store import anchor_text, anchor_text_id, canonical_url, url_id
+from database.migrations import migrate
+from database.result_sink import ResultSink
+from database.visited_index import VisitedIndex
 from utility.website_data import WebsiteData
 
-
-class DatabaseManager:
-    def __init__(self, set_up: bool, path: str, timeout=10):
+# lowest default SQLite limit of host parameters per statement
+SQLITE_MAX_VARIABLES = 999
+# rows linked to a website per analyzer: table, website column and copied columns, see carry_forward_rows
+CARRY_FORWARD_TABLES = {
+    "hyperlink": ("HasHyperlink", "website_id", ["url_id", "anchor_text_id"]),
+    "languages": ("ImplementsLang", "website_id", ["language_id"]),
+    "libraries": ("ContainsLib", "website_id", ["library_id"]),
+    "frameworks": ("ContainsFra", "website_id", ["framework_id"]),
+    "web_assembly": ("WebAssembly", "website_id", ["web_assembly_file_id", "used", "use_case"]),
+    "ad_tracking": ("AdTracking", "website_id_", ["used", "cookies", "tracking_pixel", "utm_links"]),
+}
+
+
+class DatabaseManager(ResultSink):
+    def __init__(self, set_up: bool, path: str, timeout=10, visited_index: VisitedIndex = None, pragmas: dict = None,
+                 shard: str = None):
+        """
+        :param set_up: create the tables and apply missing migrations
+        :param path: path of the main database
+        :param timeout: seconds to wait for a lock
+        :param visited_index: optional in memory VisitedIndex
+        :param pragmas: pragmas applied to each connection
+        :param shard: write the crawl results into the shard database of this name next to the main database, the
+        main database is only shared for the crawl frontier
+        """
+        if shard is not None and set_up:
+            DatabaseManager(set_up=True, path=path, timeout=timeout, pragmas=pragmas)
         self.c = None
-        self.path = path
+        self.path = self.get_shard_path(path=path, shard=shard)
         self.timeout = timeout
+        self.pragmas = pragmas
+        self.connections = ConnectionPool(path=self.path, timeout=timeout, pragmas=pragmas)
+        self.shared_connections = self.connections if shard is None else \
+            ConnectionPool(path=path, timeout=timeout, pragmas=pragmas)
+        self.visited_index = visited_index
+        self.writer = None
         self.connect()
         logging.info("\t\t\t\t\t\t\t-------->  Init DatabaseManager")
         if set_up:
             self.set_up_tables()
             logging.info("\t\t\t\t\t\t\t-------->  DB setup Tables")
+            logging.info("\t\t\t\t\t\t\t-------->  DB schema version %s", str(migrate(self.c)))
+        if self.visited_index is not None:
+            self.load_visited_index()
         self.disconnect()
 
+    @staticmethod
+    def get_shard_path(path: str, shard: str = None) -> str:
+        """
+        Path of a shard database, e.g. ./database/website_data.worker1.db
+        :param path: path of the main database
+        :param shard: shard name
+        :return: shard path, the main path without shard
+        """
+        if shard is None:
+            return path
+        root, ext = os.path.splitext(path)
+        return root + "." + shard + ext
+
+    @staticmethod
+    def get_shard_paths(path: str) -> List[str]:
+        """
+        Find all shard databases of a main database
+        :param path: path of the main database
+        :return: shard paths
+        """
+        root, ext = os.path.splitext(path)
+        return sorted(glob.glob(glob.escape(root) + ".*" + ext))
+
+    def load_visited_index(self):
+        """
+        Fill the in memory visited index once with all urls of the Website table. A shard also loads the urls of the
+        main database and of the other shards, so pages crawled by another container are not crawled again.
+        """
+        self.add_visited_urls(connection=self.c)
+        if self.shared_connections is not self.connections:
+            for path in [self.shared_connections.path] + self.get_shard_paths(self.shared_connections.path):
+                if path == self.path:
+                    continue
+                connection = ConnectionPool(path=path, timeout=self.timeout, pragmas=self.pragmas).open_read()
+                try:
+                    self.add_visited_urls(connection=connection)
+                except sqlite3.OperationalError as e:
+                    # e.g. a shard which is still being set up
+                    logging.info("Skipping the visited urls of %s: %s", path, e)
+                finally:
+                    connection.close()
+        logging.info("\t\t\t\t\t\t\t-------->  Loaded visited index (%s)", self.visited_index.mode)
+
+    def add_visited_urls(self, connection: sqlite3.Connection):
+        cur = connection.execute("""SELECT url FROM Website;""")
+        while True:
+            rows = cur.fetchmany(10000)
+            if not rows:
+                break
+            self.visited_index.update(i[0] for i in rows if i[0])
+
+    def start_writer(self, queue_size: int, batch_size: int, commit_interval: float):
+        """
+        Hand all inserts to a single DatabaseWriter thread with its own connection and group commits
+        :param queue_size: maximum number of waiting records
+        :param batch_size: commit after this many records
+        :param commit_interval: commit at the latest after this many seconds
+        """
+        self.writer = DatabaseWriter(dbm=DatabaseManager(set_up=False, path=self.path, timeout=self.timeout,
+                                                         pragmas=self.pragmas),
+                                     queue_size=queue_size, batch_size=batch_size, commit_interval=commit_interval)
+        self.writer.start()
+
+    def close(self):
+        """
+        Flush the records waiting in the DatabaseWriter and close the read connections
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.connections.close()
+        if self.shared_connections is not self.connections:
+            self.shared_connections.close()
+
     def connect(self):
-        self.c = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        self.c = self.connections.open_write()
         # logging.info("\t\t\t\t\t\t\t-------->  Connected DatabaseManager")
 
     def disconnect(self):
@@ -40,98 +156,50 @@ class DatabaseManager:
         column_names = dbm.select(select_statement="PRAGMA table_info(Website);")
         rows = dbm.select(select_statement="SELECT * FROM Website WHERE root=?;", args=("input_file",))
         """
-        self.connect()
-        cur = self.c.cursor()
+        cur = self.connections.read().cursor()
         if args:
             cur.execute(select_statement, args)
         else:
             cur.execute(select_statement)
-        rows = cur.fetchall()
-        self.disconnect()
-        return rows
+        return cur.fetchall()
 
     def check_if_already_visited(self, url) -> bool:
         """
-        Check if url was already visited before
+        Check if url was already visited before, answered from the visited index without I/O if it is set up. Without
+        the index a shard also checks the main database.
         :param url: current url to crawl
         :return: bool if true or not
         """
-        self.connect()
-        cur = self.c.cursor()
         if url[-1] == "/":
             url = url[:-1]
-        cur.execute("""SELECT website_id FROM Website WHERE url=?;""", (url,))
-        res = cur.fetchall()
-        self.disconnect()
-        if len(res) > 0:
-            return True
-        else:
-            return False
+        if self.visited_index is not None:
+            return url in self.visited_index
+        for connections in dict.fromkeys([self.connections, self.shared_connections]):
+            cur = connections.read().cursor()
+            cur.execute("""SELECT website_id FROM Website WHERE url=?;""", (url,))
+            if len(cur.fetchall()) > 0:
+                return True
+        return False
 
     def insert_data_in_db(self, data: WebsiteData):
         """
         Insert Website data into the website.
-        First check for duplicates in the table either insert data in table and return new id or return id of existing entry.
+        All rows of the website are written in one transaction, existing entries are reused and the ids are resolved in bulk.
+        With a running DatabaseWriter the data is only enqueued, blocking while the queue is full.
         :param data: website data
         """
+        if not self.is_complete(data):
+            return
+        if self.writer is not None:
+            if self.visited_index is not None:
+                self.visited_index.add(data.url)
+            self.writer.put(data)
+            return
         try:
             self.connect()
-            if data.name and data.url and data.libraries != "None" and data.languages != "None" and data.frameworks != "None" and data.hyperlink != "None":
-                self.check_if_already_visited_hy(url=data.url)
-                hy_ids = [
-                    self.check_hy_table(url=i["href"], inner_html=i["innerHTML"], already_visited=i["already_visited"])
-                    for i in data.hyperlink if "href" in i.keys()]
-                la_ids = [self.check_src_lang_table(name=i) for i in data.languages]
-                li_ids = [self.check_library_table(name=i["name"], url=i["website"], category=i["category_name"],
-                                                   confidence=i["confidence"], version=i["version"]) for i in
-                          data.libraries]
-                fr_ids = [self.check_framework_table(name=i["name"], url=i["website"], category=i["category_name"],
-                                                     confidence=i["confidence"], version=i["version"]) for i in
-                          data.frameworks]
-                wa_file_ids = [self.check_web_assembly_file_table(local_file_name=file.wasm_file_local_name,
-                                                                  source_file_name=file.source_wasm_name,
-                                                                  source_js_name=file.source_js_name,
-                                                                  file_size=file.file_size,
-                                                                  imports=file.imports,
-                                                                  exports=file.exports,
-                                                                  tables=file.tables,
-                                                                  memory=file.memory,
-                                                                  num_global=file.num_global,
-                                                                  num_func=file.num_func,
-                                                                  num_type=file.num_type)
-                               for files in data.web_assembly.wasm_files for file in files]
-
-                wa_func_ids = [self.check_webassemblyFunc_table(function_=fun) for files in data.web_assembly.wasm_files
-                               for file in files for fun in file.webassembly_func]
-
-                for wa_func_id in wa_func_ids:
-                    for wa_file_id in wa_file_ids:
-                        self.check_has_webassemblyFunc_table(web_assembly_func_id=wa_func_id,
-                                                             web_assembly_file_id=wa_file_id)
-
-                website_data_id = self.check_website_data_table(name=data.name, url=data.url, root=data.root,
-                                                                date=datetime.today().strftime('%Y-%m-%d'))
-
-                self.check_AdTracking_table(used=data.ad_tracking.used,
-                                            cookies=data.ad_tracking.cookies,
-                                            tracking_pixel=data.ad_tracking.tracking_pixel,
-                                            utm_links=data.ad_tracking.utm_links,
-                                            website_id_=website_data_id)
-
-                for wa_file_id in wa_file_ids:
-                    self.check_web_assembly_table(web_assembly_file_id=wa_file_id, website_id=website_data_id,
-                                                  used=data.web_assembly.used, use_case=data.web_assembly.use_case)
-                for hy_id in hy_ids:
-                    self.check_has_hy_table(website_id=website_data_id, hyperlink_id=hy_id)
-                for li_id in li_ids:
-                    self.check_contains_lib_table(website_id=website_data_id, library_id=li_id)
-                for la_id in la_ids:
-                    self.check_implements_lang_table(website_id=website_data_id, language_id=la_id)
-                for fr_id in fr_ids:
-                    self.check_contains_fra_table(website_id=website_data_id, framework_id=fr_id)
-
-                # print(website_data_id)
-                logging.info("\t\t\t\t\t\t\t-------->  Successfully inserted website data for %s", data.url)
+            with self.c:
+                self.bulk_insert_website_data(data=data)
+            logging.info("\t\t\t\t\t\t\t-------->  Successfully inserted website data for %s", data.url)
         except sqlite3.Error as error:
             logging.info("Database Error %s", error)
         except Exception as ex:
@@ -139,83 +207,225 @@ class DatabaseManager:
             logging.info(traceback.format_exc())
         self.disconnect()
 
-    def check_if_already_visited_hy(self, url):
-        select_cursor = self.c.cursor()
-        select_cursor.execute(
-            """SELECT hyperlink_id FROM Hyperlink WHERE url=? AND already_visited=?;""", (url, self.get_sql_bool_val(False)))
-        res = select_cursor.fetchall()
-        if len(res) > 0:
-            select_cursor.execute("""UPDATE Hyperlink SET already_visited=? WHERE hyperlink_id=?;""",
-                                  (self.get_sql_bool_val(True), res[0][0]))
+    def when_stored(self, url: str, callback: Callable[[bool], None]):
+        """
+        Run a callback once the data of a url is committed, with a running DatabaseWriter after its group commit
+        :param url: url of the inserted website data
+        :param callback: called with True if the data was committed, False if its insert failed
+        """
+        if self.writer is not None:
+            self.writer.when_stored(url=url, callback=callback)
+        else:
+            callback(True)
 
-    def insert_contains_lib(self, website_id: int, library_id: int) -> int:
-        ex = self.c.execute("INSERT INTO ContainsLib VALUES (?, ?)", (website_id, library_id))
-        return ex.lastrowid
+    def flush(self):
+        """
+        Wait until the DatabaseWriter committed all queued website data
+        """
+        if self.writer is not None:
+            self.writer.flush()
 
-    def insert_has_hy(self, website_id: int, hyperlink_id: int) -> int:
-        ex = self.c.execute("INSERT INTO HasHyperlink VALUES (?, ?)", (website_id, hyperlink_id))
-        return ex.lastrowid
+    @staticmethod
+    def is_complete(data: WebsiteData) -> bool:
+        """
+        Check if all analyzers filled the website data
+        :param data: website data
+        :return: bool if complete or not
+        """
+        return bool(data.name and data.url and data.libraries != "None" and data.languages != "None"
+                    and data.frameworks != "None" and data.hyperlink != "None")
 
-    def insert_implements_lang(self, website_id: int, language_id: int) -> int:
-        ex = self.c.execute("INSERT INTO ImplementsLang VALUES (?, ?)", (website_id, language_id))
-        return ex.lastrowid
+    def bulk_insert_website_data(self, data: WebsiteData) -> int:
+        """
+        Write all rows of one website with one executemany per table, has to run inside a transaction
+        :param data: website data
+        :return: website id
+        """
+        self.c.execute("""UPDATE Url SET already_visited=? WHERE url_id=?;""",
+                       (self.get_sql_bool_val(True), url_id(data.url)))
+        hyperlinks = [i for i in data.hyperlink if "href" in i.keys()]
+        self.bulk_insert(table="Url", columns=["url_id", "url", "already_visited"],
+                         rows=[(url_id(i["href"]), canonical_url(i["href"]), self.get_sql_bool_val(i["already_visited"]))
+                               for i in hyperlinks])
+        self.c.executemany("""UPDATE Url SET already_visited=? WHERE url_id=?;""",
+                           [(self.get_sql_bool_val(True), url_id(i["href"])) for i in hyperlinks if i["already_visited"]])
+        self.bulk_insert(table="AnchorText", columns=["anchor_text_id", "text"],
+                         rows=[(anchor_text_id(i["innerHTML"]), anchor_text(i["innerHTML"])) for i in hyperlinks])
+        la_ids = self.bulk_ids(table="SrcLanguage", id_column="src_language_id", columns=["name_"],
+                               rows=[(i,) for i in data.languages])
+        li_ids = self.bulk_ids(table="Library", id_column="library_id",
+                               columns=["name_", "url", "category", "version", "confidence"],
+                               rows=[(i["name"], i["website"], i["category_name"], i["version"], i["confidence"])
+                                     for i in data.libraries])
+        fr_ids = self.bulk_ids(table="Framework", id_column="framework_id",
+                               columns=["name_", "url", "category", "version", "confidence"],
+                               rows=[(i["name"], i["website"], i["category_name"], i["version"], i["confidence"])
+                                     for i in data.frameworks])
+        wasm_files = [file for files in data.web_assembly.wasm_files for file in files]
+        wa_file_ids = self.bulk_ids(table="WebAssemblyFile", id_column="web_assembly_file_id",
+                                    columns=["local_file_name", "source_file_name", "source_js_name", "file_size",
+                                             "imports", "exports", "tables", "memory", "num_global", "num_func",
+                                             "num_type"],
+                                    rows=[(file.wasm_file_local_name, file.source_wasm_name, file.source_js_name,
+                                           file.file_size, file.imports, file.exports, file.tables, file.memory,
+                                           file.num_global, file.num_func, file.num_type) for file in wasm_files],
+                                    key_columns=["local_file_name", "source_file_name", "source_js_name"])
+        wa_func_ids = self.bulk_ids(table="WebAssemblyFunction", id_column="web_assembly_func_id",
+                                    columns=["function_"],
+                                    rows=[(fun,) for file in wasm_files for fun in file.webassembly_func])
+        self.bulk_insert(table="HasWebAssemblyFunction", columns=["web_assembly_func_id", "web_assembly_file_id"],
+                         rows=[(wa_func_id, wa_file_id) for wa_func_id in wa_func_ids for wa_file_id in wa_file_ids])
+
+        visited = data.visited or datetime.today().strftime('%Y-%m-%d')
+        website_data_id = self.bulk_ids(table="Website", id_column="website_id",
+                                        columns=["name_", "url", "root", "visited"],
+                                        rows=[(data.name, data.url, data.root, visited)],
+                                        key_columns=["name_", "url", "root"])[0]
+        self.c.execute("""UPDATE Website SET visited=? WHERE website_id=?;""", (visited, website_data_id))
+        if self.visited_index is not None:
+            self.visited_index.add(data.url)
+        self.carry_forward_rows(data=data, website_id=website_data_id)
+        if data.fingerprint is not None:
+            self.c.execute("""INSERT INTO PageFingerprint (url, website_id, html_hash, script_src_hash, etag,
+                              last_modified, checked, wappalyzer_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                              ON CONFLICT(url) DO UPDATE SET website_id=excluded.website_id,
+                              html_hash=excluded.html_hash, script_src_hash=excluded.script_src_hash,
+                              etag=excluded.etag, last_modified=excluded.last_modified, checked=excluded.checked,
+                              wappalyzer_hash=excluded.wappalyzer_hash;""",
+                           (data.url, website_data_id, data.fingerprint.html_hash, data.fingerprint.script_src_hash,
+                            data.fingerprint.etag, data.fingerprint.last_modified,
+                            datetime.now().isoformat(timespec="seconds"), data.fingerprint.wappalyzer_hash))
+
+        # the single ad tracking row of a visit is only written if it was not carried forward
+        if "ad_tracking" not in data.carry_forward:
+            self.bulk_ids(table="AdTracking", id_column="ad_tracking_id_",
+                          columns=["used", "cookies", "tracking_pixel", "utm_links", "website_id_"],
+                          rows=[(self.get_sql_bool_val(data.ad_tracking.used), data.ad_tracking.cookies,
+                                 data.ad_tracking.tracking_pixel, data.ad_tracking.utm_links, website_data_id)])
+        self.bulk_ids(table="WebAssembly", id_column="web_assembly_id",
+                      columns=["web_assembly_file_id", "website_id", "used", "use_case"],
+                      rows=[(wa_file_id, website_data_id, self.get_sql_bool_val(data.web_assembly.used),
+                             self.get_web_assembly_use_case(data.web_assembly.use_case)) for wa_file_id in wa_file_ids])
+        self.bulk_insert(table="HasHyperlink", columns=["website_id", "url_id", "anchor_text_id"],
+                         rows=[(website_data_id, url_id(i["href"]), anchor_text_id(i["innerHTML"])) for i in hyperlinks])
+        self.bulk_insert(table="ContainsLib", columns=["website_id", "library_id"],
+                         rows=[(website_data_id, li_id) for li_id in li_ids])
+        self.bulk_insert(table="ImplementsLang", columns=["website_id", "language_id"],
+                         rows=[(website_data_id, la_id) for la_id in la_ids])
+        self.bulk_insert(table="ContainsFra", columns=["website_id", "framework_id"],
+                         rows=[(website_data_id, fr_id) for fr_id in fr_ids])
+        return website_data_id
+
+    def carry_forward_rows(self, data: WebsiteData, website_id: int):
+        """
+        On a recrawl keep the rows of the analyzers whose inputs did not change, copied from the previous website id
+        if it differs, and delete the rows of all other analyzers so they are replaced by the new results
+        :param data: website data with previous_website_id and carry_forward set
+        :param website_id: website id of the current crawl
+        """
+        if data.previous_website_id is None:
+            return
+        for analyzer, (table, website_column, columns) in CARRY_FORWARD_TABLES.items():
+            if analyzer not in data.carry_forward:
+                self.c.execute("DELETE FROM " + table + " WHERE " + website_column + "=?;", (website_id,))
+            elif data.previous_website_id != website_id:
+                self.c.execute("INSERT INTO " + table + " (" + ", ".join(columns + [website_column]) + ") SELECT " +
+                               ", ".join(columns) + ", ? FROM " + table + " WHERE " + website_column +
+                               "=? ON CONFLICT DO NOTHING;", (website_id, data.previous_website_id))
+
+    def open_frontier(self, lease_seconds: float, reschedule_after: float = None) -> FrontierStore:
+        """
+        Persistent frontier in the main database, shared by all shards
+        :param lease_seconds: seconds a worker holds a claimed URL
+        :param reschedule_after: seconds after which a finished URL is scheduled again, never if not set
+        :return: FrontierStore
+        """
+        return FrontierStore(connections=self.shared_connections, lease_seconds=lease_seconds,
+                             reschedule_after=reschedule_after)
 
-    def insert_contains_fra(self, website_id: int, framework_id: int) -> int:
-        ex = self.c.execute("INSERT INTO ContainsFra VALUES (?, ?)", (website_id, framework_id))
-        return ex.lastrowid
+    def get_fingerprint(self, url: str) -> Any:
+        """
+        Fingerprint of the previous crawl of a page
+        :param url: page url
+        :return: dict with website_id, html_hash, script_src_hash, etag, last_modified, checked and wappalyzer_hash or None
+        """
+        cur = self.connections.read().cursor()
+        cur.execute("""SELECT website_id, html_hash, script_src_hash, etag, last_modified, checked, wappalyzer_hash
+                       FROM PageFingerprint WHERE url=?;""", (url,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip([i[0] for i in cur.description], row))
+
+    def get_hyperlink_urls(self, website_id: int) -> List[str]:
+        """
+        Stored hyperlinks of a website
+        :param website_id: website id
+        :return: urls
+        """
+        rows = self.select("""SELECT Url.url FROM HasHyperlink INNER JOIN Url ON Url.url_id = HasHyperlink.url_id
+                              WHERE HasHyperlink.website_id=?;""", (website_id,))
+        return list(dict.fromkeys(i[0] for i in rows))
 
-    def insert_website_data(self, name: str, url: str, root: str, date: str) -> int:
-        ex = self.c.execute("INSERT INTO Website VALUES (NULL, ?, ?, ?, ?)", (name, url, root, date))
-        return ex.lastrowid
+    def bulk_insert(self, table: str, columns: List[str], rows: List[tuple]):
+        """
+        Insert rows with one executemany, rows violating a unique constraint are skipped
+        :param table: table name
+        :param columns: inserted columns
+        :param rows: row values in the order of the columns
+        """
+        if rows:
+            self.c.executemany("INSERT INTO " + table + " (" + ", ".join(columns) + ") VALUES (" +
+                               ", ".join(["?"] * len(columns)) + ") ON CONFLICT DO NOTHING;", list(dict.fromkeys(rows)))
 
-    def insert_web_assembly_data(self, web_assembly_file_id: int, website_id: int, used: bool, use_case: str) -> int:
+    def bulk_ids(self, table: str, id_column: str, columns: List[str], rows: List[tuple],
+                 key_columns: List[str] = None) -> List[int]:
+        """
+        Insert the missing rows and resolve the ids of all rows in bulk
+        :param table: table name
+        :param id_column: primary key column
+        :param columns: inserted columns
+        :param rows: row values in the order of the columns
+        :param key_columns: columns identifying an existing row, all columns if not set
+        :return: ids in the order of the rows
+        """
+        if not rows:
+            return []
+        key_columns = key_columns or columns
+        key_index = [columns.index(i) for i in key_columns]
+        # matched with IS like the lookup below, a unique constraint alone would insert rows with NULL keys again
+        self.c.executemany("INSERT INTO " + table + " (" + ", ".join(columns) + ") SELECT " +
+                           ", ".join(["?"] * len(columns)) + " WHERE NOT EXISTS (SELECT 1 FROM " + table + " WHERE " +
+                           " AND ".join(i + " IS ?" for i in key_columns) + ") ON CONFLICT DO NOTHING;",
+                           [row + tuple(row[i] for i in key_index) for row in dict.fromkeys(rows)])
+        keys = list(dict.fromkeys(tuple(row[i] for i in key_index) for row in rows))
+        ids = {}
+        per_statement = max(1, SQLITE_MAX_VARIABLES // (len(key_columns) + 1))
+        for start in range(0, len(keys), per_statement):
+            chunk = keys[start:start + per_statement]
+            # the keys have no affinity, so they compare to the columns the same way as a "=?" parameter
+            cur = self.c.execute(
+                "WITH k(idx, " + ", ".join("c" + str(i) for i in range(len(key_columns))) + ") AS (VALUES " +
+                ", ".join(["(" + ", ".join(["?"] * (len(key_columns) + 1)) + ")"] * len(chunk)) + ") " +
+                "SELECT k.idx, MIN(t." + id_column + ") FROM k JOIN " + table + " AS t ON " +
+                " AND ".join("t." + column + " IS k.c" + str(i) for i, column in enumerate(key_columns)) +
+                " GROUP BY k.idx;",
+                [v for idx, key in enumerate(chunk, start) for v in (idx,) + key])
+            for idx, id_ in cur.fetchall():
+                ids[keys[idx]] = id_
+        return [ids[tuple(row[i] for i in key_index)] for row in rows if tuple(row[i] for i in key_index) in ids]
+
+    @staticmethod
+    def get_web_assembly_use_case(use_case: str) -> str:
+        """
+        Map a use case to one of the values of the WebAssembly use_case column
+        :param use_case: found use case
+        :return: use case value
+        """
         if use_case not in ['None', 'Game', 'Compression', 'Cryptographic Utility', 'Other Application',
                             'Image Processing']:
-            use_case = "Unknown"
-        ex = self.c.execute("INSERT INTO WebAssembly VALUES (NULL, ?, ?, ? ,?)", (web_assembly_file_id, website_id, self.get_sql_bool_val(used), use_case))
-        return ex.lastrowid
-
-    def insert_library_data(self, name: str, url: str, category: str, version: str, confidence: float) -> int:
-        ex = self.c.execute("INSERT INTO Library VALUES (NULL, ?, ?, ?, ?, ?)",
-                            (name, category, url, version, confidence))
-        return ex.lastrowid
-
-    def insert_framework_data(self, name: str, url: str, category: str, version: str, confidence: float) -> int:
-        ex = self.c.execute("INSERT INTO Framework VALUES (NULL, ?, ?, ?, ?, ?)",
-                            (name, category, url, version, confidence))
-        return ex.lastrowid
-
-    def insert_src_language_data(self, name: str) -> int:
-        ex = self.c.execute("INSERT INTO SrcLanguage VALUES (NULL, ?)", (name,))
-        return ex.lastrowid
-
-    def insert_hyperlink_data(self, inner_html: str, url: str, already_visited: bool) -> int:
-        ex = self.c.execute("INSERT INTO Hyperlink VALUES (NULL, ?, ?, ?)",
-                            (inner_html, url, self.get_sql_bool_val(already_visited)))
-        return ex.lastrowid
-
-    def insert_has_webassemblyFunc(self, web_assembly_func_id: int, web_assembly_file_id: int) -> int:
-        ex = self.c.execute("INSERT INTO HasWebAssemblyFunction VALUES (?, ?)",
-                            (web_assembly_func_id, web_assembly_file_id))
-        return ex.lastrowid
-
-    def insert_webassemblyFunc(self, function_: str) -> int:
-        ex = self.c.execute("INSERT INTO WebAssemblyFunction VALUES (NULL, ?)", (function_,))
-        return ex.lastrowid
-
-    def insert_web_assembly_file_data(self, local_file_name: str, source_file_name: str, source_js_name: str,
-                                      file_size: int, imports: str, exports: str, tables: str,
-                                      memory: str, num_global: int, num_func: int, num_type: int) -> int:
-        ex = self.c.execute("INSERT INTO WebAssemblyFile VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                            (local_file_name, source_file_name, source_js_name, file_size, imports, exports,
-                             tables, memory, num_global, num_func, num_type))
-        return ex.lastrowid
-
-    def insert_adTracking(self, used: bool, cookies: str, tracking_pixel: str, utm_links: str, website_id_: int) -> int:
-        ex = self.c.execute("INSERT INTO AdTracking VALUES (NULL, ?, ?, ?, ?, ?)", (self.get_sql_bool_val(used),
-                                                                                    cookies, tracking_pixel, utm_links,
-                                                                                    website_id_))
-        return ex.lastrowid
+            return "Unknown"
+        return use_case
 
     @staticmethod
     def get_sql_bool_val(val_: bool) -> int:
@@ -229,145 +439,8 @@ class DatabaseManager:
         else:
             return 0
 
-    @staticmethod
-    def check_if_null(val_: Any) -> str:
-        """
-        Check if a entry vale is None or not and add accordingly to SELECT statement
-        :param val_: input value
-        :return: string value
-        """
-        if val_ is None:
-            return " IS NULL"
-        else:
-            return "=" + str(val_)
-
-    @staticmethod
-    def check_duplicates(res: list, func: Any, args: Any) -> int:
-        """
-        Check if a duplicate exist in a table, return either id of existing entry or insert data and return the id of new entry
-        :param res: list of id of entries in the table
-        :param func: insert function to insert data into table
-        :param args: arguments for the insert function
-        :return: row id in database
-        """
-        if len(res) > 0:
-            # print("found id:", res[0][0], "for:", func.__name__)
-            return res[0][0]
-        else:
-            return func(*args)
-
-    def check_hy_table(self, inner_html: str, url: str, already_visited: bool) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute(
-            """SELECT hyperlink_id FROM Hyperlink WHERE url=? AND inner_html=?;""",
-            (url, inner_html))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_hyperlink_data, args=(inner_html, url, already_visited))
-
-    def check_src_lang_table(self, name: str) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT src_language_id FROM SrcLanguage WHERE name_=?;""", (name,))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_src_language_data, args=(name,))
-
-    def check_library_table(self, name: str, url: str, category: str, version: str, confidence: float) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute(
-            """SELECT library_id FROM Library WHERE name_=? AND url=? AND category=? AND version=? AND confidence=?;""",
-            (name, url, category, version, confidence))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_library_data, args=(name, url, category, version, confidence))
-
-    def check_framework_table(self, name: str, url: str, category: str, version: str, confidence: float) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute(
-            """SELECT framework_id FROM Framework WHERE name_=? AND url=? AND category=? AND version=? AND confidence=?;""",
-            (name, url, category, version, confidence))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_framework_data, args=(name, url, category, version, confidence))
-
-    def check_web_assembly_table(self, web_assembly_file_id: int, website_id: int, used: bool, use_case: str) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute(
-            """SELECT web_assembly_id FROM WebAssembly WHERE web_assembly_file_id=? AND website_id=? AND used=? AND use_case=? ;""",
-            (web_assembly_file_id, website_id, self.get_sql_bool_val(used), use_case))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_web_assembly_data, args=(web_assembly_file_id, website_id,
-                                                                                        used, use_case))
-
-    def check_web_assembly_file_table(self, local_file_name: str, source_file_name: str, source_js_name: str,
-                                      file_size: int, imports: str, exports: str, tables: str, memory: str, num_global: int,
-                                      num_func: int, num_type: int) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute(
-            """SELECT web_assembly_file_id FROM WebAssemblyFile WHERE local_file_name=? AND source_file_name=? AND 
-            source_js_name=? AND file_size=? AND imports=? AND exports=? AND tables=? AND memory=? AND num_global=? AND
-            num_func=? AND num_type=?;""", (local_file_name, source_file_name, source_js_name, file_size, imports,
-                                            exports, tables, memory, num_global, num_func, num_type))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_web_assembly_file_data,
-                                     args=(local_file_name, source_file_name, source_js_name, file_size,
-                                           imports, exports, tables, memory, num_global, num_func, num_type))
-
-    def check_website_data_table(self, name: str, url: str, root: str, date: str) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT website_id FROM Website WHERE name_=? AND url=? AND root=? AND visited=?;""",
-                              (name, url, root, date))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_website_data, args=(name, url, root, date))
-
-    def check_contains_lib_table(self, website_id: int, library_id: int) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT * FROM ContainsLib WHERE website_id=? AND library_id=?;""",
-                              (website_id, library_id))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_contains_lib, args=(website_id, library_id))
-
-    def check_implements_lang_table(self, website_id: int, language_id: int) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT * FROM ImplementsLang WHERE website_id=? AND language_id=?;""",
-                              (website_id, language_id))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_implements_lang, args=(website_id, language_id))
-
-    def check_contains_fra_table(self, website_id: int, framework_id: int) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT * FROM ContainsFra WHERE website_id=? AND framework_id=?;""",
-                              (website_id, framework_id))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_contains_fra, args=(website_id, framework_id))
-
-    def check_has_hy_table(self, website_id: int, hyperlink_id: int) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT * FROM HasHyperlink WHERE website_id=? AND hyperlink_id=?;""",
-                              (website_id, hyperlink_id))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_has_hy, args=(website_id, hyperlink_id))
-
-    def check_has_webassemblyFunc_table(self, web_assembly_func_id: int, web_assembly_file_id: int) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute(
-            """SELECT * FROM HasWebAssemblyFunction WHERE web_assembly_func_id=? AND web_assembly_file_id=?;""",
-            (web_assembly_func_id, web_assembly_file_id))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_has_webassemblyFunc,
-                                     args=(web_assembly_func_id, web_assembly_file_id))
-
-    def check_webassemblyFunc_table(self, function_: str) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT * FROM WebAssemblyFunction WHERE function_=?;""", (function_,))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_webassemblyFunc, args=(function_,))
-
-    def check_AdTracking_table(self, used: bool, cookies: str, tracking_pixel: str, utm_links: str, website_id_: int) -> int:
-        select_cursor = self.c.cursor()
-        select_cursor.execute("""SELECT * FROM AdTracking WHERE used=? AND cookies=? AND tracking_pixel=? AND utm_links=? AND 
-        website_id_=?;""", (self.get_sql_bool_val(used), cookies, tracking_pixel, utm_links, website_id_))
-        res = select_cursor.fetchall()
-        return self.check_duplicates(res=res, func=self.insert_adTracking, args=(used, cookies, tracking_pixel,
-                                                                                 utm_links, website_id_))
-
     def set_up_tables(self):
+        # schema version 0, later changes are applied by the migrations in ./database/migrations.py
         self.c.execute('''CREATE TABLE IF NOT EXISTS Website (
                            website_id INTEGER PRIMARY KEY,
                            name_ TEXT,
@@ -0,0 +1,135 @@
+import logging
+import queue
+import threading
+import time
+import traceback
+from collections import namedtuple
+from typing import Any, Callable, List, Set
+
+from utility.website_data import WebsiteData
+
+STOP = object()
+# queued behind the records of a url, its callback runs once the group commit containing them is finished
+Marker = namedtuple("Marker", ["url", "callback"])
+
+
+class DatabaseWriter(threading.Thread):
+    def __init__(self, dbm: Any, queue_size: int, batch_size: int, commit_interval: float):
+        """
+        Single writer thread owning the only write connection. Crawler threads enqueue WebsiteData and continue, the
+        writer commits the records in groups.
+        :param dbm: DatabaseManager used only by this thread
+        :param queue_size: maximum number of waiting records, put blocks while the queue is full
+        :param batch_size: commit after this many records
+        :param commit_interval: commit at the latest after this many seconds
+        """
+        super().__init__(name="DatabaseWriter", daemon=True)
+        self.dbm = dbm
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.stopped = False
+
+    def put(self, data: WebsiteData):
+        """
+        Enqueue a record, blocks while the queue is full
+        :param data: website data
+        """
+        self.queue.put(data)
+
+    def when_stored(self, url: str, callback: Callable[[bool], None]):
+        """
+        Run a callback in the writer thread once the records enqueued so far are committed
+        :param url: url of the enqueued website data
+        :param callback: called with True if the data of the url was committed, False if its insert failed
+        """
+        self.queue.put(Marker(url=url, callback=callback))
+
+    def flush(self):
+        """
+        Block until all records enqueued so far are committed and their callbacks ran
+        """
+        flushed = threading.Event()
+        self.when_stored(url=None, callback=lambda stored: flushed.set())
+        flushed.wait()
+
+    def next_batch(self) -> List[WebsiteData]:
+        """
+        Wait for the next record and collect more until the batch is full or the commit interval passed
+        :return: records and markers of the group commit
+        """
+        batch = []
+        item = self.queue.get()
+        deadline = time.monotonic() + self.commit_interval
+        while item is not STOP:
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            # the marker of a flush, without url, commits the batch at once
+            flushed = isinstance(item, Marker) and item.url is None
+            if len(batch) >= self.batch_size or remaining <= 0 or flushed:
+                return batch
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch
+        self.stopped = True
+        return batch
+
+    def commit_batch(self, batch: List[Any]):
+        """
+        Write the records of a group and run the callbacks of its markers afterwards
+        :param batch: records and markers of the group commit
+        """
+        failed = self.write_records([i for i in batch if not isinstance(i, Marker)])
+        for marker in batch:
+            if isinstance(marker, Marker):
+                try:
+                    marker.callback(marker.url not in failed)
+                except Exception as ex:
+                    logging.info("Exception %s in the stored callback of %s", ex, marker.url)
+                    logging.info(traceback.format_exc())
+
+    def write_records(self, batch: List[WebsiteData]) -> Set[str]:
+        """
+        Write a group of records in one transaction, if it fails every record is retried in its own transaction
+        :param batch: records of the group commit
+        :return: urls of the records which could not be written
+        """
+        failed = set()
+        if not batch:
+            return failed
+        try:
+            with self.dbm.c:
+                for data in batch:
+                    self.dbm.bulk_insert_website_data(data=data)
+            logging.info("\t\t\t\t\t\t\t-------->  Committed website data for %s", str([i.url for i in batch]))
+            return failed
+        except Exception as ex:
+            logging.info("Database Exception %s in group commit, retrying records one by one", ex)
+        for data in batch:
+            try:
+                with self.dbm.c:
+                    self.dbm.bulk_insert_website_data(data=data)
+            except Exception as ex:
+                logging.info("Database Exception %s for %s", ex, data.url)
+                logging.info(traceback.format_exc())
+                failed.add(data.url)
+        return failed
+
+    def run(self):
+        self.dbm.connect()
+        try:
+            while not self.stopped:
+                batch = self.next_batch()
+                if batch:
+                    self.commit_batch(batch)
+        finally:
+            self.dbm.disconnect()
+
+    def close(self):
+        """
+        Write all waiting records and stop the thread
+        """
+        self.queue.put(STOP)
+        self.join()
+        logging.info("\t\t\t\t\t\t\t-------->  DatabaseWriter flushed and stopped")
@@ -0,0 +1,253 @@
+import csv
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Iterator, List
+
+EXPORT_FORMATS = {"csv": "csv", "jsonl": "jsonl", "parquet": "parquet"}
+WEBSITE_VIEW = "website_view"
+# one denormalized row per website, the correlated subqueries use the lookup indexes of the join tables
+WEBSITE_VIEW_QUERY = """
+    SELECT Website.website_id, Website.name_, Website.url, Website.root, Website.visited,
+           (SELECT group_concat(Library.name_, ';') FROM ContainsLib
+            INNER JOIN Library ON Library.library_id = ContainsLib.library_id
+            WHERE ContainsLib.website_id = Website.website_id) AS libraries,
+           (SELECT group_concat(Framework.name_, ';') FROM ContainsFra
+            INNER JOIN Framework ON Framework.framework_id = ContainsFra.framework_id
+            WHERE ContainsFra.website_id = Website.website_id) AS frameworks,
+           (SELECT group_concat(SrcLanguage.name_, ';') FROM ImplementsLang
+            INNER JOIN SrcLanguage ON SrcLanguage.src_language_id = ImplementsLang.language_id
+            WHERE ImplementsLang.website_id = Website.website_id) AS languages,
+           (SELECT COUNT(*) FROM HasHyperlink WHERE HasHyperlink.website_id = Website.website_id) AS num_hyperlinks,
+           (SELECT MAX(used) FROM AdTracking WHERE AdTracking.website_id_ = Website.website_id) AS ad_tracking_used,
+           (SELECT MAX(used) FROM WebAssembly WHERE WebAssembly.website_id = Website.website_id) AS web_assembly_used,
+           (SELECT COUNT(web_assembly_file_id) FROM WebAssembly
+            WHERE WebAssembly.website_id = Website.website_id AND used = 1) AS num_wasm_files
+    FROM Website"""
+# columns referencing a website, used for the date filter on Website.visited
+WEBSITE_COLUMNS = ["website_id", "website_id_"]
+
+
+class DatabaseExporter:
+    def __init__(self, connection: sqlite3.Connection, chunk_size: int):
+        """
+        Stream tables or the per-website view out of the database in chunks, so the memory use does not depend on the
+        size of the database
+        :param connection: sqlite3 read connection
+        :param chunk_size: rows fetched from the cursor and written at once
+        """
+        self.connection = connection
+        self.chunk_size = chunk_size
+
+    def get_sources(self) -> List[str]:
+        """
+        :return: names of all exportable tables and views and the per-website view
+        """
+        rows = self.connection.execute("""SELECT name FROM sqlite_master WHERE type IN ('table', 'view')
+                                          AND name NOT LIKE 'sqlite_%' ORDER BY name;""").fetchall()
+        return [i[0] for i in rows] + [WEBSITE_VIEW]
+
+    def get_columns(self, source: str) -> List[str]:
+        cursor = self.connection.execute("SELECT * FROM (" + self.get_source_query(source) + ") LIMIT 0;")
+        return [i[0] for i in cursor.description]
+
+    def get_source_query(self, source: str) -> str:
+        if source == WEBSITE_VIEW:
+            return WEBSITE_VIEW_QUERY
+        if source not in self.get_sources():
+            raise ValueError("Unknown table " + source)
+        return "SELECT * FROM \"" + source + "\""
+
+    def build_query(self, source: str, columns: List[str] = None, since: str = None, until: str = None) -> tuple:
+        """
+        Build the projected and filtered export query
+        :param source: table, view or WEBSITE_VIEW
+        :param columns: exported columns, all columns if not set
+        :param since: first visited date (inclusive, e.g. 2022-01-31)
+        :param until: last visited date (inclusive)
+        :return: query, arguments and the exported column names
+        """
+        available = self.get_columns(source)
+        columns = columns or available
+        unknown = [i for i in columns if i not in available]
+        if unknown:
+            raise ValueError("Unknown columns " + str(unknown) + " for " + source + ", available: " + str(available))
+        query = "SELECT " + ", ".join("\"" + i + "\"" for i in columns) + " FROM (" + self.get_source_query(source) + \
+                ") AS source"
+        args = []
+        if since or until:
+            if "visited" in available:
+                condition = "source.visited"
+            else:
+                website_columns = [i for i in WEBSITE_COLUMNS if i in available]
+                if not website_columns:
+                    logging.info("%s has no website reference, exporting it without the date filter", source)
+                    return query + ";", args, columns
+                condition = "(SELECT visited FROM Website WHERE Website.website_id = source." + website_columns[0] + \
+                            ")"
+            filters = []
+            if since:
+                filters.append(condition + " >= ?")
+                args.append(since)
+            if until:
+                filters.append(condition + " <= ?")
+                args.append(until)
+            query += " WHERE " + " AND ".join(filters)
+        return query + ";", args, columns
+
+    def iterate_chunks(self, query: str, args: list) -> Iterator[List[tuple]]:
+        """
+        Execute the query and yield the result rows chunk by chunk
+        :param query: select statement
+        :param args: query arguments
+        :return: chunks of at most chunk_size rows
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(query, args)
+        try:
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def write_csv(path: str, columns: List[str], chunks: Iterator[List[tuple]]) -> int:
+        num_rows = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for rows in chunks:
+                writer.writerows(rows)
+                num_rows += len(rows)
+        return num_rows
+
+    @staticmethod
+    def write_jsonl(path: str, columns: List[str], chunks: Iterator[List[tuple]]) -> int:
+        num_rows = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for rows in chunks:
+                f.writelines(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+                num_rows += len(rows)
+        return num_rows
+
+    @staticmethod
+    def is_missing(value: Any) -> bool:
+        # the crawler stores missing values as the string 'None'
+        return value is None or value == "None"
+
+    @staticmethod
+    def get_type_rank(values: Iterator[Any]) -> int:
+        """
+        Widest parquet type the values of a column need, SQLite columns have no fixed type
+        :param values: values of one column of a chunk
+        :return: 0 without any value, 1 for int64, 2 for float64, 3 for string
+        """
+        rank = 0
+        for value in values:
+            if DatabaseExporter.is_missing(value):
+                continue
+            if isinstance(value, int):
+                rank = max(rank, 1)
+            elif isinstance(value, float):
+                rank = max(rank, 2)
+            else:
+                return 3
+        return rank
+
+    @staticmethod
+    def get_parquet_schema(columns: List[str], ranks: List[int]) -> Any:
+        import pyarrow as pa
+        types = [pa.null(), pa.int64(), pa.float64(), pa.string()]
+        return pa.schema([pa.field(column, types[rank]) for column, rank in zip(columns, ranks)])
+
+    @staticmethod
+    def write_parquet(path: str, columns: List[str], chunks: Iterator[List[tuple]]) -> int:
+        """
+        Write one parquet row group per chunk, requires pyarrow. The schema is inferred from the first chunk and widened
+        by later chunks (no value < int64 < float64 < string), the row groups written so far are then rewritten once
+        with the wider schema, so the result is only read once.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("The parquet export requires pyarrow (pip install pyarrow)")
+        num_rows = 0
+        ranks = None
+        schema = None
+        writer = None
+        # the file written at the moment, a widening rewrites the previous one into the other file
+        current = path
+        try:
+            for rows in chunks:
+                found = [DatabaseExporter.get_type_rank(row[idx] for row in rows) for idx in range(len(columns))]
+                widened = found if ranks is None else [max(i, j) for i, j in zip(ranks, found)]
+                if widened != ranks:
+                    ranks = widened
+                    schema = DatabaseExporter.get_parquet_schema(columns=columns, ranks=ranks)
+                    if writer is None:
+                        writer = pq.ParquetWriter(current, schema)
+                    else:
+                        writer.close()
+                        previous, current = current, path + ".widen" if current == path else path
+                        writer = pq.ParquetWriter(current, schema)
+                        for batch in pq.ParquetFile(previous).iter_batches():
+                            writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+                        os.remove(previous)
+                        logging.info("Widened the parquet schema of %s after %s rows", path, str(num_rows))
+                data = {}
+                for idx, field in enumerate(schema):
+                    if pa.types.is_string(field.type):
+                        data[field.name] = [None if row[idx] is None else str(row[idx]) for row in rows]
+                    elif pa.types.is_floating(field.type):
+                        data[field.name] = [None if DatabaseExporter.is_missing(row[idx]) else float(row[idx])
+                                            for row in rows]
+                    else:
+                        data[field.name] = [None if DatabaseExporter.is_missing(row[idx]) else row[idx] for row in rows]
+                writer.write_table(pa.Table.from_pydict(data, schema=schema))
+                num_rows += len(rows)
+            if writer is None:
+                writer = pq.ParquetWriter(current, DatabaseExporter.get_parquet_schema(columns=columns,
+                                                                                       ranks=[0] * len(columns)))
+        finally:
+            if writer is not None:
+                writer.close()
+            if current != path:
+                os.replace(current, path)
+        return num_rows
+
+    def export(self, source: str, path: str, format_: str, columns: List[str] = None, since: str = None,
+               until: str = None) -> int:
+        """
+        Stream one table, view or WEBSITE_VIEW into a file
+        :param source: table, view or WEBSITE_VIEW
+        :param path: output file
+        :param format_: csv, jsonl or parquet
+        :param columns: exported columns, all columns if not set
+        :param since: first visited date (inclusive)
+        :param until: last visited date (inclusive)
+        :return: number of exported rows
+        """
+        if format_ not in EXPORT_FORMATS:
+            raise ValueError("Unknown export format " + format_ + ", use one of " + str(list(EXPORT_FORMATS)))
+        query, args, columns = self.build_query(source=source, columns=columns, since=since, until=until)
+        chunks = self.iterate_chunks(query=query, args=args)
+        num_rows = {"csv": self.write_csv, "jsonl": self.write_jsonl, "parquet": self.write_parquet}[format_](
+            path, columns, chunks)
+        logging.info("\t\t\t\t\t\t\t-------->  Exported %s rows of %s to %s", str(num_rows), source, path)
+        return num_rows
+
+    def export_all(self, sources: List[str], directory: str, format_: str, columns: List[str] = None,
+                   since: str = None, until: str = None) -> dict:
+        """
+        Stream several sources into <directory>/<source>.<format>
+        :return: number of exported rows per source
+        """
+        os.makedirs(directory, exist_ok=True)
+        return {source: self.export(source=source, path=os.path.join(directory, source + "." + EXPORT_FORMATS[format_]),
+                                    format_=format_, columns=columns, since=since, until=until)
+                for source in sources}
@@ -0,0 +1,93 @@
+import socket
+import threading
+import time
+from typing import List
+
+from database.connection_pool import ConnectionPool
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+class FrontierStore:
+    def __init__(self, connections: ConnectionPool, lease_seconds: float, owner: str = None,
+                 reschedule_after: float = None):
+        """
+        Persistent crawl frontier in the Frontier table. Every scheduled URL is stored with its root, remaining depth
+        and status, workers claim a URL with a lease before crawling it, so a restarted crawler resumes with the
+        pending URLs and crawls a finished URL again only if a recrawl reschedules it.
+        :param connections: ConnectionPool of the DatabaseManager
+        :param lease_seconds: seconds after which a claimed but unfinished URL may be claimed again
+        :param owner: lease owner, the hostname by default which stays the same when docker restarts the container
+        :param reschedule_after: seconds after which a finished URL is scheduled again (recrawl), never if not set
+        """
+        self.lease_seconds = lease_seconds
+        self.reschedule_after = reschedule_after
+        self.owner = owner or socket.gethostname()
+        self.connection = connections.open_write()
+        self.lock = threading.Lock()
+
+    def add(self, entries: List[dict]) -> List[dict]:
+        """
+        Store new frontier entries, URLs which were scheduled before in any run are skipped
+        :param entries: frontier entries with url, root and remaining depth
+        :return: entries which were not stored before or rescheduled
+        """
+        added = []
+        with self.lock, self.connection:
+            for entry in entries:
+                if self.reschedule_after is None:
+                    cursor = self.connection.execute(
+                        """INSERT INTO Frontier (url, root, depth, status, attempts) VALUES (?, ?, ?, ?, 0)
+                           ON CONFLICT DO NOTHING;""", (entry["url"], entry["root"], entry["depth"], PENDING))
+                else:
+                    cursor = self.connection.execute(
+                        """INSERT INTO Frontier (url, root, depth, status, attempts) VALUES (?, ?, ?, ?, 0)
+                           ON CONFLICT(url) DO UPDATE SET root=excluded.root, depth=excluded.depth,
+                           status=excluded.status, owner=NULL, lease_until=NULL
+                           WHERE Frontier.status IN (?, ?) AND COALESCE(Frontier.finished, 0) < ?;""",
+                        (entry["url"], entry["root"], entry["depth"], PENDING, DONE, FAILED,
+                         time.time() - self.reschedule_after))
+                if cursor.rowcount > 0:
+                    added.append(entry)
+        return added
+
+    def resume(self) -> List[dict]:
+        """
+        Release the leases this owner held before a restart and load all claimable entries
+        :return: pending frontier entries in the order they were scheduled
+        """
+        with self.lock, self.connection:
+            self.connection.execute("""UPDATE Frontier SET status=?, owner=NULL, lease_until=NULL
+                                       WHERE status=? AND owner=?;""", (PENDING, LEASED, self.owner))
+            rows = self.connection.execute(
+                """SELECT url, root, depth FROM Frontier WHERE status=? OR (status=? AND lease_until<?)
+                   ORDER BY rowid;""", (PENDING, LEASED, time.time())).fetchall()
+        return [{"url": url, "root": root, "depth": depth} for url, root, depth in rows]
+
+    def claim(self, url: str) -> bool:
+        """
+        Lease a URL for this owner
+        :param url: frontier URL
+        :return: bool if the lease was granted, False if another worker holds it or it is finished
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                """UPDATE Frontier SET status=?, owner=?, lease_until=?, attempts=attempts+1
+                   WHERE url=? AND (status=? OR (status=? AND lease_until<?));""",
+                (LEASED, self.owner, now + self.lease_seconds, url, PENDING, LEASED, now))
+        return cursor.rowcount > 0
+
+    def finish(self, url: str, status: str = DONE):
+        """
+        Mark a leased URL as finished
+        :param url: frontier URL
+        :param status: DONE or FAILED
+        """
+        with self.lock, self.connection:
+            self.connection.execute("""UPDATE Frontier SET status=?, lease_until=NULL, finished=?
+                                       WHERE url=? AND owner=?;""", (status, time.time(), url, self.owner))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,57 @@
+import hashlib
+import sqlite3
+from urllib.parse import urlsplit, urlunsplit
+
+# anchor texts are stored truncated, the id is the hash of the full innerHTML
+ANCHOR_TEXT_MAX_LENGTH = 200
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def hash64(text: str) -> int:
+    """
+    64 bit hash usable as SQLite INTEGER PRIMARY KEY
+    :param text: input text
+    :return: signed 64 bit integer
+    """
+    digest = hashlib.blake2b(text.encode("utf-8", errors="replace"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a hyperlink: lower case scheme and host, no default port, no fragment and no trailing slash
+    :param url: hyperlink url
+    :return: canonical url
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if ":" in netloc and netloc.rsplit(":", 1)[1] == DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(":", 1)[0]
+    return urlunsplit((scheme, netloc, parts.path.rstrip("/"), parts.query, ""))
+
+
+def url_id(url: str) -> int:
+    return hash64(canonical_url(url))
+
+
+def anchor_text(inner_html: str) -> str:
+    return (inner_html or "")[:ANCHOR_TEXT_MAX_LENGTH]
+
+
+def anchor_text_id(inner_html: str) -> int:
+    return hash64(inner_html or "")
+
+
+def register_functions(connection: sqlite3.Connection):
+    """
+    Make the interning functions available in SQL, used to migrate existing hyperlinks
+    :param connection: sqlite3 connection
+    """
+    connection.create_function("canonical_url", 1, canonical_url, deterministic=True)
+    connection.create_function("url_id", 1, url_id, deterministic=True)
+    connection.create_function("anchor_text", 1, anchor_text, deterministic=True)
+    connection.create_function("anchor_text_id", 1, anchor_text_id, deterministic=True)
@@ -0,0 +1,266 @@
+import glob
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Callable, Iterator, List
+
+from database.database_manager import DatabaseManager
+from database.result_sink import ResultSink
+from database.visited_index import VisitedIndex
+from utility.page_fingerprint import PageFingerprint
+from utility.website_data import WasmFile, WebsiteData
+
+# segments are written with this suffix and renamed when they are complete, only complete segments are compacted
+OPEN_SUFFIX = ".open"
+SEGMENT_SUFFIX = ".jsonl"
+COMPACTED_SUFFIX = ".compacted"
+
+
+def website_data_to_dict(data: WebsiteData) -> dict:
+    """
+    Serializable form of the website data
+    :param data: website data
+    :return: dict of plain values
+    """
+    record = {key: value for key, value in vars(data).items()
+              if key not in ["web_assembly", "ad_tracking", "fingerprint"]}
+    record["ad_tracking"] = vars(data.ad_tracking)
+    record["web_assembly"] = {key: value for key, value in vars(data.web_assembly).items() if key != "wasm_files"}
+    record["web_assembly"]["wasm_files"] = [[vars(file) for file in files] for files in data.web_assembly.wasm_files]
+    record["fingerprint"] = data.fingerprint._asdict() if data.fingerprint is not None else None
+    return record
+
+
+def website_data_from_dict(record: dict) -> WebsiteData:
+    """
+    Restore website data from a log record
+    :param record: dict of website_data_to_dict
+    :return: website data
+    """
+    data = WebsiteData(name=record["name"], url=record["url"], root=record["root"])
+    for key, value in record.items():
+        if key not in ["web_assembly", "ad_tracking", "fingerprint"]:
+            setattr(data, key, value)
+    vars(data.ad_tracking).update(record["ad_tracking"])
+    wasm_files = []
+    for files in record["web_assembly"]["wasm_files"]:
+        wasm_files.append([])
+        for file in files:
+            wasm_file = WasmFile(source_js_name=file["source_js_name"], source_js_url=file["source_js_url"])
+            vars(wasm_file).update(file)
+            wasm_files[-1].append(wasm_file)
+    vars(data.web_assembly).update({key: value for key, value in record["web_assembly"].items()
+                                    if key != "wasm_files"})
+    data.web_assembly.wasm_files = wasm_files
+    if record["fingerprint"] is not None:
+        data.fingerprint = PageFingerprint(**record["fingerprint"])
+    return data
+
+
+def read_segment(path: str) -> Iterator[dict]:
+    """
+    Read the records of a segment, a line cut off by a crash is skipped
+    :param path: segment path
+    :return: records
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.info("Skipping damaged record in %s", path)
+
+
+class LogSink(ResultSink):
+    def __init__(self, directory: str, segment_bytes: int, visited_index: VisitedIndex,
+                 frontier_sink: DatabaseManager = None, fsync_interval: float = 1.0):
+        """
+        Append-only result sink writing one JSON line per website into log segments. Ingestion costs one write per
+        website, the segments are normalized into SQLite later with LogCompactor. The segment is synced to disk at most
+        every fsync_interval seconds and the when_stored callbacks only run after the sync, so a crash loses at most the
+        records of the last interval and their frontier entries are still leased and crawled again.
+        :param directory: directory of the log segments
+        :param segment_bytes: a new segment is started after this size
+        :param visited_index: in memory VisitedIndex, e.g. of the DatabaseManager, filled with the urls of the existing
+        segments
+        :param frontier_sink: optional DatabaseManager which persists the crawl frontier
+        :param fsync_interval: seconds between two syncs of the segment, 0 syncs after every record
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.visited_index = visited_index
+        self.frontier_sink = frontier_sink
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.file = None
+        self.path = None
+        # callbacks of the records written since the last sync
+        self.pending = []
+        self.synced = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        # segments this host left open in a crash are complete up to their last full line
+        for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(socket.gethostname()) + "-*" +
+                                           SEGMENT_SUFFIX + OPEN_SUFFIX)):
+            os.replace(path, path[:-len(OPEN_SUFFIX)])
+        self.load_visited_index()
+
+    def load_visited_index(self):
+        """
+        Fill the visited index with the urls of all segments, compacted ones included
+        """
+        paths = glob.glob(os.path.join(glob.escape(self.directory), "*" + SEGMENT_SUFFIX)) + \
+            glob.glob(os.path.join(glob.escape(self.directory), "*" + SEGMENT_SUFFIX + COMPACTED_SUFFIX))
+        for path in paths:
+            self.visited_index.update(record["url"] for record in read_segment(path))
+        logging.info("\t\t\t\t\t\t\t-------->  Loaded visited index from %s log segments", str(len(paths)))
+
+    def check_if_already_visited(self, url: str) -> bool:
+        if url[-1] == "/":
+            url = url[:-1]
+        return url in self.visited_index
+
+    def open_segment(self):
+        name = socket.gethostname() + "-" + datetime.now().strftime("%Y%m%d%H%M%S") + "-" + str(time.monotonic_ns())
+        self.path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        self.file = open(self.path + OPEN_SUFFIX, "a", encoding="utf-8")
+
+    def close_segment(self):
+        """
+        Complete the current segment so it can be compacted
+        """
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            os.replace(self.path + OPEN_SUFFIX, self.path)
+            self.file = None
+
+    def insert_data_in_db(self, data: WebsiteData):
+        """
+        Append the website data to the current segment
+        :param data: website data
+        """
+        if not DatabaseManager.is_complete(data):
+            return
+        data.visited = data.visited or datetime.today().strftime('%Y-%m-%d')
+        line = json.dumps(website_data_to_dict(data), default=str) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.open_segment()
+            self.file.write(line)
+            self.file.flush()
+            if self.file.tell() >= self.segment_bytes:
+                self.close_segment()
+        self.visited_index.add(data.url)
+
+    def sync(self, force: bool):
+        """
+        Sync the current segment to disk once the fsync interval passed and run the callbacks of the synced records
+        :param force: sync regardless of the interval
+        """
+        with self.lock:
+            if not force and time.monotonic() - self.synced < self.fsync_interval:
+                return
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+            self.synced = time.monotonic()
+            callbacks, self.pending = self.pending, []
+        for callback in callbacks:
+            callback(True)
+
+    def when_stored(self, url: str, callback: Callable[[bool], None]):
+        """
+        Run a callback once the record of a url is synced to disk, at the latest with the next sync after the interval
+        :param url: url of the inserted website data
+        :param callback: called with True once the record is durable
+        """
+        with self.lock:
+            self.pending.append(callback)
+        self.sync(force=False)
+
+    def flush(self):
+        self.sync(force=True)
+
+    def open_frontier(self, lease_seconds: float, reschedule_after: float = None) -> Any:
+        if self.frontier_sink is None:
+            return None
+        return self.frontier_sink.open_frontier(lease_seconds=lease_seconds, reschedule_after=reschedule_after)
+
+    def close(self):
+        self.sync(force=True)
+        with self.lock:
+            self.close_segment()
+        if self.frontier_sink is not None:
+            self.frontier_sink.close()
+
+
+class LogCompactor:
+    def __init__(self, dbm: DatabaseManager, directory: str, batch_size: int):
+        """
+        Normalize completed log segments into the SQLite schema of the DatabaseManager
+        :param dbm: DatabaseManager of the target database
+        :param directory: directory of the log segments
+        :param batch_size: records written per transaction
+        """
+        self.dbm = dbm
+        self.directory = directory
+        self.batch_size = batch_size
+
+    def get_segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(glob.escape(self.directory), "*" + SEGMENT_SUFFIX)))
+
+    def commit_batch(self, batch: List[WebsiteData]):
+        """
+        Write a batch in one transaction, if it fails every record is retried in its own transaction
+        """
+        try:
+            with self.dbm.c:
+                for data in batch:
+                    self.dbm.bulk_insert_website_data(data=data)
+            return
+        except Exception as ex:
+            logging.info("Database Exception %s in compaction batch, retrying records one by one", ex)
+        for data in batch:
+            try:
+                with self.dbm.c:
+                    self.dbm.bulk_insert_website_data(data=data)
+            except Exception as ex:
+                logging.info("Database Exception %s for %s", ex, data.url)
+                logging.info(traceback.format_exc())
+
+    def compact_segment(self, path: str) -> int:
+        """
+        Insert all records of a segment and mark it as compacted
+        :param path: segment path
+        :return: number of records
+        """
+        num_records = 0
+        batch = []
+        for record in read_segment(path):
+            batch.append(website_data_from_dict(record))
+            if len(batch) >= self.batch_size:
+                self.commit_batch(batch)
+                num_records += len(batch)
+                batch = []
+        if batch:
+            self.commit_batch(batch)
+            num_records += len(batch)
+        os.replace(path, path + COMPACTED_SUFFIX)
+        logging.info("\t\t\t\t\t\t\t-------->  Compacted %s records of %s", str(num_records), path)
+        return num_records
+
+    def compact(self) -> int:
+        """
+        Compact all completed segments in the order they were written
+        :return: number of records
+        """
+        self.dbm.connect()
+        try:
+            return sum(self.compact_segment(path) for path in self.get_segments())
+        finally:
+            self.dbm.disconnect()
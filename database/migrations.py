@@ -0,0 +1,201 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+from database.hyperlink_store import register_functions
+
+# Versioned schema changes applied in place to existing databases, append new migrations with the next version number
+MIGRATIONS = [
+    (1, "Lookup indexes for the crawler and the analysis queries", [
+        """CREATE INDEX IF NOT EXISTS idx_website_url ON Website (url);""",
+        """CREATE INDEX IF NOT EXISTS idx_hyperlink_url_visited ON Hyperlink (url, already_visited);""",
+        """CREATE INDEX IF NOT EXISTS idx_adtracking_website ON AdTracking (website_id_);""",
+        """CREATE INDEX IF NOT EXISTS idx_webassembly_website ON WebAssembly (website_id, used);""",
+        """CREATE INDEX IF NOT EXISTS idx_containslib_library ON ContainsLib (library_id);""",
+        """CREATE INDEX IF NOT EXISTS idx_containsfra_framework ON ContainsFra (framework_id);""",
+        """CREATE INDEX IF NOT EXISTS idx_implementslang_language ON ImplementsLang (language_id);""",
+        """CREATE INDEX IF NOT EXISTS idx_hashyperlink_hyperlink ON HasHyperlink (hyperlink_id);""",
+        """CREATE INDEX IF NOT EXISTS idx_haswebassemblyfunction_file ON HasWebAssemblyFunction (web_assembly_file_id);"""
+    ]),
+    (2, "Compact hyperlink storage with interned urls and anchor texts", [
+        """CREATE TABLE Url (
+               url_id INTEGER PRIMARY KEY,
+               url TEXT,
+               already_visited INTEGER);""",
+        """CREATE TABLE AnchorText (
+               anchor_text_id INTEGER PRIMARY KEY,
+               text TEXT);""",
+        """CREATE TABLE HasHyperlinkCompact (
+               website_id INTEGER,
+               url_id INTEGER,
+               anchor_text_id INTEGER,
+               PRIMARY KEY (website_id, url_id, anchor_text_id)) WITHOUT ROWID;""",
+        """INSERT INTO Url SELECT url_id(url), canonical_url(url), MAX(already_visited) FROM Hyperlink
+               WHERE url IS NOT NULL GROUP BY 1;""",
+        """INSERT INTO AnchorText SELECT anchor_text_id(inner_html), anchor_text(inner_html) FROM Hyperlink
+               WHERE true GROUP BY 1;""",
+        """INSERT OR IGNORE INTO HasHyperlinkCompact
+               SELECT HasHyperlink.website_id, url_id(Hyperlink.url), anchor_text_id(Hyperlink.inner_html)
+               FROM HasHyperlink INNER JOIN Hyperlink ON HasHyperlink.hyperlink_id = Hyperlink.hyperlink_id
+               WHERE Hyperlink.url IS NOT NULL;""",
+        """DROP TABLE HasHyperlink;""",
+        """DROP TABLE Hyperlink;""",
+        """ALTER TABLE HasHyperlinkCompact RENAME TO HasHyperlink;""",
+        """CREATE INDEX idx_hashyperlink_url ON HasHyperlink (url_id);""",
+        # read only view in the shape of the former Hyperlink table for ad hoc queries
+        """CREATE VIEW Hyperlink AS
+               SELECT HasHyperlink.website_id, AnchorText.text AS inner_html, Url.url, Url.already_visited
+               FROM HasHyperlink
+               INNER JOIN Url ON Url.url_id = HasHyperlink.url_id
+               INNER JOIN AnchorText ON AnchorText.anchor_text_id = HasHyperlink.anchor_text_id;"""
+    ]),
+    (3, "Persistent crawl frontier", [
+        """CREATE TABLE Frontier (
+               url TEXT PRIMARY KEY,
+               root TEXT,
+               depth INTEGER,
+               status TEXT,
+               owner TEXT,
+               lease_until REAL,
+               attempts INTEGER);""",
+        """CREATE INDEX idx_frontier_status ON Frontier (status, lease_until);"""
+    ]),
+    (4, "Page fingerprints for the incremental recrawl", [
+        """CREATE TABLE PageFingerprint (
+               url TEXT PRIMARY KEY,
+               website_id INTEGER,
+               html_hash TEXT,
+               script_src_hash TEXT,
+               etag TEXT,
+               last_modified TEXT,
+               checked TEXT);""",
+        """ALTER TABLE Frontier ADD COLUMN finished REAL;"""
+    ]),
+    (5, "Data generation counter for the analysis query cache", [
+        """CREATE TABLE DataGeneration (
+               id INTEGER PRIMARY KEY CHECK (id = 0),
+               generation INTEGER NOT NULL);""",
+        """INSERT INTO DataGeneration VALUES (0, 0);""",
+        # every committed crawl result inserts or updates its Website row, so the counter changes with each commit
+        # of the DatabaseWriter, the log compaction and the shard merge
+        """CREATE TRIGGER data_generation_insert AFTER INSERT ON Website
+           BEGIN UPDATE DataGeneration SET generation = generation + 1 WHERE id = 0; END;""",
+        """CREATE TRIGGER data_generation_update AFTER UPDATE ON Website
+           BEGIN UPDATE DataGeneration SET generation = generation + 1 WHERE id = 0; END;""",
+        """CREATE TRIGGER data_generation_delete AFTER DELETE ON Website
+           BEGIN UPDATE DataGeneration SET generation = generation + 1 WHERE id = 0; END;"""
+    ]),
+    (6, "Summary tables of the prevalence statistics", [
+        """CREATE TABLE FrameworkCount (framework_id INTEGER PRIMARY KEY, websites INTEGER NOT NULL);""",
+        """CREATE TABLE LibraryCount (library_id INTEGER PRIMARY KEY, websites INTEGER NOT NULL);""",
+        """CREATE TABLE LanguageCount (language_id INTEGER PRIMARY KEY, websites INTEGER NOT NULL);""",
+        """CREATE TABLE WasmDailyCount (day TEXT PRIMARY KEY, websites INTEGER NOT NULL,
+                                        wasm_websites INTEGER NOT NULL);""",
+        """CREATE TRIGGER frameworkcount_insert AFTER INSERT ON ContainsFra BEGIN
+               INSERT INTO FrameworkCount VALUES (NEW.framework_id, 1)
+               ON CONFLICT(framework_id) DO UPDATE SET websites = websites + 1; END;""",
+        """CREATE TRIGGER frameworkcount_delete AFTER DELETE ON ContainsFra BEGIN
+               UPDATE FrameworkCount SET websites = websites - 1 WHERE framework_id = OLD.framework_id; END;""",
+        """CREATE TRIGGER librarycount_insert AFTER INSERT ON ContainsLib BEGIN
+               INSERT INTO LibraryCount VALUES (NEW.library_id, 1)
+               ON CONFLICT(library_id) DO UPDATE SET websites = websites + 1; END;""",
+        """CREATE TRIGGER librarycount_delete AFTER DELETE ON ContainsLib BEGIN
+               UPDATE LibraryCount SET websites = websites - 1 WHERE library_id = OLD.library_id; END;""",
+        """CREATE TRIGGER languagecount_insert AFTER INSERT ON ImplementsLang BEGIN
+               INSERT INTO LanguageCount VALUES (NEW.language_id, 1)
+               ON CONFLICT(language_id) DO UPDATE SET websites = websites + 1; END;""",
+        """CREATE TRIGGER languagecount_delete AFTER DELETE ON ImplementsLang BEGIN
+               UPDATE LanguageCount SET websites = websites - 1 WHERE language_id = OLD.language_id; END;""",
+        # a website moves to the day of its latest visit on a recrawl
+        """CREATE TRIGGER wasmdailycount_website_insert AFTER INSERT ON Website BEGIN
+               INSERT INTO WasmDailyCount VALUES (IFNULL(NEW.visited, ''), 1, 0)
+               ON CONFLICT(day) DO UPDATE SET websites = websites + 1; END;""",
+        """CREATE TRIGGER wasmdailycount_website_update AFTER UPDATE OF visited ON Website
+           WHEN OLD.visited IS NOT NEW.visited BEGIN
+               UPDATE WasmDailyCount SET websites = websites - 1, wasm_websites = wasm_websites - EXISTS (
+                   SELECT 1 FROM WebAssembly WHERE WebAssembly.website_id = NEW.website_id AND WebAssembly.used = 1)
+               WHERE day = IFNULL(OLD.visited, '');
+               INSERT INTO WasmDailyCount VALUES (IFNULL(NEW.visited, ''), 1, EXISTS (
+                   SELECT 1 FROM WebAssembly WHERE WebAssembly.website_id = NEW.website_id AND WebAssembly.used = 1))
+               ON CONFLICT(day) DO UPDATE SET websites = websites + 1,
+               wasm_websites = wasm_websites + excluded.wasm_websites; END;""",
+        # a website counts once no matter how many used WebAssembly rows it has
+        """CREATE TRIGGER wasmdailycount_insert AFTER INSERT ON WebAssembly WHEN NEW.used = 1 AND NOT EXISTS (
+               SELECT 1 FROM WebAssembly WHERE website_id = NEW.website_id AND used = 1
+               AND web_assembly_id != NEW.web_assembly_id) BEGIN
+               UPDATE WasmDailyCount SET wasm_websites = wasm_websites + 1
+               WHERE day = (SELECT IFNULL(visited, '') FROM Website WHERE website_id = NEW.website_id); END;""",
+        """CREATE TRIGGER wasmdailycount_delete AFTER DELETE ON WebAssembly WHEN OLD.used = 1 AND NOT EXISTS (
+               SELECT 1 FROM WebAssembly WHERE WebAssembly.website_id = OLD.website_id AND WebAssembly.used = 1)
+           BEGIN
+               UPDATE WasmDailyCount SET wasm_websites = wasm_websites - 1
+               WHERE day = (SELECT IFNULL(visited, '') FROM Website WHERE website_id = OLD.website_id); END;""",
+        """INSERT INTO FrameworkCount SELECT framework_id, COUNT(*) FROM ContainsFra GROUP BY framework_id;""",
+        """INSERT INTO LibraryCount SELECT library_id, COUNT(*) FROM ContainsLib GROUP BY library_id;""",
+        """INSERT INTO LanguageCount SELECT language_id, COUNT(*) FROM ImplementsLang GROUP BY language_id;""",
+        """INSERT INTO WasmDailyCount SELECT IFNULL(visited, ''), COUNT(*), SUM(EXISTS (
+               SELECT 1 FROM WebAssembly WHERE WebAssembly.website_id = Website.website_id AND WebAssembly.used = 1))
+           FROM Website GROUP BY IFNULL(visited, '');"""
+    ]),
+    (7, "Wappalyzer result hash of the page fingerprints", [
+        # fingerprints without the hash never match, so the next recrawl replaces their Wappalyzer detections
+        """ALTER TABLE PageFingerprint ADD COLUMN wappalyzer_hash TEXT;"""
+    ]),
+    (8, "Hyperlink view with the columns of the former Hyperlink table", [
+        """DROP VIEW Hyperlink;""",
+        # one row per distinct link as in the former table, the id combines 31 bits of the url hash and 32 bits of the
+        # anchor text hash, so it stays the same for a link and needs no custom SQL function
+        """CREATE VIEW Hyperlink AS
+               SELECT ((Links.url_id & 2147483647) << 32) | (Links.anchor_text_id & 4294967295) AS hyperlink_id,
+                      AnchorText.text AS inner_html, Url.url, Url.already_visited
+               FROM (SELECT DISTINCT url_id, anchor_text_id FROM HasHyperlink) AS Links
+               INNER JOIN Url ON Url.url_id = Links.url_id
+               INNER JOIN AnchorText ON AnchorText.anchor_text_id = Links.anchor_text_id;"""
+    ]),
+]
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    """
+    Version of the latest applied migration
+    :param connection: sqlite3 connection
+    :return: schema version, 0 for a database without migrations
+    """
+    connection.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+                           version INTEGER PRIMARY KEY,
+                           description TEXT,
+                           applied TEXT);
+                           ''')
+    version = connection.execute("""SELECT MAX(version) FROM schema_version;""").fetchone()[0]
+    return version or 0
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """
+    Apply all missing migrations, each one in its own transaction
+    :param connection: sqlite3 write connection
+    :return: schema version after the migration
+    """
+    version = get_schema_version(connection)
+    connection.commit()
+    register_functions(connection)
+    for migration_version, description, statements in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        logging.info("\t\t\t\t\t\t\t-------->  Migrating database to version %s: %s", migration_version, description)
+        try:
+            # another crawler on the same database may have applied the migration in the meantime
+            connection.execute("BEGIN IMMEDIATE;")
+            if get_schema_version(connection) >= migration_version:
+                connection.commit()
+                continue
+            for statement in statements:
+                connection.execute(statement)
+            connection.execute("""INSERT INTO schema_version VALUES (?, ?, ?);""",
+                               (migration_version, description, datetime.now().isoformat(timespec="seconds")))
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        version = migration_version
+    return version
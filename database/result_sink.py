@@ -0,0 +1,71 @@
+import abc
+from typing import Any, Callable, List
+
+from utility.website_data import WebsiteData
+
+
+class ResultSink(abc.ABC):
+    """
+    Storage interface of the crawler: visited check, result insert and frontier. DatabaseManager writes the
+    normalized SQLite schema, LogSink appends the results to log segments which are compacted into SQLite later.
+    """
+
+    @abc.abstractmethod
+    def check_if_already_visited(self, url: str) -> bool:
+        """
+        Check if url was already visited before
+        :param url: current url to crawl
+        :return: bool if true or not
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def insert_data_in_db(self, data: WebsiteData):
+        """
+        Store the collected data of one website
+        :param data: website data
+        """
+        raise NotImplementedError
+
+    def when_stored(self, url: str, callback: Callable[[bool], None]):
+        """
+        Run a callback once the data inserted for a url is durable, e.g. to finish its frontier entry only then
+        :param url: url of the inserted website data
+        :param callback: called with True if the data was stored, False if writing it failed
+        """
+        callback(True)
+
+    def flush(self):
+        """
+        Make all inserted data durable and run the waiting when_stored callbacks
+        """
+
+    def get_fingerprint(self, url: str) -> Any:
+        """
+        Fingerprint of the previous crawl of a page for the incremental recrawl
+        :param url: page url
+        :return: dict with website_id, html_hash, script_src_hash, etag, last_modified, checked and wappalyzer_hash or None
+        """
+        return None
+
+    def get_hyperlink_urls(self, website_id: int) -> List[str]:
+        """
+        Stored hyperlinks of a website
+        :param website_id: website id
+        :return: urls
+        """
+        return []
+
+    def open_frontier(self, lease_seconds: float, reschedule_after: float = None) -> Any:
+        """
+        Persistent frontier of the sink
+        :param lease_seconds: seconds a worker holds a claimed URL
+        :param reschedule_after: seconds after which a finished URL is scheduled again, never if not set
+        :return: FrontierStore or None if the sink cannot persist the frontier
+        """
+        return None
+
+    def close(self):
+        """
+        Flush all pending results
+        """
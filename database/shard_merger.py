@@ -0,0 +1,113 @@
+import logging
+import sqlite3
+from typing import List
+
+# tables with surrogate ids: id column and the columns identifying an existing row, the same keys as the key_columns of
+# DatabaseManager.bulk_ids, in the order the ids are remapped
+SURROGATE_TABLES = [
+    ("SrcLanguage", "src_language_id", ["name_"]),
+    ("Library", "library_id", ["name_", "url", "category", "version", "confidence"]),
+    ("Framework", "framework_id", ["name_", "url", "category", "version", "confidence"]),
+    ("WebAssemblyFile", "web_assembly_file_id", ["local_file_name", "source_file_name", "source_js_name"]),
+    ("WebAssemblyFunction", "web_assembly_func_id", ["function_"]),
+    ("Website", "website_id", ["name_", "url", "root"]),
+]
+# tables referencing surrogate ids: remapped columns and the own id column which is assigned anew. Url and AnchorText
+# are keyed by url and text hashes, they are the same in every shard and need no remapping.
+LINKED_TABLES = [
+    ("Url", {}, None, "ON CONFLICT(url_id) DO UPDATE SET already_visited=MAX(Url.already_visited, "
+                      "excluded.already_visited)"),
+    ("AnchorText", {}, None, "ON CONFLICT DO NOTHING"),
+    ("AdTracking", {"website_id_": "Website"}, "ad_tracking_id_", "ON CONFLICT DO NOTHING"),
+    ("WebAssembly", {"web_assembly_file_id": "WebAssemblyFile", "website_id": "Website"}, "web_assembly_id",
+     "ON CONFLICT DO NOTHING"),
+    ("HasWebAssemblyFunction", {"web_assembly_func_id": "WebAssemblyFunction",
+                                "web_assembly_file_id": "WebAssemblyFile"}, None, "ON CONFLICT DO NOTHING"),
+    ("ContainsLib", {"website_id": "Website", "library_id": "Library"}, None, "ON CONFLICT DO NOTHING"),
+    ("ContainsFra", {"website_id": "Website", "framework_id": "Framework"}, None, "ON CONFLICT DO NOTHING"),
+    ("ImplementsLang", {"website_id": "Website", "language_id": "SrcLanguage"}, None, "ON CONFLICT DO NOTHING"),
+    ("HasHyperlink", {"website_id": "Website"}, None, "ON CONFLICT DO NOTHING"),
+    ("PageFingerprint", {"website_id": "Website"}, None,
+     "ON CONFLICT(url) DO UPDATE SET website_id=excluded.website_id, html_hash=excluded.html_hash, "
+     "script_src_hash=excluded.script_src_hash, etag=excluded.etag, last_modified=excluded.last_modified, "
+     "checked=excluded.checked, wappalyzer_hash=excluded.wappalyzer_hash "
+     "WHERE excluded.checked > PageFingerprint.checked"),
+]
+
+
+class ShardMerger:
+    def __init__(self, connection: sqlite3.Connection):
+        """
+        Fold per-worker shard databases into the main database. Every table is copied with one INSERT ... SELECT,
+        surrogate ids are remapped through temporary id maps joined on the primary keys, so a merge takes time
+        roughly linear in the number of rows.
+        :param connection: sqlite3 write connection of the main database, shards have to be on the same schema version
+        """
+        self.connection = connection
+
+    def get_columns(self, table: str) -> List[str]:
+        return [i[1] for i in self.connection.execute("PRAGMA main.table_info(\"" + table + "\");").fetchall()]
+
+    def merge_surrogate_table(self, table: str, id_column: str, key_columns: List[str]):
+        """
+        Insert the shard rows missing in the main table and map each shard id to the id in the main table.
+        Rows match with IS, so NULL keys are deduplicated as well.
+        """
+        columns = [i for i in self.get_columns(table) if i != id_column]
+        match = " AND ".join("m." + i + " IS s." + i for i in key_columns)
+        self.connection.execute("INSERT INTO main." + table + " (" + ", ".join(columns) + ") SELECT " +
+                                ", ".join("s." + i for i in columns) + " FROM shard." + table + " AS s " +
+                                "WHERE NOT EXISTS (SELECT 1 FROM main." + table + " AS m WHERE " + match + ") " +
+                                "ORDER BY s." + id_column + ";")
+        self.connection.execute("CREATE TEMP TABLE map_" + table + " (old_id INTEGER PRIMARY KEY, new_id INTEGER);")
+        self.connection.execute("INSERT INTO temp.map_" + table + " SELECT s." + id_column + ", (SELECT MIN(m." +
+                                id_column + ") FROM main." + table + " AS m WHERE " + match + ") FROM shard." + table +
+                                " AS s;")
+
+    def merge_linked_table(self, table: str, remapped: dict, id_column: str, conflict: str):
+        """
+        Copy the shard rows with remapped id columns
+        """
+        columns = [i for i in self.get_columns(table) if i != id_column]
+        values = ["map_" + i + ".new_id" if i in remapped else "s." + i for i in columns]
+        joins = "".join(" LEFT JOIN temp.map_" + target + " AS map_" + column + " ON map_" + column + ".old_id = s." +
+                        column for column, target in remapped.items())
+        self.connection.execute("INSERT INTO main." + table + " (" + ", ".join(columns) + ") SELECT " +
+                                ", ".join(values) + " FROM shard." + table + " AS s" + joins + " WHERE true " +
+                                conflict + ";")
+
+    def merge(self, shard_path: str) -> dict:
+        """
+        Merge one shard in a single transaction
+        :param shard_path: path of the shard database
+        :return: number of rows per table in the shard
+        """
+        self.connection.execute("ATTACH DATABASE ? AS shard;", (shard_path,))
+        try:
+            self.connection.execute("BEGIN IMMEDIATE;")
+            try:
+                for table, id_column, key_columns in SURROGATE_TABLES:
+                    self.merge_surrogate_table(table=table, id_column=id_column, key_columns=key_columns)
+                # a website crawled in the shard later than in the main database keeps the later visit date
+                self.connection.execute("""UPDATE main.Website SET visited=(
+                                               SELECT MAX(s.visited) FROM temp.map_Website AS m
+                                               INNER JOIN shard.Website AS s ON s.website_id = m.old_id
+                                               WHERE m.new_id = main.Website.website_id)
+                                           WHERE website_id IN (
+                                               SELECT m.new_id FROM temp.map_Website AS m
+                                               INNER JOIN shard.Website AS s ON s.website_id = m.old_id
+                                               WHERE s.visited > IFNULL(main.Website.visited, ''));""")
+                for table, remapped, id_column, conflict in LINKED_TABLES:
+                    self.merge_linked_table(table=table, remapped=remapped, id_column=id_column, conflict=conflict)
+                counts = {table: self.connection.execute("SELECT COUNT(*) FROM shard." + table + ";").fetchone()[0]
+                          for table in [i[0] for i in SURROGATE_TABLES] + [i[0] for i in LINKED_TABLES]}
+                for table, _, _ in SURROGATE_TABLES:
+                    self.connection.execute("DROP TABLE temp.map_" + table + ";")
+                self.connection.commit()
+            except sqlite3.Error:
+                self.connection.rollback()
+                raise
+        finally:
+            self.connection.execute("DETACH DATABASE shard;")
+        logging.info("\t\t\t\t\t\t\t-------->  Merged shard %s: %s", shard_path, str(counts))
+        return counts
@@ -0,0 +1,70 @@
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+    def __init__(self, expected_items: int, false_positive_rate: float):
+        """
+        Fixed size Bloom filter, may report an url as visited which was not (with the given rate) but never the opposite
+        :param expected_items: expected number of stored items
+        :param false_positive_rate: accepted false positive rate
+        """
+        self.num_bits = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / expected_items * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for p in self.positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(item))
+
+
+class VisitedIndex:
+    def __init__(self, mode: str = "set", expected_urls: int = 1000000, false_positive_rate: float = 0.001):
+        """
+        Process wide in memory index of the visited website urls in front of the Website table
+        :param mode: "set" for an exact hash set or "bloom" for a Bloom filter on very large crawls
+        :param expected_urls: expected number of urls for the Bloom filter
+        :param false_positive_rate: accepted false positive rate of the Bloom filter
+        """
+        if mode == "bloom":
+            self.urls = BloomFilter(expected_items=expected_urls, false_positive_rate=false_positive_rate)
+        elif mode == "set":
+            self.urls = set()
+        else:
+            raise ValueError("Unknown visited index mode " + str(mode))
+        self.mode = mode
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config_: dict) -> "VisitedIndex":
+        """
+        Create the index from the database configuration
+        :param config_: visited_index configuration (config.yml)
+        :return: VisitedIndex
+        """
+        return VisitedIndex(mode=config_["mode"], expected_urls=config_["expected_urls"],
+                            false_positive_rate=config_["false_positive_rate"])
+
+    def add(self, url: str):
+        with self.lock:
+            self.urls.add(url)
+
+    def update(self, urls):
+        with self.lock:
+            for url in urls:
+                self.urls.add(url)
+
+    def __contains__(self, url: str) -> bool:
+        with self.lock:
+            return url in self.urls
@@ -0,0 +1,39 @@
+import argparse
+import logging
+import os
+
+from database.connection_pool import ConnectionPool
+from database.exporter import DatabaseExporter, EXPORT_FORMATS, WEBSITE_VIEW
+from utility.input_reader import get_config
+
+
+if __name__ == "__main__":
+    """
+        Stream crawl results out of the database, e.g.
+        python export.py --format parquet --output exports --tables website_view --since 2022-01-01
+    """
+    logging.getLogger().setLevel(level=logging.INFO)
+    config = get_config('config.yml')
+    parser = argparse.ArgumentParser(description="Export tables or the per-website view of the crawl database")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="jsonl")
+    parser.add_argument("--output", default=config["export"]["directory"], help="output directory")
+    parser.add_argument("--tables", nargs="+", default=[WEBSITE_VIEW],
+                        help="tables or views to export, 'all' for every table (default: " + WEBSITE_VIEW + ")")
+    parser.add_argument("--columns", nargs="+", help="exported columns, all columns if not set")
+    parser.add_argument("--since", help="first visited date of the exported websites (YYYY-MM-DD)")
+    parser.add_argument("--until", help="last visited date of the exported websites (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=config["export"]["chunk_size"])
+    args = parser.parse_args()
+
+    if os.environ.get(config["docker"]["env_var"], False):
+        db_path = config["database"]["path"]
+    else:
+        db_path = config["database"]["local_path"]
+    connections = ConnectionPool(path=db_path, timeout=10, pragmas=config["database"]["pragmas"])
+    try:
+        exporter = DatabaseExporter(connection=connections.read(), chunk_size=args.chunk_size)
+        sources = exporter.get_sources() if args.tables == ["all"] else args.tables
+        exporter.export_all(sources=sources, directory=args.output, format_=args.format, columns=args.columns,
+                            since=args.since, until=args.until)
+    finally:
+        connections.close()
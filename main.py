@@ -1,6 +1,11 @@
 import os
+import signal
+import socket
+import sys
 
 from database.database_manager import DatabaseManager
+from database.log_sink import LogSink
+from database.visited_index import VisitedIndex
 from crawler import WebCrawler
 from utility.input_reader import get_config
 
@@ -15,7 +20,28 @@ if __name__ == "__main__":
         db_path = config["database"]["path"]
     else:
         db_path = config["database"]["local_path"]
-    dbm = DatabaseManager(set_up=config["database"]["setup"], path=db_path)
-    crawler = WebCrawler(config_=config, dbm_=dbm)
+    shard = None
+    if config["database"]["shard"]["enabled"]:
+        shard = config["database"]["shard"]["name"] or socket.gethostname()
+    visited_index = VisitedIndex.from_config(config["database"]["visited_index"])
+    dbm = DatabaseManager(set_up=config["database"]["setup"], path=db_path, visited_index=visited_index,
+                          pragmas=config["database"]["pragmas"], shard=shard)
+    if config["database"]["sink"] == "log":
+        sink = LogSink(directory=config["database"]["log_sink"]["directory"],
+                       segment_bytes=config["database"]["log_sink"]["segment_bytes"],
+                       visited_index=visited_index, frontier_sink=dbm,
+                       fsync_interval=config["database"]["log_sink"]["fsync_interval"])
+    else:
+        sink = dbm
+    crawler = WebCrawler(config_=config, dbm_=sink)
     if config["crawler"]["start"]:
-        crawler.start_crawler()
+        if sink is dbm:
+            dbm.start_writer(queue_size=config["database"]["writer"]["queue_size"],
+                             batch_size=config["database"]["writer"]["batch_size"],
+                             commit_interval=config["database"]["writer"]["commit_interval"])
+        # flush the queued website data when the container is stopped
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            crawler.start_crawler()
+        finally:
+            sink.close()
@@ -0,0 +1,41 @@
+import argparse
+import logging
+import os
+
+from database.database_manager import DatabaseManager
+from database.shard_merger import ShardMerger
+from utility.input_reader import get_config
+
+
+if __name__ == "__main__":
+    """
+        Fold the per-worker shard databases into the main database, e.g.
+        python merge_shards.py --delete
+    """
+    logging.getLogger().setLevel(level=logging.INFO)
+    config = get_config('config.yml')
+    parser = argparse.ArgumentParser(description="Merge crawler shard databases into the main database")
+    parser.add_argument("--shards", nargs="+", help="shard databases, all shards next to the main database if not set")
+    parser.add_argument("--delete", action="store_true", help="delete each shard after it was merged")
+    args = parser.parse_args()
+
+    if os.environ.get(config["docker"]["env_var"], False):
+        db_path = config["database"]["path"]
+    else:
+        db_path = config["database"]["local_path"]
+    shard_paths = args.shards or DatabaseManager.get_shard_paths(path=db_path)
+    dbm = DatabaseManager(set_up=True, path=db_path, pragmas=config["database"]["pragmas"])
+    dbm.connect()
+    try:
+        merger = ShardMerger(connection=dbm.c)
+        for shard_path in shard_paths:
+            # bring the shard to the schema version of the main database
+            DatabaseManager(set_up=True, path=shard_path, pragmas=config["database"]["pragmas"])
+            merger.merge(shard_path=shard_path)
+            if args.delete:
+                for suffix in ["", "-wal", "-shm"]:
+                    if os.path.exists(shard_path + suffix):
+                        os.remove(shard_path + suffix)
+    finally:
+        dbm.disconnect()
+        dbm.close()
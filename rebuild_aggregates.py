@@ -0,0 +1,25 @@
+import logging
+import os
+
+from database.aggregates import rebuild_aggregates
+from database.database_manager import DatabaseManager
+from utility.input_reader import get_config
+
+
+if __name__ == "__main__":
+    """
+        Recompute the summary tables of the prevalence statistics, e.g. after editing the crawl data by hand
+    """
+    logging.getLogger().setLevel(level=logging.INFO)
+    config = get_config('config.yml')
+    if os.environ.get(config["docker"]["env_var"], False):
+        db_path = config["database"]["path"]
+    else:
+        db_path = config["database"]["local_path"]
+    dbm = DatabaseManager(set_up=True, path=db_path, pragmas=config["database"]["pragmas"])
+    dbm.connect()
+    try:
+        rebuild_aggregates(connection=dbm.c)
+    finally:
+        dbm.disconnect()
+        dbm.close()
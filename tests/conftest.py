@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+# the modules import each other from the repository root, e.g. "from database.x import y"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.database_manager import DatabaseManager  # noqa: E402
+from utility.website_data import WebsiteData  # noqa: E402
+
+
+def make_website_data(url: str, libraries: list = None, languages: list = None, frameworks: list = None,
+                      hyperlinks: list = None, visited: str = "2022-01-31") -> WebsiteData:
+    """
+    Complete website data as the crawler collects it
+    :param url: page url
+    :param libraries: library names
+    :param languages: language names
+    :param frameworks: framework names
+    :param hyperlinks: (href, innerHTML, already_visited) tuples
+    :param visited: visit date
+    :return: website data
+    """
+    data = WebsiteData(name=url.split("//")[-1], url=url, root="input_file")
+    data.libraries = [{"name": i, "website": "https://" + i + ".com", "category_name": "JavaScript libraries",
+                       "version": "1.0", "confidence": 100} for i in libraries or []]
+    data.frameworks = [{"name": i, "website": "https://" + i + ".com", "category_name": "Web frameworks",
+                        "version": "None", "confidence": 100} for i in frameworks or []]
+    data.languages = list(languages or [])
+    data.hyperlink = [{"href": href, "innerHTML": inner_html, "already_visited": already_visited}
+                      for href, inner_html, already_visited in hyperlinks or []]
+    data.visited = visited
+    return data
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return str(tmp_path / "website_data.db")
+
+
+@pytest.fixture
+def dbm(db_path) -> DatabaseManager:
+    """
+    DatabaseManager of a new database on the latest schema version
+    """
+    manager = DatabaseManager(set_up=True, path=db_path)
+    yield manager
+    manager.close()
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from conftest import make_website_data
+from database.database_manager import CARRY_FORWARD_TABLES
+from utility.page_fingerprint import ANALYZER_INPUTS, fingerprint_snapshot, unchanged_analyzers
+
+
+def get_names(dbm, website_id: int) -> dict:
+    return {
+        "libraries": sorted(i[0] for i in dbm.select("""SELECT Library.name_ FROM ContainsLib INNER JOIN Library
+                                                         ON Library.library_id = ContainsLib.library_id
+                                                         WHERE website_id=?;""", (website_id,))),
+        "languages": sorted(i[0] for i in dbm.select("""SELECT SrcLanguage.name_ FROM ImplementsLang
+                                                         INNER JOIN SrcLanguage
+                                                         ON SrcLanguage.src_language_id = ImplementsLang.language_id
+                                                         WHERE website_id=?;""", (website_id,))),
+        "hyperlink": sorted(i[0] for i in dbm.select("""SELECT Url.url FROM HasHyperlink INNER JOIN Url
+                                                         ON Url.url_id = HasHyperlink.url_id
+                                                         WHERE website_id=?;""", (website_id,))),
+    }
+
+
+def get_website_id(dbm, url: str, root: str = "input_file") -> int:
+    return dbm.select("SELECT website_id FROM Website WHERE url=? AND root=?;", (url, root))[0][0]
+
+
+def recrawl(url: str, previous_website_id: int, carry_forward: list, **kwargs):
+    data = make_website_data(url, **kwargs)
+    data.previous_website_id = previous_website_id
+    data.carry_forward = carry_forward
+    return data
+
+
+def test_unchanged_rows_are_kept_and_changed_rows_replaced(dbm):
+    dbm.insert_data_in_db(make_website_data("https://a.com", libraries=["jquery"], languages=["Python"],
+                                            hyperlinks=[("https://b.com", "B", False)]))
+    website_id = get_website_id(dbm, "https://a.com")
+    # the hyperlinks did not change and are not collected again, the libraries did
+    dbm.insert_data_in_db(recrawl("https://a.com", website_id, carry_forward=["hyperlink", "languages"],
+                                  libraries=["react"], languages=["Python"]))
+    assert get_website_id(dbm, "https://a.com") == website_id
+    assert get_names(dbm, website_id) == {"libraries": ["react"], "languages": ["Python"],
+                                          "hyperlink": ["https://b.com"]}
+
+
+def test_rows_are_copied_to_a_new_website_id(dbm):
+    dbm.insert_data_in_db(make_website_data("https://a.com", libraries=["jquery"], languages=["Python"],
+                                            hyperlinks=[("https://b.com", "B", False)]))
+    previous_id = get_website_id(dbm, "https://a.com")
+    data = recrawl("https://a.com", previous_id, carry_forward=["hyperlink", "libraries"], languages=["Go"])
+    data.root = "https://c.com"
+    dbm.insert_data_in_db(data)
+    website_id = get_website_id(dbm, "https://a.com", root="https://c.com")
+    assert website_id != previous_id
+    assert get_names(dbm, website_id) == {"libraries": ["jquery"], "languages": ["Go"],
+                                          "hyperlink": ["https://b.com"]}
+    # the previous crawl keeps its rows
+    assert get_names(dbm, previous_id) == {"libraries": ["jquery"], "languages": ["Python"],
+                                           "hyperlink": ["https://b.com"]}
+
+
+def test_not_modified_page_carries_forward_everything(dbm):
+    dbm.insert_data_in_db(make_website_data("https://a.com", libraries=["jquery"], languages=["Python"],
+                                            hyperlinks=[("https://b.com", "B", False)]))
+    website_id = get_website_id(dbm, "https://a.com")
+    dbm.insert_data_in_db(recrawl("https://a.com", website_id, carry_forward=list(CARRY_FORWARD_TABLES)))
+    assert get_names(dbm, website_id) == {"libraries": ["jquery"], "languages": ["Python"],
+                                          "hyperlink": ["https://b.com"]}
+    assert dbm.select("SELECT COUNT(*) FROM AdTracking WHERE website_id_=?;", (website_id,))[0][0] == 1
+
+
+def test_changed_wappalyzer_result_is_not_carried_forward():
+    snapshot = SimpleNamespace(page_source="<html></html>", scripts=[{"src": "https://a.com/app.js"}])
+    previous = fingerprint_snapshot(snapshot=snapshot, technologies=[["jquery"], [], []])._asdict()
+    same = fingerprint_snapshot(snapshot=snapshot, technologies=[["jquery"], [], []])
+    changed = fingerprint_snapshot(snapshot=snapshot, technologies=[["react"], [], []])
+    assert unchanged_analyzers(previous=previous, current=same) == list(ANALYZER_INPUTS)
+    assert unchanged_analyzers(previous=previous, current=changed) == ["hyperlink", "web_assembly"]
+    # fingerprints stored before the Wappalyzer hash never match
+    assert unchanged_analyzers(previous=dict(previous, wappalyzer_hash=None), current=same) == \
+        ["hyperlink", "web_assembly"]
@@ -0,0 +1,67 @@
+from conftest import make_website_data
+from database.database_manager import SQLITE_MAX_VARIABLES
+
+
+def bulk_ids(dbm, rows: list, key_columns: list = None) -> list:
+    with dbm.c:
+        return dbm.bulk_ids(table="Library", id_column="library_id",
+                            columns=["name_", "url", "category", "version", "confidence"], rows=rows,
+                            key_columns=key_columns)
+
+
+def test_bulk_ids_reuse_existing_rows(dbm):
+    dbm.connect()
+    try:
+        first = bulk_ids(dbm, [("jquery", "u", "c", "1", 100), ("react", "u", "c", "2", 100)])
+        assert len(set(first)) == 2
+        # ids follow the order of the rows, duplicates and existing rows resolve to the same id
+        second = bulk_ids(dbm, [("vue", "u", "c", "3", 100), ("react", "u", "c", "2", 100),
+                                ("jquery", "u", "c", "1", 100), ("vue", "u", "c", "3", 100)])
+        assert second[1:3] == [first[1], first[0]]
+        assert second[0] == second[3] and second[0] not in first
+        assert dbm.c.execute("SELECT COUNT(*) FROM Library;").fetchone()[0] == 3
+    finally:
+        dbm.disconnect()
+
+
+def test_bulk_ids_match_null_keys(dbm):
+    dbm.connect()
+    try:
+        first = bulk_ids(dbm, [("jquery", None, "c", None, 100)])
+        assert bulk_ids(dbm, [("jquery", None, "c", None, 100)]) == first
+        assert dbm.c.execute("SELECT COUNT(*) FROM Library;").fetchone()[0] == 1
+    finally:
+        dbm.disconnect()
+
+
+def test_bulk_ids_with_key_columns(dbm):
+    dbm.connect()
+    try:
+        first = bulk_ids(dbm, [("jquery", "u", "c", "1", 100)], key_columns=["name_"])
+        # an existing name is resolved even if the other columns differ
+        assert bulk_ids(dbm, [("jquery", "v", "d", "2", 50)], key_columns=["name_"]) == first
+    finally:
+        dbm.disconnect()
+
+
+def test_bulk_ids_beyond_the_variable_limit(dbm):
+    rows = [("lib" + str(i), "u", "c", "1", 100) for i in range(SQLITE_MAX_VARIABLES)]
+    dbm.connect()
+    try:
+        ids = bulk_ids(dbm, rows)
+        assert len(set(ids)) == len(rows)
+        assert bulk_ids(dbm, list(reversed(rows))) == list(reversed(ids))
+    finally:
+        dbm.disconnect()
+
+
+def test_insert_website_data_twice(dbm):
+    data = make_website_data("https://a.com", libraries=["jquery"], languages=["Python"], frameworks=["Bootstrap"],
+                             hyperlinks=[("https://b.com", "B", True)])
+    dbm.insert_data_in_db(data)
+    dbm.insert_data_in_db(data)
+    assert dbm.select("SELECT COUNT(*) FROM Website;")[0][0] == 1
+    for table in ["ContainsLib", "ImplementsLang", "ContainsFra", "HasHyperlink", "AdTracking"]:
+        assert dbm.select("SELECT COUNT(*) FROM " + table + ";")[0][0] == 1
+    assert dbm.check_if_already_visited("https://a.com/")
+    assert not dbm.check_if_already_visited("https://b.com")
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from conftest import make_website_data
+
+from database.frontier_store import DONE, FAILED, LEASED, PENDING
+
+
+def entry(url: str, depth: int = 1) -> dict:
+    return {"url": url, "root": "input_file", "depth": depth}
+
+
+@pytest.fixture
+def open_store(dbm):
+    stores = []
+
+    def open_(owner: str, lease_seconds: float = 60, reschedule_after: float = None):
+        store = dbm.open_frontier(lease_seconds=lease_seconds, reschedule_after=reschedule_after)
+        store.owner = owner
+        stores.append(store)
+        return store
+    yield open_
+    for store in stores:
+        store.close()
+
+
+def get_status(dbm, url: str) -> tuple:
+    return dbm.select("SELECT status, owner FROM Frontier WHERE url=?;", (url,))[0]
+
+
+def test_add_skips_scheduled_urls(open_store):
+    store = open_store("a")
+    assert store.add([entry("https://a.com"), entry("https://b.com")]) == [entry("https://a.com"),
+                                                                         entry("https://b.com")]
+    assert store.add([entry("https://a.com", depth=0), entry("https://c.com")]) == [entry("https://c.com")]
+    assert [i["url"] for i in store.resume()] == ["https://a.com", "https://b.com", "https://c.com"]
+
+
+def test_lease_and_finish(dbm, open_store):
+    first, second = open_store("a"), open_store("b")
+    first.add([entry("https://a.com")])
+    assert first.claim("https://a.com")
+    assert get_status(dbm, "https://a.com") == (LEASED, "a")
+    # a leased url is not granted to another owner, a finished one to nobody
+    assert not second.claim("https://a.com")
+    second.finish("https://a.com")
+    assert get_status(dbm, "https://a.com") == (LEASED, "a")
+    first.finish("https://a.com")
+    assert get_status(dbm, "https://a.com") == (DONE, "a")
+    assert not first.claim("https://a.com")
+    assert second.resume() == []
+
+
+def test_failed_urls_are_not_resumed(dbm, open_store):
+    store = open_store("a")
+    store.add([entry("https://a.com")])
+    assert store.claim("https://a.com")
+    store.finish("https://a.com", status=FAILED)
+    assert get_status(dbm, "https://a.com")[0] == FAILED
+    assert store.resume() == []
+
+
+def test_expired_lease_is_claimed_again(open_store):
+    first, second = open_store("a", lease_seconds=0.05), open_store("b")
+    first.add([entry("https://a.com")])
+    assert first.claim("https://a.com")
+    assert second.resume() == []
+    time.sleep(0.1)
+    assert second.resume() == [entry("https://a.com")]
+    assert second.claim("https://a.com")
+
+
+def test_restart_releases_own_leases(dbm, open_store):
+    crashed = open_store("a")
+    crashed.add([entry("https://a.com"), entry("https://b.com")])
+    assert crashed.claim("https://a.com")
+    # the restarted crawler has the same owner, its lease is released at once
+    restarted = open_store("a")
+    assert restarted.resume() == [entry("https://a.com"), entry("https://b.com")]
+    assert get_status(dbm, "https://a.com") == (PENDING, None)
+    assert restarted.claim("https://a.com")
+
+
+def test_reschedule_finished_urls(open_store):
+    store = open_store("a", reschedule_after=0.05)
+    store.add([entry("https://a.com")])
+    assert store.claim("https://a.com")
+    store.finish("https://a.com")
+    assert store.add([entry("https://a.com")]) == []
+    time.sleep(0.1)
+    assert store.add([entry("https://a.com", depth=2)]) == [entry("https://a.com", depth=2)]
+    assert store.resume() == [entry("https://a.com", depth=2)]
+
+
+def test_finish_after_the_writer_committed(dbm, open_store):
+    store = open_store("a")
+    store.add([entry("https://a.com"), entry("https://b.com")])
+    committed = {}
+
+    def finish(url: str, stored: bool):
+        committed[url] = dbm.select("SELECT COUNT(*) FROM Website WHERE url=?;", (url,))[0][0]
+        store.finish(url, status=DONE if stored else FAILED)
+
+    dbm.start_writer(queue_size=10, batch_size=10, commit_interval=60)
+    try:
+        for url in ["https://a.com", "https://b.com"]:
+            assert store.claim(url)
+            data = make_website_data(url)
+            if url == "https://b.com":
+                # the insert of this record fails
+                data.web_assembly = None
+            dbm.insert_data_in_db(data)
+            dbm.when_stored(url=url, callback=lambda stored, url=url: finish(url, stored))
+        # the batch is not full and the commit interval not over, both entries are still leased
+        assert get_status(dbm, "https://a.com")[0] == LEASED
+        dbm.flush()
+    finally:
+        dbm.close()
+    assert committed == {"https://a.com": 1, "https://b.com": 0}
+    assert get_status(dbm, "https://a.com")[0] == DONE
+    assert get_status(dbm, "https://b.com")[0] == FAILED
@@ -0,0 +1,80 @@
+from conftest import make_website_data
+from database.aggregates import AGGREGATE_TABLES, rebuild_aggregates
+from database.database_manager import DatabaseManager
+from database.hyperlink_store import url_id
+from database.migrations import MIGRATIONS, get_schema_version, migrate
+
+
+def get_rows(dbm: DatabaseManager, table: str) -> list:
+    return sorted(dbm.select("SELECT * FROM " + table + ";"))
+
+
+def test_new_database_is_on_the_latest_version(dbm):
+    dbm.connect()
+    try:
+        assert get_schema_version(dbm.c) == MIGRATIONS[-1][0]
+        # applying the migrations again changes nothing
+        assert migrate(dbm.c) == MIGRATIONS[-1][0]
+    finally:
+        dbm.disconnect()
+    assert len(dbm.select("SELECT * FROM schema_version;")) == len(MIGRATIONS)
+
+
+def test_migration_versions_are_ascending():
+    versions = [i[0] for i in MIGRATIONS]
+    assert versions == list(range(1, len(MIGRATIONS) + 1))
+
+
+def test_hyperlinks_of_version_0_are_interned(db_path):
+    dbm = DatabaseManager(set_up=False, path=db_path)
+    dbm.connect()
+    dbm.set_up_tables()
+    dbm.c.execute("INSERT INTO Website VALUES (1, 'a.com', 'https://a.com', 'input_file', '2022-01-31');")
+    dbm.c.executemany("INSERT INTO Hyperlink VALUES (?, ?, ?, ?);",
+                      [(1, "Home", "https://B.com/", 0), (2, "About", "https://b.com/about", 1),
+                       (3, "Home again", "https://b.com", 1)])
+    dbm.c.executemany("INSERT INTO HasHyperlink VALUES (1, ?);", [(1,), (2,), (3,)])
+    dbm.c.commit()
+    assert migrate(dbm.c) == MIGRATIONS[-1][0]
+    dbm.disconnect()
+
+    # both spellings of https://b.com share one url, already visited if any former row was
+    assert get_rows(dbm, "Url") == sorted([(url_id("https://b.com"), "https://b.com", 1),
+                                           (url_id("https://b.com/about"), "https://b.com/about", 1)])
+    assert len(get_rows(dbm, "HasHyperlink")) == 3
+    assert sorted(i[1:] for i in get_rows(dbm, "Hyperlink")) == [
+        ("About", "https://b.com/about", 1), ("Home", "https://b.com", 1), ("Home again", "https://b.com", 1)]
+    dbm.close()
+
+
+def test_hyperlink_view_has_the_former_columns(dbm):
+    dbm.insert_data_in_db(make_website_data("https://a.com", hyperlinks=[("https://b.com", "B", False)]))
+    dbm.insert_data_in_db(make_website_data("https://c.com", hyperlinks=[("https://b.com", "B", False)]))
+    columns = [i[1] for i in dbm.select("PRAGMA table_info(Hyperlink);")]
+    assert columns == ["hyperlink_id", "inner_html", "url", "already_visited"]
+    # one row per distinct link as in the former table
+    rows = dbm.select("SELECT * FROM Hyperlink;")
+    assert len(rows) == 1
+    assert rows[0][1:] == ("B", "https://b.com", 0)
+
+
+def test_data_generation_counts_inserts(dbm):
+    generation = dbm.select("SELECT generation FROM DataGeneration;")[0][0]
+    dbm.insert_data_in_db(make_website_data("https://a.com"))
+    assert dbm.select("SELECT generation FROM DataGeneration;")[0][0] > generation
+
+
+def test_aggregate_triggers_match_a_rebuild(dbm):
+    dbm.insert_data_in_db(make_website_data("https://a.com", libraries=["jquery", "react"], languages=["Python"],
+                                            frameworks=["Bootstrap"]))
+    dbm.insert_data_in_db(make_website_data("https://b.com", libraries=["jquery"], languages=["Python", "Go"],
+                                            visited="2022-02-01"))
+    counted = {table: get_rows(dbm, table) for table, _ in AGGREGATE_TABLES}
+    assert [i[1] for i in counted["LibraryCount"]] == [2, 1]
+
+    dbm.connect()
+    try:
+        rebuild_aggregates(dbm.c)
+    finally:
+        dbm.disconnect()
+    assert {table: get_rows(dbm, table) for table, _ in AGGREGATE_TABLES} == counted
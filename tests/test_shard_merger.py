@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import make_website_data
+from database.database_manager import DatabaseManager
+from database.shard_merger import ShardMerger
+
+
+def get_links(dbm: DatabaseManager) -> list:
+    """
+    Join rows resolved to names, independent of the surrogate ids
+    """
+    return sorted(dbm.select("""SELECT Website.url, 'library', Library.name_ FROM ContainsLib
+                                INNER JOIN Website ON Website.website_id = ContainsLib.website_id
+                                INNER JOIN Library ON Library.library_id = ContainsLib.library_id
+                                UNION ALL
+                                SELECT Website.url, 'language', SrcLanguage.name_ FROM ImplementsLang
+                                INNER JOIN Website ON Website.website_id = ImplementsLang.website_id
+                                INNER JOIN SrcLanguage ON SrcLanguage.src_language_id = ImplementsLang.language_id
+                                UNION ALL
+                                SELECT Website.url, 'hyperlink', Url.url FROM HasHyperlink
+                                INNER JOIN Website ON Website.website_id = HasHyperlink.website_id
+                                INNER JOIN Url ON Url.url_id = HasHyperlink.url_id;"""))
+
+
+@pytest.fixture
+def shards(db_path, dbm):
+    """
+    Main database with one website and two shards whose ids overlap with it and with each other
+    """
+    dbm.insert_data_in_db(make_website_data("https://d.com", libraries=["react"], languages=["Go"]))
+    first = DatabaseManager(set_up=True, path=db_path, shard="w1")
+    first.insert_data_in_db(make_website_data("https://a.com", libraries=["jquery"], languages=["Python"],
+                                              hyperlinks=[("https://b.com", "B", False)]))
+    second = DatabaseManager(set_up=True, path=db_path, shard="w2")
+    second.insert_data_in_db(make_website_data("https://c.com", libraries=["react", "jquery"], languages=["Python"],
+                                               hyperlinks=[("https://b.com", "B", True)]))
+    second.insert_data_in_db(make_website_data("https://a.com", libraries=["jquery"], languages=["Python"],
+                                               visited="2022-02-01"))
+    yield [first.path, second.path]
+    first.close()
+    second.close()
+
+
+def merge(dbm: DatabaseManager, shard_paths: list) -> list:
+    dbm.connect()
+    try:
+        merger = ShardMerger(connection=dbm.c)
+        return [merger.merge(shard_path=i) for i in shard_paths]
+    finally:
+        dbm.disconnect()
+
+
+def test_merge_remaps_ids(dbm, shards):
+    counts = merge(dbm, shards)
+    assert counts[0]["Website"] == 1 and counts[1]["Website"] == 2
+    assert sorted(i[0] for i in dbm.select("SELECT name_ FROM Library;")) == ["jquery", "react"]
+    assert sorted(i[0] for i in dbm.select("SELECT name_ FROM SrcLanguage;")) == ["Go", "Python"]
+    assert get_links(dbm) == sorted([
+        ("https://a.com", "hyperlink", "https://b.com"), ("https://a.com", "language", "Python"),
+        ("https://a.com", "library", "jquery"), ("https://c.com", "hyperlink", "https://b.com"),
+        ("https://c.com", "language", "Python"), ("https://c.com", "library", "jquery"),
+        ("https://c.com", "library", "react"), ("https://d.com", "language", "Go"),
+        ("https://d.com", "library", "react")])
+
+
+def test_merge_deduplicates_websites(dbm, shards):
+    merge(dbm, shards)
+    # a.com was crawled in both shards, it keeps the later visit and the link is visited if it was in any shard
+    assert sorted(dbm.select("SELECT url, visited FROM Website;")) == [
+        ("https://a.com", "2022-02-01"), ("https://c.com", "2022-01-31"), ("https://d.com", "2022-01-31")]
+    assert dbm.select("SELECT url, already_visited FROM Url;") == [("https://b.com", 1)]
+
+
+def test_merging_a_shard_again_changes_nothing(dbm, shards):
+    merge(dbm, shards)
+    tables = ["Website", "Library", "SrcLanguage", "ContainsLib", "ImplementsLang", "HasHyperlink", "AdTracking"]
+    merged = {table: sorted(dbm.select("SELECT * FROM " + table + ";")) for table in tables}
+    merge(dbm, shards)
+    assert {table: sorted(dbm.select("SELECT * FROM " + table + ";")) for table in tables} == merged
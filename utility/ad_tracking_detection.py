@@ -1,35 +1,34 @@
 import json
 import re
-from typing import List, Any
-
-from selenium.webdriver.remote.webelement import WebElement
+from typing import List, Mapping
 
+from utility.page_snapshot import PageSnapshot
 from utility.website_data import AdTracking
 
 
-def get_tracking_pixel_information(elements: List[WebElement]) -> List[str]:
+def get_tracking_pixel_information(elements: List[Mapping]) -> List[str]:
     """
     Find possible tracking pixel information
-    :param elements: IMG WebElement
+    :param elements: attributes of the IMG tags
     :return: list of tracking pixel src
     """
     img_src = []
     css_keys = ["width", "height", "display", "visibility"]
     css_vals = ["hidden", "collapse", "none", "0", "1"]
     for i in elements:
-        if i.get_attribute("style"):
-            for entry in i.get_attribute("style").split(";"):
+        if i.get("style"):
+            for entry in i["style"].split(";"):
                 if entry:
                     k = entry.split(":")[0].replace(" ", "")
                     v = entry.split(":")[1].replace(" ", "")
                     if k in css_keys and v in css_vals:
-                        if i.get_attribute("src") not in img_src:
-                            img_src.append(i.get_attribute("src"))
+                        if i.get("src") not in img_src:
+                            img_src.append(i.get("src"))
         for k in css_keys:
-            if i.get_attribute(k):
-                if i.get_attribute(k) in css_vals:
-                    if i.get_attribute("src") not in img_src:
-                        img_src.append(i.get_attribute("src"))
+            if i.get(k):
+                if i[k] in css_vals:
+                    if i.get("src") not in img_src:
+                        img_src.append(i.get("src"))
     res = re.findall(r'^(?!.*(jpg|jpeg|gif|png|tiff|bmp)).*$', "\n".join([str(i).lower() for i in img_src if i]))
     if res:
         return ";".join([str(i) for i in res if i])
@@ -67,17 +66,17 @@ def get_tag_manager_information(page_source_: str) -> List[str]:
     return tag_manager_info
 
 
-def find_ad_tracking(driver_: Any) -> AdTracking:
+def find_ad_tracking(snapshot: PageSnapshot) -> AdTracking:
     """
     Extract AdTracking info
-    :param driver_: chrome webdriver
+    :param snapshot: PageSnapshot of the current page
     :return: AdTracking information found
     """
     ad_data = AdTracking()
-    cookies = driver_.execute_script("""return document.cookie;""")
-    tracking_pixel = get_tracking_pixel_information(driver_.find_elements_by_tag_name("img"))
-    utm_links = get_utm_link_information(driver_.page_source.lower())
-    tag_manager = get_tag_manager_information(driver_.page_source.lower())
+    cookies = snapshot.cookies
+    tracking_pixel = get_tracking_pixel_information(list(snapshot.images))
+    utm_links = get_utm_link_information(snapshot.page_source.lower())
+    tag_manager = get_tag_manager_information(snapshot.page_source.lower())
     if cookies:
         ad_data.cookies = cookies
     if tracking_pixel:
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from typing import List
+
+from database.frontier_store import DONE, FrontierStore
+
+
+class CrawlFrontier:
+    def __init__(self, store: FrontierStore = None):
+        """
+        Global frontier shared by all crawler workers. Every worker takes the next pending URL regardless of its root
+        or depth level, so a worker that finished a small website continues with the pending URLs of other roots.
+        :param store: optional FrontierStore which persists the frontier and the leases of the crawled URLs
+        """
+        self.queue = asyncio.Queue()
+        self.scheduled = set()
+        self.store = store
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """
+        Normalize url the same way the Website table stores it
+        :param url: input url
+        :return: url without trailing slash
+        """
+        if url and url[-1] == "/":
+            return url[:-1]
+        return url
+
+    def put(self, url: str, root: str, depth: int) -> bool:
+        """
+        Schedule a URL if it was not scheduled before in this run
+        :param url: URL to crawl
+        :param root: parent website or input file
+        :param depth: remaining depth level of the URL
+        :return: bool if the URL was scheduled or not
+        """
+        return len(self.put_all(urls=[url], root=root, depth=depth)) > 0
+
+    def put_all(self, urls: List[str], root: str, depth: int) -> List[str]:
+        """
+        Schedule all URLs which were not scheduled before, with a store also not in a previous run
+        :param urls: URLs to crawl
+        :param root: parent website or input file
+        :param depth: remaining depth level of the URLs
+        :return: scheduled URLs
+        """
+        entries = []
+        for url in urls:
+            key = self.normalize_url(url)
+            if key in self.scheduled:
+                logging.info("Skipping already scheduled url: %s", url)
+                continue
+            self.scheduled.add(key)
+            entries.append({"url": key, "root": root, "depth": depth})
+        if self.store is not None and entries:
+            entries = self.store.add(entries)
+        for entry in entries:
+            self.queue.put_nowait(entry)
+        return [entry["url"] for entry in entries]
+
+    def resume(self) -> int:
+        """
+        Queue the pending URLs of the previous run from the store
+        :return: number of resumed URLs
+        """
+        if self.store is None:
+            return 0
+        entries = self.store.resume()
+        for entry in entries:
+            self.scheduled.add(entry["url"])
+            self.queue.put_nowait(entry)
+        logging.info("\t\t\t\t\t\t\t-------->  Resumed %s pending urls from the frontier store", str(len(entries)))
+        return len(entries)
+
+    def claim(self, entry: dict) -> bool:
+        """
+        Lease an entry before crawling it, without a store every entry is claimed
+        :param entry: frontier entry
+        :return: bool if the entry may be crawled by this worker
+        """
+        return self.store is None or self.store.claim(url=entry["url"])
+
+    def finish(self, entry: dict, status: str = DONE):
+        """
+        Mark a claimed entry as finished in the store
+        :param entry: frontier entry
+        :param status: DONE or FAILED
+        """
+        if self.store is not None:
+            self.store.finish(url=entry["url"], status=status)
+
+    async def get(self) -> dict:
+        """
+        Wait for the next pending URL
+        :return: frontier entry with url, root and remaining depth
+        """
+        return await self.queue.get()
+
+    def task_done(self):
+        self.queue.task_done()
+
+    async def join(self):
+        """
+        Wait until every scheduled URL was crawled
+        """
+        await self.queue.join()
+
+    def pending(self) -> int:
+        return self.queue.qsize()
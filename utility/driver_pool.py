@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class DriverPool:
+    def __init__(self, size: int, launch: Callable[[], Any], max_pages: int, max_memory_mb: int):
+        """
+        Pool of reusable webdriver sessions shared by the crawler workers
+        :param size: number of sessions, usually num_threads
+        :param launch: function starting a new webdriver session
+        :param max_pages: recycle a session after crawling this many pages
+        :param max_memory_mb: recycle a session once the JS heap of the page exceeds this size in MB
+        """
+        self.size = size
+        self.launch = launch
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        # a None slot stands for a session which still has to be launched
+        self.sessions = queue.Queue()
+        self.pages = {}
+        self.lock = threading.Lock()
+        for _ in range(size):
+            self.sessions.put(None)
+
+    def warm_up(self):
+        """
+        Launch all sessions of the pool in parallel before the crawl starts
+        """
+        slots = [self.sessions.get() for _ in range(self.size)]
+        with ThreadPoolExecutor(self.size) as executor:
+            launched = list(executor.map(lambda s: s if s is not None else self.try_launch(), slots))
+        for driver in launched:
+            self.sessions.put(driver)
+        logging.info("\t\t\t\t\t\t\t-------->  Warmed up %s of %s webdriver sessions",
+                     str(len([i for i in launched if i is not None])), str(self.size))
+
+    def try_launch(self) -> Any:
+        try:
+            return self.new_session()
+        except Exception as e:
+            logging.info("Webdriver launch error %s", e)
+            return None
+
+    def new_session(self) -> Any:
+        driver = self.launch()
+        with self.lock:
+            self.pages[id(driver)] = 0
+        return driver
+
+    @staticmethod
+    def is_alive(driver: Any) -> bool:
+        """
+        Check if a session still responds before it is reused
+        :param driver: Chrome webdriver
+        :return: bool if alive or not
+        """
+        try:
+            return len(driver.window_handles) > 0
+        except Exception:
+            return False
+
+    def used_memory_mb(self, driver: Any) -> float:
+        """
+        JS heap size of the current page, reported by Chrome
+        :param driver: Chrome webdriver
+        :return: used heap in MB, 0 if not available
+        """
+        try:
+            heap = driver.execute_script(
+                "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : 0;")
+            return (heap or 0) / (1024 * 1024)
+        except Exception:
+            return 0
+
+    def acquire(self) -> Any:
+        """
+        Take a healthy session from the pool, blocks until one is free
+        :return: Chrome webdriver
+        """
+        driver = self.sessions.get()
+        if driver is not None and not self.is_alive(driver):
+            logging.info("Replacing unresponsive webdriver session")
+            self.quit(driver)
+            driver = None
+        if driver is None:
+            try:
+                driver = self.new_session()
+            except Exception:
+                self.sessions.put(None)
+                raise
+        return driver
+
+    def release(self, driver: Any):
+        """
+        Give a session back to the pool, recycle it if it crawled too many pages or uses too much memory
+        :param driver: Chrome webdriver
+        """
+        with self.lock:
+            self.pages[id(driver)] = self.pages.get(id(driver), 0) + 1
+            pages = self.pages[id(driver)]
+        if pages >= self.max_pages or self.used_memory_mb(driver) >= self.max_memory_mb:
+            logging.info("Recycling webdriver session after %s pages", str(pages))
+            self.quit(driver)
+            driver = self.try_launch()
+        self.sessions.put(driver)
+
+    def quit(self, driver: Any):
+        with self.lock:
+            self.pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.info("Closing driver error %s", e)
+
+    def close(self):
+        """
+        Quit all sessions of the pool
+        """
+        for _ in range(self.size):
+            driver = self.sessions.get()
+            if driver is not None:
+                self.quit(driver)
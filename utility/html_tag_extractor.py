@@ -1,54 +1,121 @@
+import json
+
 from selenium.webdriver.remote.webelement import WebElement
-from typing import List, Tuple
-import regex as re
+from typing import Any, List, Tuple
+
+from database.result_sink import ResultSink
 
-from database.database_manager import DatabaseManager
+
+SCRIPT_ATTRIBUTES = ["innerHTML", "src", "type", "crossorigin"]
+IMG_ATTRIBUTES = ["style", "src", "width", "height", "display", "visibility"]
+# Returns the attributes of all elements of a tag (or of the given elements) as JSON, values follow the semantics of
+# WebElement.get_attribute: the property if it is set, otherwise the attribute
+BULK_ATTRIBUTES_SCRIPT = """
+    var elements = typeof arguments[0] === "string" ?
+        Array.from(document.getElementsByTagName(arguments[0])) : arguments[0];
+    var names = arguments[1];
+    return JSON.stringify(elements.map(function (e) {
+        var res = {};
+        var names_ = names || ["innerHTML"].concat(Array.from(e.attributes).map(function (a) { return a.name; }));
+        names_.forEach(function (n) {
+            var v = e[n];
+            if (v === undefined || v === null || typeof v === "object" || typeof v === "function") {
+                v = e.getAttribute(n);
+            } else if (v === false) {
+                v = null;
+            }
+            if (v !== null && v !== "") {
+                res[n] = String(v);
+            }
+        });
+        return res;
+    }));"""
 
 
 class HTMLTagExtractor:
     @staticmethod
-    def extract_script_tag_attribute_info(elements: List[WebElement]) -> Tuple[list, list, list]:
+    def extract_tag_attributes(driver: Any, tag: str, attributes: List[str] = None) -> List[dict]:
+        """
+        Read the attributes of all elements of a tag in one script round trip
+        :param driver: Chrome webdriver
+        :param tag: HTML tag name
+        :param attributes: attribute names to read, all attributes and the innerHTML if not set
+        :return: one dict per element with all non empty attributes
+        """
+        return json.loads(driver.execute_script(BULK_ATTRIBUTES_SCRIPT, tag, attributes) or "[]")
+
+    @staticmethod
+    def get_element_attributes(elements: List[WebElement], attributes: List[str] = None) -> List[dict]:
+        """
+        Read the attributes of WebElements into plain dicts in one script round trip
+        :param elements: found WebElements
+        :param attributes: attribute names to read, all attributes and the innerHTML if not set
+        :return: one dict per element with all non empty attributes
+        """
+        if not elements:
+            return []
+        return json.loads(elements[0].parent.execute_script(BULK_ATTRIBUTES_SCRIPT, elements, attributes) or "[]")
+
+    @staticmethod
+    def get_script_tag_attribute_info(scripts: List[dict]) -> Tuple[list, list, list]:
         """
         Find the information of all script tag on HTML page
-        :param elements: found WebElements with script tag
+        :param scripts: attributes of the script tags
         :return: Found information to the script tag such as inner html, src link and type
         """
         script_inner_html, script_src_link, script_type = [], [], []
-        for e in elements:
-            if e.get_attribute("innerHTML"):
-                script_inner_html.append(e.get_attribute("innerHTML"))
-            if e.get_attribute("src"):
-                script_src_link.append(e.get_attribute("src"))
-            if e.get_attribute("type"):
-                if len(e.get_attribute("type").split("/")) > 1:
-                    script_type.append(e.get_attribute("type").split("/")[1].lower())
-            if e.get_attribute("crossorigin"):
-                script_type.append(e.get_attribute("crossorigin"))
+        for e in scripts:
+            if e.get("innerHTML"):
+                script_inner_html.append(e["innerHTML"])
+            if e.get("src"):
+                script_src_link.append(e["src"])
+            if e.get("type"):
+                if len(e["type"].split("/")) > 1:
+                    script_type.append(e["type"].split("/")[1].lower())
+            if e.get("crossorigin"):
+                script_type.append(e["crossorigin"])
         return script_inner_html, script_src_link, script_type
 
     @staticmethod
-    def extract_hyperlink_info(dbm: DatabaseManager, elements: List[WebElement]) -> List[str]:
+    def get_hyperlink_info(dbm: ResultSink, anchors: List[dict]) -> List[dict]:
         """
         Find the information of all "link" and "a" tag on HTML page
-        :param dbm: DatabaseManager
-        :param elements: found WebElements with "link" and "a" tag
+        :param dbm: ResultSink
+        :param anchors: attributes of the "link" and "a" tags
         :return: Found hyperlinks
         """
         found_links = []
-        for e in elements:
-            if not e.get_attribute("innerHTML"):
-                inner_html = "None"
-            else:
-                inner_html = e.get_attribute("innerHTML")
-            temp = {"innerHTML": inner_html}
-            for attr in re.findall(r'([a-z]+=)', e.get_attribute("outerHTML")):
-                if e.get_attribute(attr[:-1]):
-                    temp[attr[:-1]] = e.get_attribute(attr[:-1])
+        for e in anchors:
+            temp = {"innerHTML": e.get("innerHTML") or "None"}
+            for attr, value in e.items():
+                if attr != "innerHTML" and value:
+                    temp[attr] = value
             if "href" in temp.keys():
                 temp["already_visited"] = dbm.check_if_already_visited(url=temp["href"])
             found_links.append(temp)
         return found_links
 
+    @staticmethod
+    def extract_script_tag_attribute_info(elements: List[WebElement]) -> Tuple[list, list, list]:
+        """
+        Find the information of all script tag on HTML page
+        :param elements: found WebElements with script tag
+        :return: Found information to the script tag such as inner html, src link and type
+        """
+        return HTMLTagExtractor.get_script_tag_attribute_info(
+            scripts=HTMLTagExtractor.get_element_attributes(elements=elements, attributes=SCRIPT_ATTRIBUTES))
+
+    @staticmethod
+    def extract_hyperlink_info(dbm: ResultSink, elements: List[WebElement]) -> List[dict]:
+        """
+        Find the information of all "link" and "a" tag on HTML page
+        :param dbm: ResultSink
+        :param elements: found WebElements with "link" and "a" tag
+        :return: Found hyperlinks
+        """
+        return HTMLTagExtractor.get_hyperlink_info(dbm=dbm,
+                                                   anchors=HTMLTagExtractor.get_element_attributes(elements=elements))
+
     @staticmethod
     def extract_meta_info(elements: List[WebElement]) -> List[str]:
         """
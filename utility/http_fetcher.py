@@ -0,0 +1,147 @@
+import codecs
+import logging
+import re
+import threading
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import List, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+def get_charset(content_type: str) -> str:
+    """
+    Charset declared in a Content-Type header, requests falls back to ISO-8859-1 for every text/* response without
+    one, which garbles UTF-8 scripts
+    :param content_type: Content-Type header or None
+    :return: charset, utf-8 if none or an unknown one is declared
+    """
+    match = CHARSET.search(content_type or "")
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+class HttpFetcher:
+    def __init__(self, max_workers: int, max_per_host: int, timeout: float, max_bytes: int, user_agent: str):
+        """
+        Keep-alive, connection pooled HTTP client shared by all crawler workers
+        :param max_workers: number of parallel requests
+        :param max_per_host: maximum number of parallel requests to the same host
+        :param timeout: connect and read timeout in seconds
+        :param max_bytes: responses are cut off after this size
+        :param user_agent: User-Agent header sent with each request
+        """
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": user_agent})
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.host_limits = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config_: dict) -> "HttpFetcher":
+        """
+        Create the fetcher from the crawler configuration
+        :param config_: http_fetcher configuration (config.yml)
+        :return: HttpFetcher
+        """
+        return HttpFetcher(max_workers=config_["max_workers"], max_per_host=config_["max_per_host"],
+                           timeout=config_["timeout"], max_bytes=config_["max_bytes"],
+                           user_agent=config_["user_agent"])
+
+    def host_limit(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.Semaphore(self.max_per_host)
+            return self.host_limits[host]
+
+    def get(self, url: str) -> requests.Response:
+        """
+        Start a streamed GET request, the caller has to close the response
+        :param url: requested url
+        :return: response
+        """
+        response = self.session.get(url, timeout=self.timeout, stream=True)
+        response.raise_for_status()
+        return response
+
+    def fetch(self, url: str) -> str:
+        """
+        Fetch the text of a url with the per host limit
+        :param url: requested url
+        :return: response text, empty string on errors
+        """
+        with self.host_limit(url):
+            try:
+                with self.get(url) as response:
+                    body = bytearray()
+                    for chunk in response.iter_content(chunk_size=65536):
+                        body += chunk
+                        if len(body) >= self.max_bytes:
+                            logging.info("Cut off response of %s after %s bytes", url, str(len(body)))
+                            break
+                    return bytes(body).decode(get_charset(response.headers.get("Content-Type")), errors="replace")
+            except Exception as e:
+                logging.info("Fetching error %s for %s", e, url)
+                return ""
+
+    def check_validators(self, url: str, etag: str = None, last_modified: str = None) -> Tuple[int, str, str]:
+        """
+        Conditional GET of a page without reading the body
+        :param url: requested url
+        :param etag: ETag of the previous response, sent as If-None-Match
+        :param last_modified: Last-Modified of the previous response, sent as If-Modified-Since
+        :return: status code (304 if unchanged, 0 on errors), ETag and Last-Modified of the response
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        with self.host_limit(url):
+            try:
+                with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                    return response.status_code, response.headers.get("ETag"), response.headers.get("Last-Modified")
+            except Exception as e:
+                logging.info("Conditional request error %s for %s", e, url)
+                return 0, None, None
+
+    def get_validators(self, url: str) -> Tuple[str, str]:
+        """
+        HEAD request of a page for the validators of the first crawl
+        :param url: requested url
+        :return: ETag and Last-Modified of the response, None on errors
+        """
+        with self.host_limit(url):
+            try:
+                response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+                return response.headers.get("ETag"), response.headers.get("Last-Modified")
+            except Exception as e:
+                logging.info("HEAD request error %s for %s", e, url)
+                return None, None
+
+    def fetch_all(self, urls: List[str]) -> Tuple[Tuple[str, str], ...]:
+        """
+        Fetch all urls in parallel, each url only once
+        :param urls: requested urls
+        :return: pairs of url and response text
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        return tuple(zip(unique_urls, self.executor.map(self.fetch, unique_urls)))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,93 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from guesslang import Guess
+
+MISSING = object()
+
+
+class LanguageClassifier:
+    model = None
+    model_lock = threading.Lock()
+
+    def __init__(self, cache_size: int):
+        """
+        Guess the language of code snippets with one guesslang model per process and an LRU cache by content hash,
+        so shared scripts such as CDN libraries are only classified once per crawl
+        :param cache_size: number of cached results
+        """
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_model(cls) -> Guess:
+        """
+        Load the guesslang model once per process
+        :return: guesslang Guess
+        """
+        with cls.model_lock:
+            if cls.model is None:
+                cls.model = Guess()
+            return cls.model
+
+    @staticmethod
+    def content_hash(snippet: str) -> bytes:
+        return hashlib.sha1(snippet.encode("utf-8", errors="replace")).digest()
+
+    def cached(self, key: bytes) -> Optional[str]:
+        """
+        :param key: content hash of the snippet
+        :return: cached language or MISSING
+        """
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        return MISSING
+
+    def store(self, key: bytes, language: Optional[str]):
+        with self.lock:
+            self.cache[key] = language
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def classify_all(self, snippets: List[str]) -> List[Optional[str]]:
+        """
+        Guess the languages of the snippets of a page, every distinct snippet is only classified once. guesslang has no
+        batched inference, the uncached snippets are classified one by one and the model lock is only held per snippet,
+        so the classifications of the crawler threads interleave.
+        :param snippets: code snippets
+        :return: guessed language per snippet, "None" for empty snippets and None if guesslang is not sure
+        """
+        keys = [self.content_hash(i) if i else None for i in snippets]
+        results = {}
+        missing = {}
+        for key, snippet in zip(keys, snippets):
+            if key is None or key in results or key in missing:
+                continue
+            language = self.cached(key)
+            if language is MISSING:
+                missing[key] = snippet
+            else:
+                results[key] = language
+        if missing:
+            model = self.get_model()
+            for key, snippet in missing.items():
+                # the TensorFlow model is shared by all crawler threads
+                with self.model_lock:
+                    language = model.language_name(snippet)
+                self.store(key, language)
+                results[key] = language
+        return [results[key] if key is not None else "None" for key in keys]
+
+    def classify(self, snippet: str) -> Optional[str]:
+        """
+        Guess the language of a single snippet
+        :param snippet: code snippet
+        :return: guessed language
+        """
+        return self.classify_all([snippet])[0]
@@ -0,0 +1,63 @@
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any, List, NamedTuple, Optional
+
+# only imported for the annotation, so the database side can restore fingerprints without selenium
+if TYPE_CHECKING:
+    from utility.page_snapshot import PageSnapshot
+
+# fingerprint fields each analyzer depends on, ad tracking always runs because the cookies differ between visits.
+# Languages, libraries and frameworks also hold the Wappalyzer detections, their rows are only carried forward if the
+# Wappalyzer result is the same, otherwise stale detections of the previous crawl would be kept.
+ANALYZER_INPUTS = {
+    "hyperlink": ["html_hash"],
+    "languages": ["html_hash", "script_src_hash", "wappalyzer_hash"],
+    "libraries": ["script_src_hash", "wappalyzer_hash"],
+    "frameworks": ["wappalyzer_hash"],
+    "web_assembly": ["script_src_hash"],
+}
+
+
+class PageFingerprint(NamedTuple):
+    """
+    Content fingerprint of a crawled page, compared on a recrawl to find the analyzers whose inputs changed
+    """
+    html_hash: str
+    script_src_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    wappalyzer_hash: Optional[str] = None
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+def fingerprint_snapshot(snapshot: "PageSnapshot", etag: str = None, last_modified: str = None,
+                         technologies: Any = None) -> PageFingerprint:
+    """
+    Fingerprint of a page snapshot
+    :param snapshot: PageSnapshot
+    :param etag: ETag response header of the page
+    :param last_modified: Last-Modified response header of the page
+    :param technologies: Wappalyzer detections of the page, e.g. its libraries, languages and frameworks
+    :return: PageFingerprint
+    """
+    script_srcs = sorted({i["src"] for i in snapshot.scripts if i.get("src")})
+    return PageFingerprint(html_hash=content_hash(snapshot.page_source),
+                           script_src_hash=content_hash("\n".join(script_srcs)),
+                           etag=etag, last_modified=last_modified,
+                           wappalyzer_hash=content_hash(json.dumps(technologies, sort_keys=True, default=str)))
+
+
+def unchanged_analyzers(previous: Optional[dict], current: PageFingerprint) -> List[str]:
+    """
+    Analyzers whose inputs did not change since the previous crawl, their stored results can be carried forward
+    :param previous: stored fingerprint of the previous crawl or None
+    :param current: fingerprint of the current crawl
+    :return: analyzer names of ANALYZER_INPUTS
+    """
+    if not previous:
+        return []
+    return [analyzer for analyzer, inputs in ANALYZER_INPUTS.items()
+            if all(previous[i] == getattr(current, i) for i in inputs)]
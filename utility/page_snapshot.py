@@ -0,0 +1,82 @@
+from types import MappingProxyType
+from typing import Any, List, Mapping, NamedTuple, Tuple
+
+from utility.html_tag_extractor import HTMLTagExtractor, IMG_ATTRIBUTES, SCRIPT_ATTRIBUTES
+from utility.http_fetcher import HttpFetcher
+
+RESPONSE_METADATA_SCRIPT = """
+    var nav = performance.getEntriesByType('navigation')[0] || {};
+    return {
+        "url": document.URL,
+        "status": nav.responseStatus || null,
+        "content_type": document.contentType,
+        "charset": document.characterSet,
+        "last_modified": document.lastModified,
+        "protocol": nav.nextHopProtocol || null,
+        "transfer_size": nav.transferSize || null,
+        "duration": nav.duration || null
+    };"""
+
+
+class PageSnapshot(NamedTuple):
+    """
+    Immutable state of a loaded page, shared by all analyzers so the page is only navigated to once
+    """
+    url: str
+    page_source: str
+    cookies: str
+    scripts: Tuple[Mapping, ...]
+    images: Tuple[Mapping, ...]
+    anchors: Tuple[Mapping, ...]
+    links: Tuple[Mapping, ...]
+    response: Mapping
+    script_sources: Tuple[Tuple[str, str], ...]
+
+    def script_source(self, url: str) -> str:
+        """
+        Source of a loaded script file
+        :param url: src of the script
+        :return: source or empty string if the script was not loaded
+        """
+        for src, source in self.script_sources:
+            if src == url:
+                return source
+        return ""
+
+
+def freeze(entries: List[dict]) -> Tuple[Mapping, ...]:
+    return tuple(MappingProxyType(dict(i)) for i in entries)
+
+
+def fetch_script_sources(snapshot: PageSnapshot, fetcher: HttpFetcher) -> PageSnapshot:
+    """
+    Fetch all script sources of the page once in parallel
+    :param snapshot: PageSnapshot without script sources
+    :param fetcher: HttpFetcher for the script sources
+    :return: PageSnapshot with script sources
+    """
+    return snapshot._replace(script_sources=fetcher.fetch_all([i["src"] for i in snapshot.scripts if i.get("src")]))
+
+
+def take_page_snapshot(driver: Any, url: str, fetcher: HttpFetcher = None) -> PageSnapshot:
+    """
+    Capture the currently loaded page and fetch all script sources of the page once in parallel
+    :param driver: Chrome webdriver with the page already loaded
+    :param url: current URL
+    :param fetcher: HttpFetcher for the script sources, without a fetcher the script sources are not fetched
+    :return: PageSnapshot
+    """
+    html_extr = HTMLTagExtractor()
+    snapshot = PageSnapshot(
+        url=url,
+        page_source=driver.page_source,
+        cookies=driver.execute_script("""return document.cookie;"""),
+        scripts=freeze(html_extr.extract_tag_attributes(driver=driver, tag="script", attributes=SCRIPT_ATTRIBUTES)),
+        images=freeze(html_extr.extract_tag_attributes(driver=driver, tag="img", attributes=IMG_ATTRIBUTES)),
+        anchors=freeze(html_extr.extract_tag_attributes(driver=driver, tag="a")),
+        links=freeze(html_extr.extract_tag_attributes(driver=driver, tag="link")),
+        response=MappingProxyType(driver.execute_script(RESPONSE_METADATA_SCRIPT) or {}),
+        script_sources=())
+    if fetcher is None:
+        return snapshot
+    return fetch_script_sources(snapshot=snapshot, fetcher=fetcher)
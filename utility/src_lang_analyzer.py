@@ -1,12 +1,16 @@
 from typing import List, Any, Tuple
 
-from guesslang import Guess
 from collections import Counter
 
+from utility.language_classifier import LanguageClassifier
+from utility.page_snapshot import PageSnapshot
+
 
 class SrcLanguageAnalyzer:
-    def __init__(self, driver: Any):
-        self.driver = driver
+    def __init__(self, snapshot: PageSnapshot, classifier: LanguageClassifier):
+        self.snapshot = snapshot
+        self.classifier = classifier
+        self.src_inner_html = {}
 
     def get_src_inner_html(self, input_src_urls: List[str]) -> Tuple[list, list]:
         """
@@ -14,12 +18,23 @@ class SrcLanguageAnalyzer:
         :param input_src_urls: list of src urls
         :return: list of inner_html_s and found src_libraries
         """
+        key = tuple(input_src_urls)
+        if key not in self.src_inner_html:
+            self.src_inner_html[key] = self.analyse_src_inner_html(input_src_urls)
+        return self.src_inner_html[key]
+
+    def analyse_src_inner_html(self, input_src_urls: List[str]) -> Tuple[list, list]:
+        """
+        Search the fetched script sources for the name and version of js libraries
+        :param input_src_urls: list of src urls
+        :return: list of inner_html_s and found src_libraries
+        """
         inner_html_s = []
         src_libraries = []
         for url in input_src_urls:
             if ".txt" not in url:
-                self.driver.get(url)
-                if self.driver.page_source:
+                page_source = self.snapshot.script_source(url)
+                if page_source:
                     """
                     comments_in_script = [i for i in
                          re.findall(r'/\*+(?:(?!\*/).)*\*+/', driver.page_source.replace("\n", " ").replace("\r", " "))
@@ -54,23 +69,17 @@ class SrcLanguageAnalyzer:
                             }
                             if not name + version in [i["name"] + i["version"] for i in src_libraries]:
                                 src_libraries.append(temp)
-                    inner_html_s.append((url, self.driver.page_source))
+                    inner_html_s.append((url, page_source))
         # print(src_libraries)
         return inner_html_s, src_libraries
 
-    @staticmethod
-    def guess_script_language(snippet: str) -> str:
+    def guess_script_language(self, snippet: str) -> str:
         """
         Guess the src language based on inner html snippet
         :param snippet: code snippet
         :return: guessed language
         """
-        guess = Guess()
-        # print([guess.probabilities(snippet) for snippet in inner_htmls])
-        if snippet:
-            return guess.language_name(snippet)
-        else:
-            return "None"
+        return self.classifier.classify(snippet)
 
     def get_analysed_src_lib(self, script_src, prev_found_lib) -> List[dict]:
         """
@@ -98,8 +107,9 @@ class SrcLanguageAnalyzer:
         :return: all found languages
         """
         src_inner_html, _ = self.get_src_inner_html(script_src)
-        found_src = [("innerHTML", self.guess_script_language(i)) for i in script_inner_html if self.guess_script_language(i)] + \
-                    [(i, self.guess_script_language(j)) for i, j in src_inner_html if self.guess_script_language(j)]
+        guessed = self.classifier.classify_all(script_inner_html + [j for _, j in src_inner_html])
+        found_src = [("innerHTML", j) for j in guessed[:len(script_inner_html)] if j] + \
+                    [(i, j) for (i, _), j in zip(src_inner_html, guessed[len(script_inner_html):]) if j]
         languages = Counter([j for i, j in found_src])
         for type_ in script_type + prev_found_lang:
             if languages.keys():
@@ -1,29 +1,91 @@
+import json
 import logging
 import time
-import ast
-from typing import Any
+from typing import Any, Optional
 
-import regex as re
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
 
 from utility.website_data import WebsiteData
 
+# Collect the Wappalyzer results logged on the background page instead of printing them
+PATCH_CONSOLE_LOG_SCRIPT = """
+    window.wappalyzerResults = [];
+    console.log = function () {
+        var entry = JSON.stringify(Array.from(arguments));
+        if (entry.includes('"hostname"')) { window.wappalyzerResults.push(entry); }
+    };"""
+RESET_RESULTS_SCRIPT = """
+    if (window.wappalyzerResults === undefined) { return false; }
+    window.wappalyzerResults = [];
+    return true;"""
+LATEST_RESULT_SCRIPT = """
+    var results = window.wappalyzerResults || [];
+    return results.length ? results[results.length - 1] : null;"""
+
 
 class WappalyzerAnalyzer:
     def __init__(self, driver: Any, config: dict):
         self.driver = driver
         self.config = config
 
-    def get_chrome_extension(self):
+    def set_up_extension(self):
         """
-        Open extensions-manager switch dev mode on and get info from the extension background page
+        Open extensions-manager switch dev mode on and patch the console of the extension background page.
+        Only needed once per webdriver session.
         """
+        self.driver.switch_to.window(self.driver.window_handles[1])
         self.driver.get(self.config["chrome_extensions_url"])
         self.driver.execute_script(
             '''document.querySelector("extensions-manager").delegate.setProfileInDevMode(true)''')
         self.driver.get(self.config["background_page"])
-        self.driver.execute_script('''console.log = function(){
-                                                   if(JSON.stringify(Array.from(arguments)).includes('"hostname"')){
-                                                   document.body.innerHTML += JSON.stringify(Array.from(arguments)); }}''')
+        self.driver.execute_script(PATCH_CONSOLE_LOG_SCRIPT)
+        self.driver.switch_to.window(self.driver.window_handles[0])
+
+    def reset_results(self):
+        """
+        Clear the collected results on the background page, set up the extension again if the page was reloaded
+        """
+        self.driver.switch_to.window(self.driver.window_handles[1])
+        if not self.driver.execute_script(RESET_RESULTS_SCRIPT):
+            logging.info("Wappalyzer background page was reset, setting up extension again")
+            self.set_up_extension()
+        self.driver.switch_to.window(self.driver.window_handles[0])
+
+    def wait_for_result(self) -> Optional[dict]:
+        """
+        Wait until the Wappalyzer result for the current page is final. Wappalyzer logs its detections incrementally,
+        so the latest entry is taken once it did not change for result_settle seconds, at most until result_timeout.
+        :return: parsed Wappalyzer result, the latest partial one after the timeout or None if nothing was logged
+        """
+        latest = {"entry": None, "since": time.monotonic()}
+
+        def is_settled(driver: Any) -> bool:
+            entry = driver.execute_script(LATEST_RESULT_SCRIPT)
+            if entry != latest["entry"]:
+                latest["entry"], latest["since"] = entry, time.monotonic()
+                return False
+            return entry is not None and time.monotonic() - latest["since"] >= self.config["result_settle"]
+
+        self.driver.switch_to.window(self.driver.window_handles[1])
+        try:
+            WebDriverWait(self.driver, self.config["result_timeout"],
+                          poll_frequency=self.config["poll_frequency"]).until(is_settled)
+        except TimeoutException:
+            logging.info("Wappalyzer result did not settle within %s seconds", str(self.config["result_timeout"]))
+        finally:
+            self.driver.switch_to.window(self.driver.window_handles[0])
+        entry = latest["entry"]
+        if entry is None:
+            return None
+        for argument in json.loads(entry):
+            if isinstance(argument, dict) and "technologies" in argument:
+                return argument
+            if isinstance(argument, list):
+                for i in argument:
+                    if isinstance(i, dict) and "technologies" in i:
+                        return i
+        return None
 
     def get_wappalyzer_info(self, url_: str, collected_website_data: WebsiteData) -> WebsiteData:
         """
@@ -32,46 +94,36 @@ class WappalyzerAnalyzer:
         :param url_: current URL
         :return: list of the found wappAlyzer info
         """
-        self.driver.switch_to.window(self.driver.window_handles[1])
-        self.get_chrome_extension()
-        time.sleep(3)
-        self.driver.switch_to.window(self.driver.window_handles[0])
-        time.sleep(5)
+        self.reset_results()
         self.driver.get(url_)
-        time.sleep(5)
-        self.driver.switch_to.window(self.driver.window_handles[1])
-        page_source = self.driver.page_source
-        wappalyzer_log_results = re.findall(r'\[\{("hostname":.*?)\].?\]', page_source)
+        wappalyzer_result = self.wait_for_result()
         wappalyzer_libraries = []
         wappalyzer_languages = []
         wappalyzer_frameworks = []
-        if wappalyzer_log_results:
-            json_string = "{" + wappalyzer_log_results[-1].replace("true", "True").replace("false", "False").replace(
-                "null", "None") + "]}"
+        if wappalyzer_result:
             try:
-                wappalyzer_result = ast.literal_eval(json_string)
-                if wappalyzer_result:
-                    for tech_entry in wappalyzer_result["technologies"]:
-                        slugs = [i["slug"] for i in tech_entry["categories"]]
-                        temp = {
-                                "name": tech_entry["name"],
-                                "slug": tech_entry["slug"],
-                                "version": tech_entry["version"],
-                                "website": tech_entry["website"],
-                                "confidence": tech_entry["confidence"],
-                                "category_slug": tech_entry["categories"][0]["slug"],
-                                "category_name": tech_entry["categories"][0]["name"],
-                                "language": "None"
-                            }
-                        if 'programming-languages' in slugs:
-                            wappalyzer_languages.append(tech_entry["name"])
-                        if 'javascript-libraries' in slugs:
-                            wappalyzer_libraries.append(temp)
-                        if 'javascript-libraries' not in slugs and 'programming-languages' not in slugs:
-                            wappalyzer_frameworks.append(temp)
+                for tech_entry in wappalyzer_result["technologies"]:
+                    slugs = [i["slug"] for i in tech_entry["categories"]]
+                    temp = {
+                            "name": tech_entry["name"],
+                            "slug": tech_entry["slug"],
+                            "version": tech_entry["version"],
+                            "website": tech_entry["website"],
+                            "confidence": tech_entry["confidence"],
+                            "category_slug": tech_entry["categories"][0]["slug"],
+                            "category_name": tech_entry["categories"][0]["name"],
+                            "language": "None"
+                        }
+                    if 'programming-languages' in slugs:
+                        wappalyzer_languages.append(tech_entry["name"])
+                    if 'javascript-libraries' in slugs:
+                        wappalyzer_libraries.append(temp)
+                    if 'javascript-libraries' not in slugs and 'programming-languages' not in slugs:
+                        wappalyzer_frameworks.append(temp)
             except Exception as e:
-                logging.info("Wappalyzer error %s for %s for json: %s", e, url_, json_string)
-        self.driver.switch_to.window(self.driver.window_handles[0])
+                logging.info("Wappalyzer error %s for %s for result: %s", e, url_, json.dumps(wappalyzer_result))
+        else:
+            logging.info("No Wappalyzer result for %s within %s seconds", url_, str(self.config["result_timeout"]))
         collected_website_data.libraries = wappalyzer_libraries
         collected_website_data.languages = wappalyzer_languages
         collected_website_data.frameworks = wappalyzer_frameworks
@@ -0,0 +1,52 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional, Tuple
+
+from utility.http_fetcher import HttpFetcher
+
+
+class WasmDownloader:
+    def __init__(self, fetcher: HttpFetcher, directory: str, max_bytes: int):
+        """
+        Download WASM files directly and store them under their sha224, safe to use from many threads
+        :param fetcher: HttpFetcher
+        :param directory: download folder of the wasm files
+        :param max_bytes: downloads bigger than this are dropped
+        """
+        self.fetcher = fetcher
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, local_file_name: str) -> str:
+        return os.path.join(self.directory, local_file_name)
+
+    def download(self, url: str) -> Optional[Tuple[str, int]]:
+        """
+        Stream a wasm file to disk while hashing it, the finished file is moved to <sha224>.wasm
+        :param url: url of the wasm file
+        :return: local file name and file size, None if the download failed
+        """
+        sha224 = hashlib.sha224()
+        size = 0
+        tmp = tempfile.NamedTemporaryFile(dir=self.directory, suffix=".part", delete=False)
+        try:
+            with tmp, self.fetcher.host_limit(url), self.fetcher.get(url) as response:
+                for chunk in response.iter_content(chunk_size=65536):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError("wasm file larger than " + str(self.max_bytes) + " bytes")
+                    sha224.update(chunk)
+                    tmp.write(chunk)
+            local_file_name = sha224.hexdigest() + ".wasm"
+            # equal content gets the same name, so concurrent downloads of one file may replace each other
+            os.replace(tmp.name, self.path(local_file_name))
+            logging.info("\t\t\t\t\t\t\t-------->File %s saved from %s", local_file_name, url)
+            return local_file_name, size
+        except Exception as e:
+            logging.info("\t\t\t\t\t\t\t-------->Download error %s for %s", e, url)
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            return None
@@ -0,0 +1,140 @@
+import mmap
+from typing import Tuple
+
+WASM_MAGIC = b"\x00asm"
+EXTERNAL_KINDS = {0: "func", 1: "table", 2: "memory", 3: "global", 4: "tag"}
+REF_TYPES = {0x70: "funcref", 0x6f: "externref"}
+# ids of the sections that are decoded, all other sections are skipped by their size
+TYPE_SECTION, IMPORT_SECTION, FUNCTION_SECTION, TABLE_SECTION, MEMORY_SECTION, GLOBAL_SECTION, EXPORT_SECTION = \
+    1, 2, 3, 4, 5, 6, 7
+
+
+class WasmSectionParser:
+    def __init__(self, data: memoryview):
+        """
+        Read the module metadata from the section headers and the import, export, table, memory, global, type and
+        function vectors of a wasm binary without decoding code or data
+        :param data: wasm binary
+        """
+        self.data = data
+        self.pos = 0
+
+    def read_byte(self) -> int:
+        if self.pos >= len(self.data):
+            raise ValueError("unexpected end of wasm file")
+        byte = self.data[self.pos]
+        self.pos += 1
+        return byte
+
+    def read_u32(self) -> int:
+        """
+        Decode an unsigned LEB128 integer
+        :return: integer value
+        """
+        result, shift = 0, 0
+        while True:
+            byte = self.read_byte()
+            result |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+            if shift > 63:
+                raise ValueError("invalid LEB128 integer in wasm file")
+
+    def read_bytes(self, length: int) -> memoryview:
+        if self.pos + length > len(self.data):
+            raise ValueError("unexpected end of wasm file")
+        value = self.data[self.pos:self.pos + length]
+        self.pos += length
+        return value
+
+    def read_name(self) -> str:
+        return bytes(self.read_bytes(self.read_u32())).decode("utf-8", errors="replace")
+
+    def read_limits(self) -> dict:
+        flags = self.read_byte()
+        minimum = self.read_u32()
+        maximum = self.read_u32() if flags & 0x01 else None
+        return {"min": minimum, "max": maximum}
+
+    def read_table(self) -> dict:
+        kind = self.read_byte()
+        table = {"kind": REF_TYPES.get(kind, hex(kind))}
+        table.update(self.read_limits())
+        return table
+
+    def read_import(self) -> str:
+        modname = self.read_name()
+        name = self.read_name()
+        kind = self.read_byte()
+        if kind == 0:
+            self.read_u32()
+        elif kind == 1:
+            self.read_table()
+        elif kind == 2:
+            self.read_limits()
+        elif kind == 3:
+            self.read_byte()
+            self.read_byte()
+        elif kind == 4:
+            self.read_byte()
+            self.read_u32()
+        else:
+            raise ValueError("unknown import kind " + str(kind))
+        return EXTERNAL_KINDS[kind] + " " + modname + "." + name
+
+    def read_export(self) -> str:
+        name = self.read_name()
+        kind = self.read_byte()
+        self.read_u32()
+        return EXTERNAL_KINDS.get(kind, str(kind)) + " " + name
+
+    def read_vector(self, read_item) -> list:
+        return [read_item() for _ in range(self.read_u32())]
+
+    def parse(self) -> dict:
+        """
+        Parse the module metadata
+        :return: imports, exports, tables, memory and the number of globals, functions and types
+        """
+        if bytes(self.read_bytes(4)) != WASM_MAGIC:
+            raise ValueError("not a wasm file")
+        self.read_bytes(4)
+        information = {"imports": [], "exports": [], "tables": [], "memory": [],
+                       "num_global": 0, "num_func": 0, "num_type": 0}
+        while self.pos < len(self.data):
+            section_id = self.read_byte()
+            size = self.read_u32()
+            end = self.pos + size
+            if end > len(self.data):
+                raise ValueError("wasm section exceeds file size")
+            if section_id == TYPE_SECTION:
+                information["num_type"] = self.read_u32()
+            elif section_id == IMPORT_SECTION:
+                information["imports"] = self.read_vector(self.read_import)
+            elif section_id == FUNCTION_SECTION:
+                information["num_func"] = self.read_u32()
+            elif section_id == TABLE_SECTION:
+                information["tables"] = self.read_vector(self.read_table)
+            elif section_id == MEMORY_SECTION:
+                information["memory"] = self.read_vector(self.read_limits)
+            elif section_id == GLOBAL_SECTION:
+                information["num_global"] = self.read_u32()
+            elif section_id == EXPORT_SECTION:
+                information["exports"] = self.read_vector(self.read_export)
+            self.pos = end
+        return information
+
+
+def parse_wasm_file(path: str) -> Tuple[dict, int]:
+    """
+    Parse a wasm file through a memory map, so only the read sections are loaded from disk
+    :param path: path of the wasm file
+    :return: module metadata and file size
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        data = memoryview(mapped)
+        try:
+            return WasmSectionParser(data).parse(), len(mapped)
+        finally:
+            data.release()
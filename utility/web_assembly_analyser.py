@@ -1,67 +1,21 @@
-import base64
 import json
 import logging
 import os
 import re
-import time
-from typing import Any, List, Tuple
+from typing import List, Tuple
 from urllib.parse import urlparse
 from ppci import wasm
-import hashlib
+from utility.page_snapshot import PageSnapshot
+from utility.wasm_downloader import WasmDownloader
+from utility.wasm_section_parser import parse_wasm_file
 from utility.website_data import WasmFile
 
 
 class WebAssemblyAnalyzer:
-    def __init__(self, driver: Any, default_directory_path: str):
-        self.driver = driver
-        self.default_directory_path = default_directory_path
-
-    def wait_until_downloaded_wasm_file(self):
-        """
-        Get to the chrome downloads manager wait until download is complete
-        """
-        if not self.driver.current_url.startswith("chrome://downloads"):
-            self.driver.get("chrome://downloads/")
-        self.driver.execute_script('''
-            var items = document.querySelector('downloads-manager').shadowRoot.getElementById('downloadsList').items;
-            if (items.every(e => e.state === "COMPLETE")) return items.map(e => e.fileUrl || e.file_url);''')
-
-    def delete_unwanted_files(self):
-        os.chdir(self.default_directory_path)
-        dir_files = sorted(os.listdir(os.getcwd()), key=os.path.getmtime)
-        for file in dir_files:
-            if "txt" in file:
-                os.remove(self.default_directory_path + file)
-
-    def rename_file(self, file_name_: str) -> str:
-        """
-        Rename the wasm file
-        :return: new name of wasm file
-        """
-        os.chdir(self.default_directory_path)
-        dir_files = sorted(os.listdir(os.getcwd()), key=os.path.getmtime)
-        if len(dir_files) > 0:
-            latest_file_name = dir_files[-1]
-            if os.environ.get('RUN_IN_DOCKER_CONTAINER', False):
-                old_file_path = os.getcwd() + "/" + file_name_.replace("'", "").replace('"', "")
-            else:
-                old_file_path = os.getcwd() + "\\" + file_name_.replace("'", "").replace('"', "")
-            if os.path.exists(old_file_path):
-                new_name = hashlib.sha224(
-                    self.read_wasm_file(latest_file_name)).hexdigest() + ".wasm"
-                try:
-                    os.rename(self.default_directory_path + latest_file_name, new_name)
-                    logging.info("\t\t\t\t\t\t\t-------->Renamed file: %s to %s", latest_file_name, new_name)
-                    logging.info("\t\t\t\t\t\t\t-------->File %s saved", new_name)
-                except Exception as e:
-                    logging.info("\t\t\t\t\t\t\t-------->Renaming error %s for: %s to %s", e, latest_file_name, new_name)
-                    os.remove(self.default_directory_path + latest_file_name)
-                    logging.info("\t\t\t\t\t\t\t-------->Removed possible duplicate %s", latest_file_name)
-                return new_name
-            else:
-                None
-        else:
-            None
+    def __init__(self, snapshot: PageSnapshot, downloader: WasmDownloader, deep_analysis: bool = False):
+        self.snapshot = snapshot
+        self.downloader = downloader
+        self.deep_analysis = deep_analysis
 
     @staticmethod
     def find_web_assembly_files(_page_source: str, _url: str) -> List[tuple]:
@@ -106,15 +60,38 @@ class WebAssemblyAnalyzer:
         :param file_name: file name of wasm file
         :return: byte data from file
         """
-        print(os.getcwd())
-        os.chdir(self.default_directory_path)
-        with open(file_name, 'rb') as f:
+        with open(self.downloader.path(file_name), 'rb') as f:
             byte_data = f.read()
         return byte_data
 
     def analyze_wasm_binary(self, file_name: str, wasm_temp: WasmFile) -> Tuple[WasmFile, bool]:
         """
-        Analyse the found wasm file
+        Analyse the found wasm file from its section headers, decode the full module with ppci in deep analysis mode
+        :param file_name: wasm file name
+        :param wasm_temp: current WasmFile
+        :return: updated WasmFile
+        """
+        if self.deep_analysis:
+            return self.analyze_wasm_binary_deep(file_name=file_name, wasm_temp=wasm_temp)
+        valid = False
+        try:
+            information, file_size = parse_wasm_file(self.downloader.path(file_name))
+            wasm_temp.file_size = file_size
+            wasm_temp.imports = ";".join(information["imports"])
+            wasm_temp.exports = ";".join(information["exports"])
+            wasm_temp.tables = ";".join(json.dumps(i) for i in information["tables"])
+            wasm_temp.memory = ";".join(json.dumps(i) for i in information["memory"])
+            wasm_temp.num_global = information["num_global"]
+            wasm_temp.num_func = information["num_func"]
+            wasm_temp.num_type = information["num_type"]
+            valid = True
+        except ValueError as e:
+            logging.info(e)
+        return wasm_temp, valid
+
+    def analyze_wasm_binary_deep(self, file_name: str, wasm_temp: WasmFile) -> Tuple[WasmFile, bool]:
+        """
+        Analyse the found wasm file by decoding the full module with ppci
         :param file_name: wasm file name
         :param wasm_temp: current WasmFile
         :return: updated WasmFile
@@ -126,7 +103,7 @@ class WebAssemblyAnalyzer:
             # module.show_interface()
             information = {
                 "file_name": file_name,
-                "file size": os.path.getsize(file_name),
+                "file size": os.path.getsize(self.downloader.path(file_name)),
                 "imports": [(str(import_.kind) + " " + str(import_.modname) + "." + str(import_.name)) for import_ in
                             definitions_per_section["import"]],
                 "exports": [(str(export_.kind) + " " + str(export_.name)) for export_ in
@@ -187,19 +164,16 @@ class WebAssemblyAnalyzer:
         for src_file_link in script_files:
             wasm_files = []
             file_name = os.path.basename(urlparse(src_file_link).path)
-            self.driver.get(src_file_link)
-            for file_name_, file_path_ in self.find_web_assembly_files(_page_source=self.driver.page_source, _url=src_file_link):
+            page_source = self.snapshot.script_source(src_file_link)
+            for file_name_, file_path_ in self.find_web_assembly_files(_page_source=page_source, _url=src_file_link):
                 if file_name_:
                     wasm_temp = WasmFile(source_js_name=file_name, source_js_url=src_file_link)
-                    wasm_temp.webassembly_func += self.find_web_assembly_func(self.driver.page_source)
+                    wasm_temp.webassembly_func += self.find_web_assembly_func(page_source)
                     wasm_temp.source_wasm_name = file_name_
                     wasm_temp.source_wasm_url = file_path_
-                    self.driver.get(file_path_)
                     logging.info("\t\t\t\t\t\t\t-------->Download wasm file: %s from %s", file_name_, file_path_)
-                    time.sleep(1)
-                    self.wait_until_downloaded_wasm_file()
-                    time.sleep(2)
-                    local_file_name = self.rename_file(file_name_=file_name_)
+                    downloaded = self.downloader.download(file_path_)
+                    local_file_name = downloaded[0] if downloaded else None
                     wasm_temp.wasm_file_local_name = local_file_name
                     if local_file_name:
                         wasm_temp, valid = self.analyze_wasm_binary(file_name=local_file_name, wasm_temp=wasm_temp)
@@ -207,11 +181,4 @@ class WebAssemblyAnalyzer:
                             wasm_files.append(wasm_temp)
             if wasm_files:
                 result.append(wasm_files)
-        self.delete_unwanted_files()
-        if os.environ.get('RUN_IN_DOCKER_CONTAINER', False):
-            if os.getcwd().split('/')[-2] == self.default_directory_path.split("/")[-2]:
-                os.chdir('../')
-        else:
-            if os.getcwd().split('\\')[-1] == self.default_directory_path.split("\\")[-2]:
-                os.chdir('..\\')
         return result
@@ -9,6 +9,13 @@ class WebsiteData:
         self.frameworks = "None"
         self.hyperlink = "None"
         self.ad_tracking = AdTracking()
+        # date of the visit, the insert date if not set
+        self.visited = None
+        # incremental recrawl: fingerprint of the page, stored website id of the previous crawl and the analyzers
+        # whose stored rows are carried forward instead of replaced
+        self.fingerprint = None
+        self.previous_website_id = None
+        self.carry_forward = []
 
 
 class AdTracking: